@@ -77,6 +77,22 @@ class BaseEMSimulation(BaseSimulation):
             "_MfRhoDeriv",
         ]
 
+    @property
+    def _clean_on_mu_update(self):
+        """
+        These matrix factors are cleaned if there is an update to the
+        permeability model
+        """
+        return []
+
+    @property
+    def _clean_on_sigma_update(self):
+        """
+        These matrix factors are cleaned if there is an update to the
+        conductivity model
+        """
+        return []
+
     @property
     def deleteTheseOnModelUpdate(self):
         """
@@ -102,6 +118,7 @@ class BaseEMSimulation(BaseSimulation):
             and np.allclose(change["previous"], change["value"])
         ):
             return
+        self._clean_factors(self._clean_on_mu_update)
         for mat in self._clear_on_mu_update:
             if hasattr(self, mat):
                 delattr(self, mat)
@@ -116,6 +133,7 @@ class BaseEMSimulation(BaseSimulation):
             and np.allclose(change["previous"], change["value"])
         ):
             return
+        self._clean_factors(self._clean_on_mu_update)
         for mat in self._clear_on_mu_update:
             if hasattr(self, mat):
                 delattr(self, mat)
@@ -130,6 +148,7 @@ class BaseEMSimulation(BaseSimulation):
             and np.allclose(change["previous"], change["value"])
         ):
             return
+        self._clean_factors(self._clean_on_sigma_update)
         for mat in self._clear_on_sigma_update:
             if hasattr(self, mat):
                 delattr(self, mat)
@@ -144,6 +163,7 @@ class BaseEMSimulation(BaseSimulation):
             and np.allclose(change["previous"], change["value"])
         ):
             return
+        self._clean_factors(self._clean_on_sigma_update)
         for mat in self._clear_on_sigma_update:
             if hasattr(self, mat):
                 delattr(self, mat)
@@ -364,10 +384,14 @@ class BaseEMSimulation(BaseSimulation):
 
         if v is not None:
             if not isinstance(u, Zero):
-                u = u.flatten()  # u is either nUx1 or nU
-                if v.ndim > 1:
-                    # promote u iff v is a matrix
-                    u = u[:, None]  # Avoids constructing the sparse matrix
+                if u.ndim == 1 or u.shape[1] == 1:
+                    u = u.flatten()  # u is either nUx1 or nU
+                    if v.ndim > 1:
+                        # promote u iff v is a matrix
+                        u = u[:, None]  # Avoids constructing the sparse matrix
+                elif not adjoint and v.ndim == 1:
+                    # one column of u per source and a single model vector
+                    return u * mkvc(self._MeSigmaDeriv * v, 2)
             if adjoint:
                 return self._MeSigmaDeriv.T * (u * v)
             return u * (self._MeSigmaDeriv * v)
@@ -434,10 +458,14 @@ class BaseEMSimulation(BaseSimulation):
 
         if v is not None:
             if not isinstance(u, Zero):
-                u = u.flatten()
-                if v.ndim > 1:
-                    # promote u iff v is a matrix
-                    u = u[:, None]  # Avoids constructing the sparse matrix
+                if u.ndim == 1 or u.shape[1] == 1:
+                    u = u.flatten()
+                    if v.ndim > 1:
+                        # promote u iff v is a matrix
+                        u = u[:, None]  # Avoids constructing the sparse matrix
+                elif adjoint is not True and v.ndim == 1:
+                    # one column of u per source and a single model vector
+                    return u * mkvc(self._MfRhoDeriv.dot(v), 2)
             if adjoint is True:
                 return self._MfRhoDeriv.T.dot(u * v)
             return u * (self._MfRhoDeriv.dot(v))
@@ -0,0 +1,328 @@
+import numpy as np
+import properties
+import scipy.sparse as sp
+from scipy.constants import mu_0
+
+from empymod import filters
+
+from ..utils import mkvc
+from .base import BaseEMSimulation
+
+__all__ = ["BaseEM1DSimulation"]
+
+
+def _sqrt(z):
+    """Principal square root of a complex array, faster than numpy's"""
+    r = np.abs(z)
+    return np.sqrt(0.5 * (r + z.real)) + 1j * np.copysign(
+        np.sqrt(0.5 * (r - z.real)), z.imag
+    )
+
+
+def _tanh(z):
+    """Hyperbolic tangent of a complex array with Re(z) >= 0, faster than
+    numpy's"""
+    e = np.exp(-2.0 * z.real) * (np.cos(2.0 * z.imag) - 1j * np.sin(2.0 * z.imag))
+    return (1.0 - e) / (1.0 + e)
+
+
+def reflection_coefficient(lambd, omega, sigma, thicknesses, derivative=False):
+    """
+    TE reflection coefficient of a layered earth in the quasi-static limit,
+    for a time dependence :math:`e^{i \\omega t}`.
+
+    With :math:`u_j = \\sqrt{\\lambda^2 + i \\omega \\mu_0 \\sigma_j}`, the
+    admittances are computed from the bottom half-space up
+
+    .. math::
+        \\hat{u}_j = u_j \\frac{\\hat{u}_{j+1} + u_j \\tanh(u_j t_j)}
+        {u_j + \\hat{u}_{j+1} \\tanh(u_j t_j)}
+
+    and :math:`r_{TE} = (\\lambda - \\hat{u}_0) / (\\lambda + \\hat{u}_0)`.
+
+    :param numpy.ndarray lambd: spatial frequencies, shape (n, 1, n_lambda)
+    :param numpy.ndarray omega: angular frequencies, broadcastable to
+        (n, n_frequency, 1)
+    :param numpy.ndarray sigma: conductivities of the layers, (n, n_layer)
+    :param numpy.ndarray thicknesses: thicknesses of the n_layer - 1 layers
+        above the half-space
+    :param bool derivative: also return the derivatives with respect to the
+        conductivities
+    :rtype: numpy.ndarray or tuple
+    :return: r_TE of shape (n, n_frequency, n_lambda), and its derivatives of
+        shape (n_layer, n, n_frequency, n_lambda)
+    """
+    n_layer = sigma.shape[1]
+    iwmu = 1j * omega * mu_0
+    u = [_sqrt(lambd ** 2 + iwmu * sigma[:, j, None, None]) for j in range(n_layer)]
+
+    U = u[-1]
+    dU_du = [None] * n_layer
+    dU_dU_below = [None] * n_layer
+    dU_du[-1] = 1.0
+    for j in range(n_layer - 2, -1, -1):
+        T = _tanh(u[j] * thicknesses[j])
+        num = u[j] * (U + u[j] * T)
+        den = u[j] + U * T
+        if derivative:
+            sech2 = 1.0 - T ** 2
+            dnum = U + 2.0 * u[j] * T + u[j] ** 2 * thicknesses[j] * sech2
+            dden = 1.0 + U * thicknesses[j] * sech2
+            dU_du[j] = (dnum * den - num * dden) / den ** 2
+            dU_dU_below[j] = u[j] ** 2 * sech2 / den ** 2
+        U = num / den
+
+    r_te = (lambd - U) / (lambd + U)
+    if not derivative:
+        return r_te
+
+    dr_te = np.empty((n_layer,) + r_te.shape, dtype=complex)
+    chain = -2.0 * lambd / (lambd + U) ** 2
+    for j in range(n_layer):
+        dr_te[j] = chain * dU_du[j] * iwmu / (2.0 * u[j])
+        if j < n_layer - 1:
+            chain = chain * dU_dU_below[j]
+    return r_te, dr_te
+
+
+class BaseEM1DSimulation(BaseEMSimulation):
+    """
+    Base class for the simulation of loop sources over a layered earth.
+
+    The earth is made of horizontal layers below z = 0, the last one being a
+    half-space. The sources are vertical magnetic dipoles and horizontal
+    circular loops above the earth, the receivers measure the vertical
+    magnetic field. The fields are computed with the digital linear filters
+    (DLF) of empymod for the Hankel transforms, for all the sources and
+    receivers of the survey at once.
+
+    The sources at the same location form a sounding. The conductivity model
+    is either the same for all the soundings (n_layer values) or one set of
+    layers per sounding, stitched together (n_sounding * n_layer values,
+    sounding by sounding).
+    """
+
+    thicknesses = properties.Array(
+        "thicknesses of the layers, from the top. The last layer is a half-space",
+        shape=("*",),
+        dtype=float,
+        default=np.array([]),
+    )
+
+    hankel_filter = properties.String(
+        "name of the empymod filter for the Hankel transforms", default="key_101_2009"
+    )
+
+    max_chunk_size = properties.Integer(
+        "maximum number of kernel values computed at once", default=2 ** 22, min=1
+    )
+
+    @properties.observer(["survey", "hankel_filter"])
+    def _clear_geometry_on_update(self, change):
+        for name in ["_geometry", "_sounding_index", "_Jmatrix"]:
+            if hasattr(self, name):
+                delattr(self, name)
+
+    @property
+    def deleteTheseOnModelUpdate(self):
+        toDelete = super(BaseEM1DSimulation, self).deleteTheseOnModelUpdate
+        return toDelete + ["_Jmatrix"]
+
+    @property
+    def n_layer(self):
+        """number of layers, including the half-space"""
+        return len(self.thicknesses) + 1
+
+    @property
+    def sounding_index(self):
+        """Index of the sounding of each source, sources at the same location
+        share a sounding"""
+        if getattr(self, "_sounding_index", None) is None:
+            locations = np.vstack(
+                [np.atleast_2d(src.location) for src in self.survey.source_list]
+            )
+            _, first, inverse = np.unique(
+                locations, axis=0, return_index=True, return_inverse=True
+            )
+            order = np.argsort(np.argsort(first))
+            self._sounding_index = order[mkvc(inverse)]
+        return self._sounding_index
+
+    @property
+    def n_sounding(self):
+        """number of soundings"""
+        return self.sounding_index.max() + 1
+
+    @property
+    def sigma_layers(self):
+        """Conductivities of the layers of each sounding, (n_sounding, n_layer)"""
+        sigma = np.atleast_1d(self.sigma).astype(float)
+        if sigma.size == self.n_layer:
+            return np.tile(sigma, (self.n_sounding, 1))
+        if sigma.size == self.n_sounding * self.n_layer:
+            return sigma.reshape((self.n_sounding, self.n_layer))
+        raise ValueError(
+            "sigma has {} values, expected {} (n_layer) or {} (n_sounding * "
+            "n_layer)".format(sigma.size, self.n_layer, self.n_sounding * self.n_layer)
+        )
+
+    @property
+    def _filter(self):
+        return getattr(filters, self.hankel_filter)()
+
+    @property
+    def geometry(self):
+        """
+        Geometry of the source-receiver pairs, one row per receiver location
+        in the order of the data of the survey. A dict of arrays:
+
+        - sounding: sounding of the source
+        - loop: True for a circular loop source, False for a dipole
+        - length: horizontal offset for a dipole, radius for a loop
+        - height: sum of the heights of the source and of the receiver
+        - scale: m / (4 pi) for a dipole, I N a / 2 for a loop
+        - primary: free space vertical field of the source at the receiver
+        """
+        if getattr(self, "_geometry", None) is None:
+            rows = {
+                name: []
+                for name in ["sounding", "loop", "length", "height", "scale", "primary"]
+            }
+            for iSrc, src in enumerate(self.survey.source_list):
+                orientation = getattr(src, "orientation", np.r_[0.0, 0.0, 1.0])
+                if not np.allclose(orientation, [0.0, 0.0, 1.0]):
+                    raise NotImplementedError(
+                        "Only vertical dipoles and horizontal loops are supported"
+                    )
+                src_location = mkvc(src.location)
+                for rx in src.receiver_list:
+                    if rx.orientation != "z":
+                        raise NotImplementedError(
+                            "Only the vertical field (orientation 'z') is supported"
+                        )
+                    locations = np.atleast_2d(rx.locations)
+                    delta = locations - src_location
+                    offset = np.sqrt(delta[:, 0] ** 2 + delta[:, 1] ** 2)
+                    height = locations[:, 2] + src_location[2]
+                    if src_location[2] < 0.0 or np.any(locations[:, 2] < 0.0):
+                        raise ValueError(
+                            "The sources and receivers must be above the earth "
+                            "(z >= 0)"
+                        )
+                    n = len(locations)
+                    is_loop = getattr(src, "radius", None) is not None
+                    if is_loop:
+                        a = src.radius
+                        if np.any(offset > 1e-6 * a):
+                            raise NotImplementedError(
+                                "The receivers of a loop source must be at its center"
+                            )
+                        current = src.current * getattr(src, "N", 1.0)
+                        rows["length"].append(a * np.ones(n))
+                        rows["scale"].append(current * a / 2.0 * np.ones(n))
+                        rows["primary"].append(
+                            current
+                            * a ** 2
+                            / (2.0 * (a ** 2 + delta[:, 2] ** 2) ** 1.5)
+                        )
+                    else:
+                        if np.any(offset == 0.0):
+                            raise ValueError(
+                                "The receivers of a dipole source need a horizontal "
+                                "offset"
+                            )
+                        R = np.sqrt(offset ** 2 + delta[:, 2] ** 2)
+                        rows["length"].append(offset)
+                        rows["scale"].append(src.moment / (4.0 * np.pi) * np.ones(n))
+                        rows["primary"].append(
+                            src.moment
+                            / (4.0 * np.pi * R ** 3)
+                            * (3.0 * delta[:, 2] ** 2 / R ** 2 - 1.0)
+                        )
+                    rows["sounding"].append(self.sounding_index[iSrc] * np.ones(n, int))
+                    rows["loop"].append(np.ones(n, dtype=bool) * is_loop)
+                    rows["height"].append(height)
+            self._geometry = {name: np.hstack(value) for name, value in rows.items()}
+        return self._geometry
+
+    def _chunks(self, n_frequency, derivative=False):
+        """Slices of the receiver locations computed at once"""
+        n_rows = len(self.geometry["length"])
+        size = n_frequency * self._filter.base.size
+        if derivative:
+            size *= self.n_layer
+        step = max(1, self.max_chunk_size // size)
+        return [slice(i, min(i + step, n_rows)) for i in range(0, n_rows, step)]
+
+    def _secondary_field(self, rows, omega, derivative=False):
+        """
+        Secondary vertical magnetic field at the receiver locations
+
+        :param slice rows: receiver locations
+        :param numpy.ndarray omega: angular frequencies, (n, n_frequency)
+        :param bool derivative: also return the derivatives with respect to
+            the conductivities of the layers of the sounding
+        :rtype: numpy.ndarray or tuple
+        :return: field of shape (n, n_frequency) and its derivatives of shape
+            (n, n_frequency, n_layer)
+        """
+        geometry = self.geometry
+        fhtfilt = self._filter
+        length = geometry["length"][rows, None]
+        loop = geometry["loop"][rows, None]
+        lambd = fhtfilt.base / length
+        weights = (
+            np.where(loop, lambd * fhtfilt.j1, lambd ** 2 * fhtfilt.j0)
+            * np.exp(-lambd * geometry["height"][rows, None])
+            * (geometry["scale"][rows, None] / length)
+        )
+        sigma = self.sigma_layers[geometry["sounding"][rows]]
+        out = reflection_coefficient(
+            lambd[:, None, :],
+            omega[:, :, None],
+            sigma,
+            self.thicknesses,
+            derivative=derivative,
+        )
+        if not derivative:
+            return np.sum(out * weights[:, None, :], axis=-1)
+        r_te, dr_te = out
+        field = np.sum(r_te * weights[:, None, :], axis=-1)
+        dfield = np.einsum("jnfl,nl->nfj", dr_te, weights)
+        return field, dfield
+
+    def _stack_sensitivities(self, J_layers):
+        """
+        Sensitivities with respect to sigma from the sensitivities of the
+        data with respect to the layers of their sounding
+
+        :param numpy.ndarray J_layers: (nD, n_layer) sensitivities
+        :rtype: numpy.ndarray or scipy.sparse.csr_matrix
+        """
+        if np.atleast_1d(self.sigma).size == self.n_layer:
+            return J_layers
+        sounding = self.geometry["sounding"][self._data_location]
+        cols = sounding[:, None] * self.n_layer + np.arange(self.n_layer)
+        rows = np.repeat(np.arange(len(sounding)), self.n_layer)
+        return sp.csr_matrix(
+            (J_layers.ravel(), (rows, cols.ravel())),
+            shape=(len(sounding), self.n_sounding * self.n_layer),
+        )
+
+    def getJ(self, m, f=None):
+        """
+        Sensitivities of the data with respect to sigma. They are stored
+        until the model changes.
+        """
+        self.model = m
+        if getattr(self, "_Jmatrix", None) is None:
+            self._Jmatrix = self._stack_sensitivities(self._layer_sensitivities())
+        return self._Jmatrix
+
+    def Jvec(self, m, v, f=None):
+        J = self.getJ(m, f=f)
+        return mkvc(J.dot(self.sigmaDeriv * v))
+
+    def Jtvec(self, m, v, f=None):
+        J = self.getJ(m, f=f)
+        return mkvc(self.sigmaDeriv.T * (J.T.dot(mkvc(v))))
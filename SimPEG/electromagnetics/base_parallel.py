@@ -0,0 +1,280 @@
+import copy
+import multiprocessing
+import traceback
+
+import numpy as np
+import properties
+
+from ..simulation import BaseSimulation
+from ..utils import mkvc
+
+
+class _SourceWorker(object):
+    """
+    Simulation of a subset of the sources of the survey. The worker keeps the
+    fields of the last model, and its simulation keeps its own
+    factorizations.
+
+    :param BaseSimulation simulation: simulation of the complete survey,
+        owned by the worker
+    :param numpy.ndarray source_indices: indices of the sources of the worker
+    """
+
+    def __init__(self, simulation, source_indices):
+        source_list = simulation.survey.source_list
+        simulation.survey = simulation.survey.__class__(
+            [source_list[i] for i in source_indices]
+        )
+        self.simulation = simulation
+        self._fields = None
+        self._m = None
+
+    def _getFields(self, m):
+        if self._fields is None or not np.array_equal(self._m, m):
+            self._fields = self.simulation.fields(m)
+            self._m = np.array(m, copy=True)
+        return self._fields
+
+    def fields(self, m):
+        self._getFields(m)
+
+    def dpred(self, m):
+        return self.simulation.dpred(m, f=self._getFields(m))
+
+    def Jvec(self, m, v):
+        return self.simulation.Jvec(m, v, f=self._getFields(m))
+
+    def Jtvec(self, m, v):
+        return self.simulation.Jtvec(m, v, f=self._getFields(m))
+
+    def getField(self, source_index, key):
+        src = self.simulation.survey.source_list[source_index]
+        return self._fields[(src,) + tuple(key)]
+
+    def submit(self, method, args):
+        try:
+            self._result = (True, getattr(self, method)(*args))
+        except Exception:
+            self._result = (False, traceback.format_exc())
+
+    def result(self):
+        return self._result
+
+    def close(self):
+        pass
+
+
+def _copy_simulation(simulation):
+    """
+    Copy of the simulation without its factorizations, which cannot be
+    copied. The workers factor their own matrices.
+    """
+    memo = {}
+    for name in simulation.clean_on_model_update:
+        solver = getattr(simulation, name, None)
+        if solver is not None:
+            memo[id(solver)] = None
+    return copy.deepcopy(simulation, memo)
+
+
+def _run_worker(conn, simulation, source_indices):
+    worker = _SourceWorker(simulation, source_indices)
+    while True:
+        method, args = conn.recv()
+        if method is None:
+            break
+        worker.submit(method, args)
+        conn.send(worker.result())
+    conn.close()
+
+
+class _ProcessWorker(object):
+    """
+    A _SourceWorker in its own process, driven through a pipe
+    """
+
+    def __init__(self, simulation, source_indices):
+        self._conn, child_conn = multiprocessing.Pipe()
+        self._process = multiprocessing.Process(
+            target=_run_worker, args=(child_conn, simulation, source_indices)
+        )
+        self._process.daemon = True
+        self._process.start()
+        child_conn.close()
+
+    def submit(self, method, args):
+        self._conn.send((method, args))
+
+    def result(self):
+        return self._conn.recv()
+
+    def close(self):
+        if self._process.is_alive():
+            self._conn.send((None, None))
+            self._process.join()
+        self._conn.close()
+
+
+class BaseSourceParallelSimulation(BaseSimulation):
+    """
+    Distributes the sources of a simulation over workers.
+
+    The sources are split in groups (see :code:`source_partition`), one per
+    worker. Each worker holds a copy of the simulation for its sources, with
+    its own factorizations and fields. :code:`fields`, :code:`dpred`,
+    :code:`Jvec` and :code:`Jtvec` scatter the model (and vector) to the
+    workers and gather their results in the order of the data of the survey.
+
+    :param BaseSimulation simulation: simulation of the complete survey
+    """
+
+    simulation = properties.Instance(
+        "simulation of the complete survey", BaseSimulation, required=True
+    )
+
+    n_cpu = properties.Integer(
+        "Number of workers the sources are distributed over",
+        default=int(multiprocessing.cpu_count()),
+        min=1,
+    )
+
+    backend = properties.StringChoice(
+        "Run the workers in a local pool of processes ('process') or one after "
+        "the other in this process ('serial')",
+        choices=["process", "serial"],
+        default="process",
+    )
+
+    def __init__(self, simulation=None, **kwargs):
+        if simulation is not None:
+            kwargs["simulation"] = simulation
+            kwargs.setdefault("mesh", simulation.mesh)
+            kwargs.setdefault("survey", simulation.survey)
+        super(BaseSourceParallelSimulation, self).__init__(**kwargs)
+
+    @properties.observer(["simulation", "n_cpu", "backend"])
+    def _close_on_update(self, change):
+        self.close()
+
+    @property
+    def source_partition(self):
+        """Indices of the sources of each worker, in contiguous groups"""
+        nSrc = self.survey.nSrc
+        return [
+            inds
+            for inds in np.array_split(np.arange(nSrc), min(self.n_cpu, nSrc))
+            if len(inds) > 0
+        ]
+
+    @property
+    def _data_partition(self):
+        """Indices of the data of each worker"""
+        source_list = self.survey.source_list
+        start = np.r_[0, np.cumsum([src.nD for src in source_list])]
+        return [
+            np.hstack([np.arange(start[i], start[i + 1]) for i in inds]).astype(int)
+            for inds in self.source_partition
+        ]
+
+    def _gather_data(self, results):
+        """Data of the survey from the data of the workers"""
+        d = np.empty(self.survey.nD)
+        for inds, d_i in zip(self._data_partition, results):
+            d[inds] = d_i
+        return d
+
+    @property
+    def workers(self):
+        if getattr(self, "_workers", None) is None:
+            Worker = _ProcessWorker if self.backend == "process" else _SourceWorker
+            self._workers = [
+                Worker(_copy_simulation(self.simulation), inds)
+                for inds in self.source_partition
+            ]
+        return self._workers
+
+    def close(self):
+        """Stop the workers, they are restarted when needed"""
+        for worker in getattr(self, "_workers", None) or []:
+            worker.close()
+        self._workers = None
+
+    def __del__(self):
+        try:
+            self.close()
+        except Exception:
+            pass
+
+    def _scatter(self, method, args):
+        """
+        Call a method of every worker with its arguments and gather the
+        results
+
+        :param str method: name of the method of the workers
+        :param list args: tuple of arguments for each worker
+        :rtype: list
+        :return: result of each worker
+        """
+        workers = self.workers
+        for worker, worker_args in zip(workers, args):
+            worker.submit(method, worker_args)
+        results = [worker.result() for worker in workers]
+        for success, out in results:
+            if not success:
+                raise RuntimeError("A worker failed with\n{}".format(out))
+        return [out for _, out in results]
+
+    def _broadcast(self, method, *args):
+        return self._scatter(method, [args] * len(self.workers))
+
+    def fields(self, m=None):
+        """
+        Compute the fields of every worker, they stay on the workers.
+
+        :param numpy.ndarray m: model
+        :rtype: WorkerFields
+        :return: access to the fields of the workers
+        """
+        if m is not None:
+            self.model = m
+        self._broadcast("fields", self.model)
+        return WorkerFields(self)
+
+    def dpred(self, m=None, f=None):
+        if m is not None:
+            self.model = m
+        return self._gather_data(self._broadcast("dpred", self.model))
+
+    def Jvec(self, m, v, f=None):
+        self.model = m
+        return self._gather_data(self._broadcast("Jvec", m, v))
+
+    def Jtvec(self, m, v, f=None):
+        self.model = m
+        v = mkvc(v)
+        args = [(m, v[inds]) for inds in self._data_partition]
+        return np.sum(self._scatter("Jtvec", args), axis=0)
+
+
+class WorkerFields(object):
+    """
+    Fields of a BaseSourceParallelSimulation, kept on its workers. Indexing
+    with a single source, e.g. :code:`f[src, 'b', tInd]`, gathers the field
+    of that source from its worker.
+    """
+
+    def __init__(self, simulation):
+        self.simulation = simulation
+
+    def __getitem__(self, key):
+        src, key = key[0], key[1:]
+        iSrc = self.simulation.survey.getSourceIndex(src)[0]
+        for iWorker, inds in enumerate(self.simulation.source_partition):
+            if iSrc in inds:
+                break
+        worker = self.simulation.workers[iWorker]
+        worker.submit("getField", (int(np.where(inds == iSrc)[0][0]), key))
+        success, out = worker.result()
+        if not success:
+            raise RuntimeError("A worker failed with\n{}".format(out))
+        return out
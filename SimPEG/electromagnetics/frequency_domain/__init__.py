@@ -7,12 +7,14 @@ from .simulation import (
     Simulation3DCurrentDensity,
     Simulation3DMagneticField,
 )
+from .simulation_1d import Simulation1DLayered
 from .fields import (
     Fields3DElectricField,
     Fields3DMagneticFluxDensity,
     Fields3DCurrentDensity,
     Fields3DMagneticField,
 )
+from .model_reduction import RationalKrylovReduction
 
 from . import sources as Src
 from . import receivers as Rx
@@ -0,0 +1,237 @@
+import numpy as np
+import properties
+
+from ..utils import omega
+from .simulation import BaseFDEMSimulation
+
+
+class RationalKrylovReduction(properties.HasProperties):
+    """
+    Rational Krylov model-order reduction of a frequency domain simulation.
+
+    For a fixed model, the system matrix of every 3D FDEM formulation is
+    affine in the angular frequency
+
+    .. math ::
+        \\mathbf{A}(\\omega) = \\mathbf{A_0} + i \\omega \\mathbf{A_1}
+
+    The solutions for all sources and frequencies therefore lie close to the
+    rational Krylov subspace
+
+    .. math ::
+        \\mathcal{V} = \\text{span}\\{\\mathbf{A}(\\omega_1)^{-1} \\mathbf{Q},
+        \\dots, \\mathbf{A}(\\omega_k)^{-1} \\mathbf{Q}\\}
+
+    where :math:`\\omega_j` are a few shift frequencies and
+    :math:`\\mathbf{Q}` is an orthonormal basis for the right hand sides of
+    the survey. Only the shifts are factored; the fields at every frequency
+    of the survey are obtained from the Galerkin projection of the system
+    onto :math:`\\mathcal{V}`.
+
+    The sources only define their right hand side at their own frequency, so
+    :code:`fields` and :code:`dpred` are evaluated at the frequencies of the
+    survey. At any other frequency, e.g. for a dense frequency sweep,
+    :code:`solve` and :code:`residual_norms` take the right hand side
+    explicitly.
+
+    .. code:: python
+
+        rom = fdem.RationalKrylovReduction(simulation, n_shifts=4)
+        dpred = rom.dpred(m)
+        residuals = rom.residual_norms(freq)
+        u = rom.solve(freq_sweep, rhs)
+
+    :param BaseFDEMSimulation simulation: simulation to reduce
+    """
+
+    simulation = properties.Instance(
+        "the frequency domain simulation to reduce", BaseFDEMSimulation, required=True
+    )
+
+    shifts = properties.Array(
+        "frequencies (Hz) at which the full system is factored to build the "
+        "reduced basis. If not set, n_shifts frequencies log-spaced over the "
+        "survey frequencies are used",
+        dtype=float,
+        shape=("*",),
+    )
+
+    n_shifts = properties.Integer(
+        "number of shift frequencies used if shifts is not set", default=4, min=1
+    )
+
+    tolerance = properties.Float(
+        "relative singular value tolerance used to truncate the right hand "
+        "side and reduced bases",
+        default=1e-12,
+        min=0.0,
+    )
+
+    def __init__(self, simulation, **kwargs):
+        super(RationalKrylovReduction, self).__init__(**kwargs)
+        self.simulation = simulation
+
+    @property
+    def _shifts(self):
+        if self.shifts is not None:
+            return self.shifts
+        frequencies = self.simulation.survey.frequencies
+        fmin, fmax = np.min(frequencies), np.max(frequencies)
+        if fmin <= 0.0:
+            raise ValueError(
+                "Cannot log-space the shifts for a survey containing a zero "
+                "frequency, please set shifts explicitly"
+            )
+        return np.geomspace(fmin, fmax, self.n_shifts)
+
+    @staticmethod
+    def _orthonormalize(X, tol):
+        U, s, _ = np.linalg.svd(X, full_matrices=False)
+        if s.size == 0 or s[0] == 0.0:
+            return U[:, :0]
+        return U[:, s > tol * s[0]]
+
+    def _affine_decomposition(self):
+        """
+        Split the system matrix of the simulation as A0 + 1j * omega * A1
+        """
+        sim = self.simulation
+        A0 = sim.getA(0.0)
+        # getA at omega = 1 rad/s
+        A1 = (sim.getA(1.0 / (2.0 * np.pi)) - A0) * -1j
+        return A0.tocsr(), A1.tocsr()
+
+    def _model_changed(self):
+        model = self.simulation.model
+        previous = getattr(self, "_basis_model", None)
+        if getattr(self, "_V", None) is None:
+            return True
+        if isinstance(previous, np.ndarray) and isinstance(model, np.ndarray):
+            # any change of the model, however small, needs a new basis
+            return not np.array_equal(previous, model)
+        return previous is not model
+
+    def build(self, m=None):
+        """
+        Build the reduced basis and the projected system for a model.
+
+        :param numpy.ndarray m: inversion model (nP,)
+        """
+        sim = self.simulation
+        if m is not None:
+            sim.model = m
+
+        self._A0, self._A1 = self._affine_decomposition()
+
+        rhs = [sim.getRHS(freq) for freq in sim.survey.frequencies]
+        Q = self._orthonormalize(np.hstack(rhs), self.tolerance)
+
+        W = []
+        for shift in self._shifts:
+            Ainv = sim.Solver(sim.getA(shift), **sim.solver_opts)
+            W.append((Ainv * Q).reshape(Q.shape))
+            Ainv.clean()
+        V = self._orthonormalize(np.hstack(W), self.tolerance)
+
+        self._V = V
+        self._A0r = V.conj().T @ (self._A0 @ V)
+        self._A1r = V.conj().T @ (self._A1 @ V)
+        self._basis_model = (
+            sim.model.copy() if isinstance(sim.model, np.ndarray) else sim.model
+        )
+
+    @property
+    def basis(self):
+        """
+        Orthonormal basis of the reduced space (n, nBasis)
+        """
+        if self._model_changed():
+            self.build()
+        return self._V
+
+    def _getRHS(self, freq):
+        """
+        Right hand side of the sources of the survey at freq (n, nSrc)
+        """
+        if freq not in self.simulation.survey.frequencies:
+            raise ValueError(
+                "The survey has no sources at {:e} Hz, pass the right hand side "
+                "to evaluate the reduced system at other frequencies".format(freq)
+            )
+        return self.simulation.getRHS(freq)
+
+    def solve(self, freq, rhs=None):
+        """
+        Solution of the reduced system lifted back to the mesh.
+
+        :param float freq: frequency
+        :param numpy.ndarray rhs: right hand side (n, nSrc), defaults to the
+            right hand side of the sources at freq, which must then be a
+            frequency of the survey
+        :rtype: numpy.ndarray
+        :return: approximate solution (n, nSrc)
+        """
+        V = self.basis
+        if rhs is None:
+            rhs = self._getRHS(freq)
+        Ar = self._A0r + 1j * omega(freq) * self._A1r
+        y = np.linalg.solve(Ar, V.conj().T @ rhs)
+        return V @ y
+
+    def residual_norms(self, freq, u=None, rhs=None):
+        """
+        Relative residual of the reduced solution at a frequency
+
+        .. math ::
+            \\frac{\\|\\mathbf{A}(\\omega)\\mathbf{u_r} - \\mathbf{rhs}\\|}
+            {\\|\\mathbf{rhs}\\|}
+
+        This is a cheap error estimate: it only requires sparse matrix-vector
+        products with the full system.
+
+        :param float freq: frequency
+        :param numpy.ndarray u: reduced solution, computed if not provided
+        :param numpy.ndarray rhs: right hand side (n, nSrc), defaults to the
+            right hand side of the sources at freq, which must then be a
+            frequency of the survey
+        :rtype: numpy.ndarray
+        :return: relative residual for each source at freq (nSrc,)
+        """
+        self.basis  # make sure the decomposition is up to date
+        if rhs is None:
+            rhs = self._getRHS(freq)
+        if u is None:
+            u = self.solve(freq, rhs)
+        r = self._A0 @ u + 1j * omega(freq) * (self._A1 @ u) - rhs
+        return np.linalg.norm(r, axis=0) / np.linalg.norm(rhs, axis=0)
+
+    def fields(self, m=None):
+        """
+        Approximate fields from the reduced system.
+
+        :param numpy.ndarray m: inversion model (nP,)
+        :rtype: SimPEG.electromagnetics.frequency_domain.fields.FieldsFDEM
+        :return f: reduced forward solution
+        """
+        sim = self.simulation
+        if m is not None:
+            sim.model = m
+
+        f = sim.fieldsPair(sim)
+        for freq in sim.survey.frequencies:
+            Srcs = sim.survey.get_sources_by_frequency(freq)
+            f[Srcs, sim._solutionType] = self.solve(freq)
+        return f
+
+    def dpred(self, m=None, f=None):
+        """
+        Predicted data from the reduced system.
+
+        :param numpy.ndarray m: inversion model (nP,)
+        :param SimPEG.electromagnetics.frequency_domain.fields.FieldsFDEM f: fields
+        :rtype: numpy.ndarray
+        :return: dpred (nD,)
+        """
+        if f is None:
+            f = self.fields(m)
+        return self.simulation.dpred(f=f)
@@ -10,6 +10,7 @@ from ...utils import mkvc
 from ..base import BaseEMSimulation
 from ..utils import omega
 from .survey import Survey
+from .sources import _primary_magnetic_flux_densities
 from .fields import (
     FieldsFDEM,
     Fields3DElectricField,
@@ -64,6 +65,16 @@ class BaseFDEMSimulation(BaseEMSimulation):
 
     survey = properties.Instance("a survey object", Survey, required=True)
 
+    @property
+    def _clear_on_mu_update(self):
+        return super(BaseFDEMSimulation, self)._clear_on_mu_update + ["_source_terms"]
+
+    @properties.observer(["survey", "mesh"])
+    def _clear_source_terms_on_survey_update(self, change):
+        for attr in ["_source_terms", "_bPrimary_cache_dict"]:
+            if hasattr(self, attr):
+                delattr(self, attr)
+
     def fields(self, m=None):
         """
         Solve the forward problem for the fields.
@@ -178,16 +189,45 @@ class BaseFDEMSimulation(BaseEMSimulation):
 
         return mkvc(Jtv)
 
+    @property
+    def _bPrimary_cache(self):
+        """
+        Primary magnetic flux densities of the dipole and loop sources of the
+        survey, keyed by source geometry. They only depend on the mesh, so
+        they are evaluated once for all sources and kept until the survey or
+        mesh changes.
+        """
+        if self.survey is None:
+            return None
+        if getattr(self, "_bPrimary_cache_dict", None) is None:
+            self._bPrimary_cache_dict = _primary_magnetic_flux_densities(
+                self, self.survey.source_list
+            )
+        return self._bPrimary_cache_dict
+
     def getSourceTerm(self, freq):
         """
         Evaluates the sources for a given frequency and puts them in matrix
-        form
+        form. If all sources at the frequency only depend on the mesh and the
+        permeability, the source terms are cached until the permeability
+        changes, with the parameters of the sources they were evaluated for.
 
         :param float freq: Frequency
         :rtype: tuple
         :return: (s_m, s_e) (nE or nF, nSrc)
         """
+        if getattr(self, "_source_terms", None) is None:
+            self._source_terms = {}
         Srcs = self.survey.get_sources_by_frequency(freq)
+        keys = [getattr(src, "_source_term_key", None) for src in Srcs]
+        if freq in self._source_terms:
+            cached_keys, source_terms = self._source_terms[freq]
+            if cached_keys == keys:
+                return source_terms
+            # the sources changed in place: their primary fields as well
+            del self._source_terms[freq]
+            self._bPrimary_cache_dict = None
+
         if self._formulation == "EB":
             s_m = np.zeros((self.mesh.nF, len(Srcs)), dtype=complex)
             s_e = np.zeros((self.mesh.nE, len(Srcs)), dtype=complex)
@@ -201,6 +241,9 @@ class BaseFDEMSimulation(BaseEMSimulation):
             s_m[:, i] = s_m[:, i] + smi
             s_e[:, i] = s_e[:, i] + sei
 
+        if all(getattr(src, "_cache_source_term", False) for src in Srcs):
+            self._source_terms[freq] = (keys, (s_m, s_e))
+
         return s_m, s_e
 
 
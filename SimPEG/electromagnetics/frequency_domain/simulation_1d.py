@@ -0,0 +1,89 @@
+import numpy as np
+import properties
+from scipy.constants import mu_0
+
+from ..base_1d import BaseEM1DSimulation
+from .survey import Survey
+
+
+class Simulation1DLayered(BaseEM1DSimulation):
+    """
+    Frequency domain simulation of vertical magnetic dipole and circular loop
+    sources over a layered earth.
+
+    The receivers measure the real or imaginary part of the vertical magnetic
+    field ('h') or flux density ('b'), including the primary field of the
+    source, or the secondary flux density ('bSecondary').
+
+    .. code:: python
+
+        sim = Simulation1DLayered(
+            survey=survey, thicknesses=thicknesses, sigmaMap=maps.ExpMap()
+        )
+    """
+
+    survey = properties.Instance("a FDEM survey object", Survey, required=True)
+
+    def _field_projections(self):
+        """Component, scaling and primary field of each datum"""
+        imag, scale, primary = [], [], []
+        for src in self.survey.source_list:
+            for rx in src.receiver_list:
+                if rx.projField not in ["b", "bSecondary", "h"]:
+                    raise NotImplementedError(
+                        "{} receivers are not supported".format(rx.projField)
+                    )
+                imag.append(np.ones(rx.nD, dtype=bool) * (rx.component == "imag"))
+                scale.append((1.0 if rx.projField == "h" else mu_0) * np.ones(rx.nD))
+                primary.append(
+                    np.ones(rx.nD)
+                    * (rx.projField != "bSecondary" and rx.component != "imag")
+                )
+        return np.hstack(imag), np.hstack(scale), np.hstack(primary)
+
+    @property
+    def _data_location(self):
+        return np.arange(self.survey.nD)
+
+    @property
+    def _omega(self):
+        frequency = np.hstack(
+            [
+                src.frequency * np.ones(rx.nD)
+                for src in self.survey.source_list
+                for rx in src.receiver_list
+            ]
+        )
+        return 2.0 * np.pi * frequency[:, None]
+
+    def fields(self, m=None):
+        """
+        Secondary vertical magnetic field at the receiver locations
+
+        :param numpy.ndarray m: model
+        :rtype: numpy.ndarray
+        :return: complex field, one value per datum
+        """
+        if m is not None:
+            self.model = m
+        omega = self._omega
+        f = np.empty(self.survey.nD, dtype=complex)
+        for rows in self._chunks(1):
+            f[rows] = self._secondary_field(rows, omega[rows])[:, 0]
+        return f
+
+    def dpred(self, m=None, f=None):
+        if f is None:
+            f = self.fields(m)
+        imag, scale, primary = self._field_projections()
+        return scale * (
+            np.where(imag, f.imag, f.real) + primary * self.geometry["primary"]
+        )
+
+    def _layer_sensitivities(self):
+        omega = self._omega
+        J = np.empty((self.survey.nD, self.n_layer), dtype=complex)
+        for rows in self._chunks(1, derivative=True):
+            J[rows] = self._secondary_field(rows, omega[rows], derivative=True)[1][:, 0]
+        imag, scale, _ = self._field_projections()
+        return scale[:, None] * np.where(imag[:, None], J.imag, J.real)
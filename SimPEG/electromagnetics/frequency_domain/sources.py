@@ -20,6 +20,10 @@ class BaseFDEMSrc(BaseEMSrc):
 
     frequency = properties.Float("frequency of the source", min=0, required=True)
 
+    #: the source terms only depend on the mesh and the permeability, so the
+    #: simulation may cache them
+    _cache_source_term = False
+
     _ePrimary = None
     _bPrimary = None
     _hPrimary = None
@@ -30,6 +34,13 @@ class BaseFDEMSrc(BaseEMSrc):
         if frequency is not None:
             self.frequency = frequency
 
+    @property
+    def _source_term_key(self):
+        """
+        Sources with the same key have the same cached source terms
+        """
+        return (self, self.integrate)
+
     def bPrimary(self, simulation):
         """
         Primary magnetic flux density
@@ -141,6 +152,8 @@ class RawVec_e(BaseFDEMSrc):
     :param bool integrate: Integrate the source term (multiply by Me) [False]
     """
 
+    _cache_source_term = True
+
     def __init__(self, receiver_list=None, frequency=None, s_e=None, **kwargs):
         self._s_e = np.array(s_e, dtype=complex)
 
@@ -169,6 +182,8 @@ class RawVec_m(BaseFDEMSrc):
     :param bool integrate: Integrate the source term (multiply by Me) [False]
     """
 
+    _cache_source_term = True
+
     def __init__(self, receiver_list=None, frequency=None, s_m=None, **kwargs):
         self._s_m = np.array(s_m, dtype=complex)
         super(RawVec_m, self).__init__(
@@ -199,6 +214,8 @@ class RawVec(BaseFDEMSrc):
     :param bool integrate: Integrate the source term (multiply by Me) [False]
     """
 
+    _cache_source_term = True
+
     def __init__(
         self, receiver_list=None, frequency=None, s_m=None, s_e=None, **kwargs
     ):
@@ -305,13 +322,16 @@ class MagDipole(BaseFDEMSrc):
         location, "loc", new_name="location", removal_version="0.15.0"
     )
 
+    _cache_source_term = True
+
     def __init__(self, receiver_list=None, frequency=None, location=None, **kwargs):
         super(MagDipole, self).__init__(receiver_list, frequency=frequency, **kwargs)
         if location is not None:
             self.location = location
 
     def _srcFct(self, obsLoc, coordinates="cartesian"):
-        if getattr(self, "_dipole", None) is None:
+        if getattr(self, "_dipole_key", None) != self._primary_key:
+            self._dipole_key = self._primary_key
             self._dipole = MagneticDipoleWholeSpace(
                 mu=self.mu,
                 orientation=self.orientation,
@@ -320,13 +340,26 @@ class MagDipole(BaseFDEMSrc):
             )
         return self._dipole.vector_potential(obsLoc, coordinates=coordinates)
 
-    def bPrimary(self, simulation):
+    @property
+    def _primary_key(self):
         """
-        The primary magnetic flux density from a magnetic vector potential
+        Sources with the same key have the same primary fields
+        """
+        return (
+            type(self),
+            tuple(np.r_[self.location]),
+            tuple(np.r_[self.orientation]),
+            self.moment,
+            self.mu,
+        )
 
-        :param BaseFDEMSimulation simulation: FDEM simulation
-        :rtype: numpy.ndarray
-        :return: primary magnetic field
+    @property
+    def _source_term_key(self):
+        return self._primary_key
+
+    def _vector_potential(self, simulation):
+        """
+        Primary magnetic vector potential on the edges (EB) or faces (HJ)
         """
         formulation = simulation._formulation
         coordinates = "cartesian"
@@ -335,13 +368,11 @@ class MagDipole(BaseFDEMSrc):
             gridX = simulation.mesh.gridEx
             gridY = simulation.mesh.gridEy
             gridZ = simulation.mesh.gridEz
-            C = simulation.mesh.edgeCurl
 
         elif formulation == "HJ":
             gridX = simulation.mesh.gridFx
             gridY = simulation.mesh.gridFy
             gridZ = simulation.mesh.gridFz
-            C = simulation.mesh.edgeCurl.T
 
         if simulation.mesh._meshType == "CYL":
             coordinates = "cylindrical"
@@ -352,16 +383,37 @@ class MagDipole(BaseFDEMSrc):
                         "for cylindrical symmetry, the dipole must be oriented"
                         " in the Z direction"
                     )
-                a = self._srcFct(gridY)[:, 1]
-
-                return C * a
+                return self._srcFct(gridY)[:, 1]
 
         ax = self._srcFct(gridX, coordinates)[:, 0]
         ay = self._srcFct(gridY, coordinates)[:, 1]
         az = self._srcFct(gridZ, coordinates)[:, 2]
-        a = np.concatenate((ax, ay, az))
+        return np.concatenate((ax, ay, az))
 
-        return C * a
+    def _primary_curl(self, simulation):
+        if simulation._formulation == "EB":
+            return simulation.mesh.edgeCurl
+        return simulation.mesh.edgeCurl.T
+
+    def bPrimary(self, simulation):
+        """
+        The primary magnetic flux density from a magnetic vector potential.
+        If the simulation has evaluated the primary fields of its survey,
+        the cached values are returned.
+
+        :param BaseFDEMSimulation simulation: FDEM simulation
+        :rtype: numpy.ndarray
+        :return: primary magnetic field
+        """
+        cache = getattr(simulation, "_bPrimary_cache", None)
+        if cache is not None:
+            b = cache.get(self._primary_key)
+            if b is not None:
+                return b
+        return self._compute_bPrimary(simulation)
+
+    def _compute_bPrimary(self, simulation):
+        return self._primary_curl(simulation) * self._vector_potential(simulation)
 
     def hPrimary(self, simulation):
         """
@@ -472,7 +524,8 @@ class MagDipole_Bfield(MagDipole):
         )
 
     def _srcFct(self, obsLoc, coordinates="cartesian"):
-        if getattr(self, "_dipole", None) is None:
+        if getattr(self, "_dipole_key", None) != self._primary_key:
+            self._dipole_key = self._primary_key
             self._dipole = MagneticDipoleWholeSpace(
                 mu=self.mu,
                 orientation=self.orientation,
@@ -481,7 +534,7 @@ class MagDipole_Bfield(MagDipole):
             )
         return self._dipole.magnetic_flux_density(obsLoc, coordinates=coordinates)
 
-    def bPrimary(self, simulation):
+    def _compute_bPrimary(self, simulation):
         """
         The primary magnetic flux density from the analytic solution for
         magnetic fields from a dipole
@@ -548,8 +601,13 @@ class CircularLoop(MagDipole):
     def moment(self):
         return np.pi * self.radius ** 2 * self.current
 
+    @property
+    def _primary_key(self):
+        return super(CircularLoop, self)._primary_key + (self.radius, self.current)
+
     def _srcFct(self, obsLoc, coordinates="cartesian"):
-        if getattr(self, "_loop", None) is None:
+        if getattr(self, "_loop_key", None) != self._primary_key:
+            self._loop_key = self._primary_key
             self._loop = CircularLoopWholeSpace(
                 mu=self.mu,
                 location=self.location,
@@ -862,3 +920,108 @@ class PrimSecMappedSigma(BaseFDEMSrc):
             + (simulation.MeSigma - simulation.mesh.getEdgeInnerProduct(sigmaPrimary))
             * self.ePrimaryDeriv(simulation, v, adjoint=adjoint, f=f)
         )
+
+
+def _dipole_vector_potential(xyz, locations, orientations, moments, mus, component):
+    """
+    One component of the vector potential of many static magnetic dipoles
+
+    .. math::
+
+        \\vec{A}(\\vec{r}) = \\frac{\\mu}{4\\pi}
+        \\frac{\\vec{m}\\times\\vec{r}}{r^3}
+
+    :param numpy.ndarray xyz: observation locations (nPts, 3)
+    :param numpy.ndarray locations: dipole locations (nDip, 3)
+    :param numpy.ndarray orientations: unit dipole orientations (nDip, 3)
+    :param numpy.ndarray moments: dipole moments (nDip,)
+    :param numpy.ndarray mus: background permeabilities (nDip,)
+    :param int component: component of the vector potential (0, 1 or 2)
+    :rtype: numpy.ndarray
+    :return: vector potential component (nPts, nDip)
+    """
+    i, j = {0: (1, 2), 1: (2, 0), 2: (0, 1)}[component]
+    n_dip = locations.shape[0]
+    a = np.empty((xyz.shape[0], n_dip))
+    # bound the size of the (nPts, chunk, 3) distance array
+    chunk = max(1, int(2e6 // max(xyz.shape[0], 1)))
+    for start in range(0, n_dip, chunk):
+        ind = slice(start, start + chunk)
+        dxyz = xyz[:, None, :] - locations[None, ind, :]
+        r = np.sqrt((dxyz ** 2).sum(axis=2))
+        m_cross_r = (
+            orientations[ind, i] * dxyz[:, :, j] - orientations[ind, j] * dxyz[:, :, i]
+        )
+        a[:, ind] = (mus[ind] * moments[ind] / (4 * np.pi)) * m_cross_r / r ** 3
+    return a
+
+
+def _primary_magnetic_flux_densities(simulation, source_list):
+    """
+    Primary magnetic flux densities of all the dipole and loop sources in a
+    source list. Sources with the same geometry are only evaluated once, point
+    dipoles on cartesian meshes are evaluated together with broadcasting and
+    the discrete curl is applied to all vector potentials in a single sparse
+    product.
+
+    :param BaseFDEMSimulation simulation: FDEM simulation
+    :param list source_list: list of FDEM sources
+    :rtype: dict
+    :return: primary magnetic flux density keyed by the source geometry
+    """
+    unique = {}
+    for src in source_list:
+        if isinstance(src, MagDipole):
+            unique.setdefault(src._primary_key, src)
+
+    bPrimary = {}
+    dipoles, potentials = [], []
+    for key, src in unique.items():
+        if type(src)._compute_bPrimary is not MagDipole._compute_bPrimary:
+            bPrimary[key] = src._compute_bPrimary(simulation)
+        elif type(src) is MagDipole and simulation.mesh._meshType != "CYL":
+            dipoles.append(src)
+        else:
+            potentials.append(src)
+
+    keys, a = [], []
+    if len(dipoles) > 0:
+        if simulation._formulation == "EB":
+            grids = [
+                simulation.mesh.gridEx,
+                simulation.mesh.gridEy,
+                simulation.mesh.gridEz,
+            ]
+        elif simulation._formulation == "HJ":
+            grids = [
+                simulation.mesh.gridFx,
+                simulation.mesh.gridFy,
+                simulation.mesh.gridFz,
+            ]
+        locations = np.vstack([np.r_[src.location] for src in dipoles])
+        orientations = np.vstack([np.r_[src.orientation] for src in dipoles])
+        moments = np.array([src.moment for src in dipoles])
+        mus = np.array([src.mu for src in dipoles])
+        a.append(
+            np.vstack(
+                [
+                    _dipole_vector_potential(
+                        grid, locations, orientations, moments, mus, component
+                    )
+                    for component, grid in enumerate(grids)
+                ]
+            )
+        )
+        keys += [src._primary_key for src in dipoles]
+
+    if len(potentials) > 0:
+        a.append(np.vstack([src._vector_potential(simulation) for src in potentials]).T)
+        keys += [src._primary_key for src in potentials]
+
+    if len(keys) > 0:
+        C = unique[keys[0]]._primary_curl(simulation)
+        b = np.asfortranarray(C * np.hstack(a))
+        for i, key in enumerate(keys):
+            bPrimary[key] = b[:, i]
+
+    return bPrimary
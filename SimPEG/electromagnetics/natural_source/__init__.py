@@ -13,6 +13,8 @@ from . import receivers as Rx
 from .survey import Survey, Data
 from .fields import Fields1DPrimarySecondary, Fields3DPrimarySecondary
 from .simulation import Simulation1DPrimarySecondary, Simulation3DPrimarySecondary
+from .simulation_1d import Simulation1DLayered
+from .simulation_parallel import FrequencyParallelSimulation
 from . import sources
 from . import receivers
 
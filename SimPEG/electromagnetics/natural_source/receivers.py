@@ -6,11 +6,13 @@ Receivers for the NSEM problem
 from ...utils.code_utils import deprecate_class
 
 import numpy as np
+import scipy.sparse as sp
 from scipy.constants import mu_0
 import properties
 
 from ...utils import sdiag, mkvc
 from ...survey import BaseRx
+from ..utils import omega
 
 
 class BaseRxNSEM_Point(BaseRx):
@@ -337,7 +339,7 @@ class BaseRxNSEM_Point(BaseRx):
     def _aHd_uV(self, x):
         return (
             self._ahx_px_u(self._sDiag(self._ahy_py) * x)
-            + self._ahx_px_u(self._sDiag(self._ahy_py) * x)
+            + self._ahy_py_u(self._sDiag(self._ahx_px) * x)
             - self._ahy_px_u(self._sDiag(self._ahx_py) * x)
             - self._ahx_py_u(self._sDiag(self._ahy_px) * x)
         )
@@ -817,6 +819,184 @@ class Point3DTipper(BaseRxNSEM_Point):
         return rx_deriv_component
 
 
+class StationProjection(object):
+    """
+    Fused projection of the 3D impedance and tipper receivers of a source.
+
+    The receivers are reduced to their unique stations. One sparse operator
+    interpolates the electric field (x and y) and one the magnetic field
+    (x, y and z) of both polarizations at all the stations, from which the
+    impedances and tippers of all the receivers, and their derivatives,
+    follow in a few vectorized operations.
+
+    Each element of the impedance tensor and of the tipper is a ratio of
+    2 by 2 determinants of the fields of both polarizations,
+
+    .. math::
+
+        Z_{ij} = s \\frac{a_{px} b_{py} - a_{py} b_{px}}
+                        {h_{x, px} h_{y, py} - h_{x, py} h_{y, px}}
+
+    :param discretize.base.BaseMesh mesh: mesh of the simulation
+    :param list receiver_list: Point3DImpedance and Point3DTipper receivers
+    """
+
+    # Projected field components, in the order of the rows of the operators
+    _components = ["ex", "ey", "hx", "hy", "hz"]
+
+    # (a, b, s) of the numerator of each orientation, and of the denominator
+    _numerators = {
+        "xx": (0, 3, 1.0),
+        "xy": (0, 2, -1.0),
+        "yx": (1, 3, 1.0),
+        "yy": (1, 2, -1.0),
+        "zx": (4, 3, 1.0),
+        "zy": (4, 2, -1.0),
+    }
+    _denominator = (2, 3, 1.0)
+
+    def __init__(self, mesh, receiver_list):
+        self.mesh = mesh
+        self.receiver_list = list(receiver_list)
+
+        # Stations are the unique pairs of electric and magnetic locations
+        locs = [np.hstack([rx._locs_e(), rx._locs_b()]) for rx in self.receiver_list]
+        stations, index = np.unique(np.vstack(locs), axis=0, return_inverse=True)
+        self._station_index = np.split(
+            mkvc(index), np.cumsum([len(loc) for loc in locs])[:-1]
+        )
+        self.n_stations = stations.shape[0]
+        locs_e, locs_b = stations[:, : mesh.dim], stations[:, mesh.dim :]
+
+        self.Pe = sp.vstack(
+            [
+                mesh.getInterpolationMat(locs_e, "Ex"),
+                mesh.getInterpolationMat(locs_e, "Ey"),
+            ]
+        ).tocsr()
+        # hz is measured at the electric locations, as in Point3DTipper
+        self.Pb = sp.vstack(
+            [
+                mesh.getInterpolationMat(locs_b, "Fx"),
+                mesh.getInterpolationMat(locs_b, "Fy"),
+                mesh.getInterpolationMat(locs_e, "Fz"),
+            ]
+        ).tocsr()
+        # b = -1/(i omega) curl(e): the magnetic fields wrt the solution
+        self.PbC = (self.Pb * mesh.edgeCurl).tocsr()
+
+    def _fields(self, src, f):
+        """
+        Projected fields, shape (5, n_stations, 2) for ex, ey, hx, hy, hz
+        and both polarizations
+        """
+        e = np.c_[mkvc(f[src, "e_px"]), mkvc(f[src, "e_py"])]
+        b = np.c_[mkvc(f[src, "b_px"]), mkvc(f[src, "b_py"])]
+        return np.vstack([self.Pe * e, self.Pb * b / mu_0]).reshape(
+            (5, self.n_stations, 2)
+        )
+
+    def _bFactor(self, src):
+        return -1.0 / (1j * omega(src.frequency) * mu_0)
+
+    @staticmethod
+    def _det(U, a, b, s):
+        return s * (U[a, :, 0] * U[b, :, 1] - U[a, :, 1] * U[b, :, 0])
+
+    @staticmethod
+    def _detDeriv(U, dU, a, b, s):
+        return s * (
+            dU[a, :, 0] * U[b, :, 1]
+            + U[a, :, 0] * dU[b, :, 1]
+            - dU[a, :, 1] * U[b, :, 0]
+            - U[a, :, 1] * dU[b, :, 0]
+        )
+
+    @staticmethod
+    def _detDerivAdjoint(U, G, a, b, s, w):
+        # accumulates the adjoint of _detDeriv applied to w in G
+        w = s * w
+        G[a, :, 0] += w * U[b, :, 1]
+        G[b, :, 1] += w * U[a, :, 0]
+        G[a, :, 1] -= w * U[b, :, 0]
+        G[b, :, 0] -= w * U[a, :, 1]
+
+    def _orientations(self):
+        return sorted(set(rx.orientation for rx in self.receiver_list))
+
+    def _transferFunctions(self, U):
+        D = self._det(U, *self._denominator)
+        Z = {o: self._det(U, *self._numerators[o]) / D for o in self._orientations()}
+        return Z, D
+
+    def eval(self, src, f, return_complex=False):
+        """
+        Project the fields of a source to the data of all the receivers.
+
+        :param SimPEG.electromagnetics.frequency_domain.sources.BaseFDEMSrc src: NSEM source
+        :param SimPEG.electromagnetics.frequency_domain.fields.FieldsFDEM f: NSEM fields object of the source
+        :param bool return_complex: return the complex impedances and tippers
+        :rtype: list
+        :return: data of each receiver
+        """
+        Z, _ = self._transferFunctions(self._fields(src, f))
+        data = []
+        for rx, ind in zip(self.receiver_list, self._station_index):
+            Zij = Z[rx.orientation][ind]
+            data.append(Zij if return_complex else getattr(Zij, rx.component))
+        return data
+
+    def evalDeriv(self, src, f, v, adjoint=False):
+        """
+        The derivative of the projection of all the receivers wrt u.
+
+        The adjoint takes the data of the imaginary components with a factor
+        -i, the real part of its product with the adjoint of the derivative
+        of the solution wrt the model is then the sensitivity.
+
+        :param SimPEG.electromagnetics.frequency_domain.sources.BaseFDEMSrc src: NSEM source
+        :param SimPEG.electromagnetics.frequency_domain.fields.FieldsFDEM f: NSEM fields object of the source
+        :param numpy.ndarray v: derivative of the solution, (nE, 2) for both polarizations (adjoint=False), or list of vectors, one per receiver (adjoint=True)
+        :rtype: list or numpy.ndarray
+        :return: derivative of the data of each receiver (adjoint=False) or (nE, 2) for both polarizations (adjoint=True)
+        """
+        U = self._fields(src, f)
+        Z, D = self._transferFunctions(U)
+
+        if not adjoint:
+            dU = np.vstack([self.Pe * v, self.PbC * v * self._bFactor(src)]).reshape(
+                (5, self.n_stations, 2)
+            )
+            dD = self._detDeriv(U, dU, *self._denominator)
+            dZ = {
+                o: (self._detDeriv(U, dU, *self._numerators[o]) - Z[o] * dD) / D
+                for o in Z
+            }
+            return [
+                getattr(dZ[rx.orientation][ind], rx.component)
+                for rx, ind in zip(self.receiver_list, self._station_index)
+            ]
+
+        # Sum the data of the receivers of each orientation at the stations
+        W = {o: np.zeros(self.n_stations, dtype=complex) for o in Z}
+        for rx, ind, v_rx in zip(self.receiver_list, self._station_index, v):
+            if rx.component == "imag":
+                v_rx = -1j * v_rx
+            np.add.at(W[rx.orientation], ind, v_rx)
+
+        G = np.zeros((5, self.n_stations, 2), dtype=complex)
+        wD = np.zeros(self.n_stations, dtype=complex)
+        for o, w in W.items():
+            w = w / D
+            self._detDerivAdjoint(U, G, *self._numerators[o], w)
+            wD -= Z[o] * w
+        self._detDerivAdjoint(U, G, *self._denominator, wD)
+
+        G = G.reshape((5 * self.n_stations, 2))
+        n_e = 2 * self.n_stations
+        return self.Pe.T * G[:n_e] + self.PbC.T * G[n_e:] * self._bFactor(src)
+
+
 ############
 # Deprecated
 ############
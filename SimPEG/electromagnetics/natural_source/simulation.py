@@ -1,13 +1,16 @@
 import time
 import sys
 import numpy as np
+import properties
 from scipy.constants import mu_0
 from ...utils.code_utils import deprecate_class
 
 from ...utils import mkvc
+from ...utils.solver_utils import SolverCache
 from ..frequency_domain.simulation import BaseFDEMSimulation
 from ..utils import omega
 from .survey import Data
+from .receivers import Point3DImpedance, Point3DTipper, StationProjection
 from .fields import Fields1DPrimarySecondary, Fields3DPrimarySecondary
 
 
@@ -29,6 +32,173 @@ class BaseNSEMSimulation(BaseFDEMSimulation):
     # Notes:
     # Use the fields and devs methods from BaseFDEMProblem
 
+    clean_on_model_update = [
+        "_A_solvers"
+    ]  #: clear the factors of the system matrices on any model updates
+
+    #: True if getA is symmetric, its factors then also serve the adjoint
+    _A_symmetric = True
+
+    max_factorizations = properties.Integer(
+        "maximum number of factorizations of the system matrix kept in memory, "
+        "by default one per frequency. They are shared by fields, Jvec and "
+        "Jtvec and kept between calls until the model changes",
+        min=1,
+    )
+
+    @property
+    def _clean_on_mu_update(self):
+        return super(BaseNSEMSimulation, self)._clean_on_mu_update + ["_A_solvers"]
+
+    @property
+    def _clean_on_sigma_update(self):
+        return super(BaseNSEMSimulation, self)._clean_on_sigma_update + ["_A_solvers"]
+
+    def _getSolver(self, freq, adjoint=False):
+        """
+        Factorization of getA(freq), or of its transpose for the adjoint. It
+        is kept for the current model (up to max_factorizations of them).
+
+        :param float freq: frequency
+        :param bool adjoint: factor the transpose
+        """
+        if getattr(self, "_A_solvers", None) is None:
+            self._A_solvers = SolverCache()
+        self._A_solvers.max_size = self.max_factorizations
+
+        adjoint = adjoint and not self._A_symmetric
+
+        def factor():
+            if self.verbose:
+                print("Factoring...   (frequency = {:e})".format(freq))
+            A = self.getA(freq)
+            if adjoint:
+                A = A.T
+            return self.Solver(A, **self.solver_opts)
+
+        return self._A_solvers.get((freq, adjoint), factor)
+
+    @properties.observer(["survey", "mesh"])
+    def _clear_station_projections_on_survey_update(self, change):
+        if hasattr(self, "_station_projections"):
+            del self._station_projections
+
+    def _getStationProjection(self, src):
+        """
+        Fused projection of the 3D impedance and tipper receivers of a
+        source, None if it has none. It only depends on the receivers, so it
+        is kept for the sources that share them.
+        """
+        receivers = tuple(
+            rx
+            for rx in src.receiver_list
+            if isinstance(rx, (Point3DImpedance, Point3DTipper))
+        )
+        if len(receivers) == 0:
+            return None
+        if getattr(self, "_station_projections", None) is None:
+            self._station_projections = {}
+        if receivers not in self._station_projections:
+            self._station_projections[receivers] = StationProjection(
+                self.mesh, receivers
+            )
+        return self._station_projections[receivers]
+
+    def _projectFields(self, src, f):
+        """
+        Data of each receiver of a source
+
+        :param SimPEG.electromagnetics.frequency_domain.sources.BaseFDEMSrc src: NSEM source
+        :param SimPEG.electromagnetics.frequency_domain.fields.FieldsFDEM f: NSEM fields object
+        :rtype: list
+        :return: data of each receiver of the source
+        """
+        projection = self._getStationProjection(src)
+        data = {}
+        if projection is not None:
+            data.update(zip(projection.receiver_list, projection.eval(src, f)))
+        return [
+            data[rx] if rx in data else rx.eval(src, self.mesh, f)
+            for rx in src.receiver_list
+        ]
+
+    def _projectFieldsDeriv(self, src, f, du_dm_v, v=None, adjoint=False):
+        """
+        Derivative of the data of the receivers of a source wrt the solution
+
+        :param SimPEG.electromagnetics.frequency_domain.sources.BaseFDEMSrc src: NSEM source
+        :param SimPEG.electromagnetics.frequency_domain.fields.FieldsFDEM f: NSEM fields object
+        :param numpy.ndarray du_dm_v: derivative of the solution (adjoint=False)
+        :param SimPEG.electromagnetics.natural_source.survey.Data v: data vector (adjoint=True)
+        :param bool adjoint: adjoint?
+        :rtype: list or numpy.ndarray
+        :return: derivative of the data of each receiver (adjoint=False), or
+            the adjoint for both polarizations, whose product with the
+            adjoint of the derivative of the solution has the sensitivities
+            as real part (adjoint=True)
+        """
+        projection = self._getStationProjection(src)
+        fused = [] if projection is None else projection.receiver_list
+
+        if not adjoint:
+            deriv = {}
+            if projection is not None:
+                deriv.update(
+                    zip(
+                        fused,
+                        projection.evalDeriv(
+                            src, f, du_dm_v.reshape((-1, 2), order="F")
+                        ),
+                    )
+                )
+            return [
+                deriv[rx]
+                if rx in deriv
+                else rx.evalDeriv(src, self.mesh, f, mkvc(du_dm_v))
+                for rx in src.receiver_list
+            ]
+
+        PTv = 0.0
+        if projection is not None:
+            PTv = projection.evalDeriv(
+                src, f, [mkvc(v[src, rx]) for rx in fused], adjoint=True
+            )
+        for rx in src.receiver_list:
+            if rx in fused:
+                continue
+            PTv_rx = rx.evalDeriv(src, self.mesh, f, mkvc(v[src, rx]), adjoint=True)
+            if rx.component == "real":
+                PTv = PTv + PTv_rx
+            elif rx.component == "imag":
+                PTv = PTv - PTv_rx
+            else:
+                raise Exception("Must be real or imag")
+        return PTv
+
+    def dpred(self, m=None, f=None):
+        """
+        Predicted data of the model, the receivers are projected by source
+
+        :param numpy.ndarray m: inversion model (nP,)
+        :param SimPEG.electromagnetics.frequency_domain.fields.FieldsFDEM f (optional): NSEM fields object, if not given it is calculated
+        :rtype: numpy.ndarray
+        :return: predicted data (nData,)
+        """
+        if self.survey is None:
+            raise AttributeError(
+                "The survey has not yet been set and is required to compute "
+                "data. Please set the survey for the simulation: "
+                "simulation.survey = survey"
+            )
+        if f is None:
+            f = self.fields(m)
+
+        data = Data(self.survey)
+        for src in self.survey.source_list:
+            for rx, d in zip(src.receiver_list, self._projectFields(src, f)):
+                data[src, rx] = d
+        return mkvc(data)
+
     # NEED to clean up the Jvec and Jtvec to use Zero and Identities for None components.
     def Jvec(self, m, v, f=None):
         """
@@ -51,10 +221,8 @@ class BaseNSEMSimulation(BaseFDEMSimulation):
 
         # Loop all the frequenies
         for freq in self.survey.frequencies:
-            # Get the system
-            A = self.getA(freq)
-            # Factor
-            Ainv = self.Solver(A, **self.solver_opts)
+            # Get the factored system
+            Ainv = self._getSolver(freq)
 
             for src in self.survey.get_sources_by_frequency(freq):
                 # We need fDeriv_m = df/du*du/dm + df/dm
@@ -73,13 +241,10 @@ class BaseNSEMSimulation(BaseFDEMSimulation):
                 )  # Size: nE,2 (u_px,u_py) in the columns.
                 # Calculate du/dm*v
                 du_dm_v = Ainv * (-dA_dm_v + dRHS_dm_v)
-                # Calculate the projection derivatives
-                for rx in src.receiver_list:
-                    # Calculate dP/du*du/dm*v
-                    Jv[src, rx] = rx.evalDeriv(
-                        src, self.mesh, f, mkvc(du_dm_v)
-                    )  # wrt uPDeriv_u(mkvc(du_dm))
-            Ainv.clean()
+                # Calculate the projection derivatives dP/du*du/dm*v
+                Jv_src = self._projectFieldsDeriv(src, f, du_dm_v)
+                for rx, Jv_rx in zip(src.receiver_list, Jv_src):
+                    Jv[src, rx] = Jv_rx
         # Return the vectorized sensitivities
         return mkvc(Jv)
 
@@ -106,37 +271,22 @@ class BaseNSEMSimulation(BaseFDEMSimulation):
         Jtv = np.zeros(m.size)
 
         for freq in self.survey.frequencies:
-            AT = self.getA(freq).T
-
-            ATinv = self.Solver(AT, **self.solver_opts)
+            ATinv = self._getSolver(freq, adjoint=True)
 
             for src in self.survey.get_sources_by_frequency(freq):
                 # u_src needs to have both polarizations
                 u_src = f[src, :]
 
-                for rx in src.receiver_list:
-                    # Get the adjoint evalDeriv
-                    # PTv needs to be nE,2
-                    PTv = rx.evalDeriv(
-                        src, self.mesh, f, mkvc(v[src, rx]), adjoint=True
-                    )  # wrt f, need possibility wrt m
-                    # Get the
-                    dA_duIT = mkvc(ATinv * PTv)  # Force (nU,) shape
-                    dA_dmT = self.getADeriv(freq, u_src, dA_duIT, adjoint=True)
-                    dRHS_dmT = self.getRHSDeriv(freq, dA_duIT, adjoint=True)
-                    # Make du_dmT
-                    du_dmT = -dA_dmT + dRHS_dmT
-                    # Select the correct component
-                    # du_dmT needs to be of size (nP,) number of model parameters
-                    real_or_imag = rx.component
-                    if real_or_imag == "real":
-                        Jtv += np.array(du_dmT, dtype=complex).real
-                    elif real_or_imag == "imag":
-                        Jtv += -np.array(du_dmT, dtype=complex).real
-                    else:
-                        raise Exception("Must be real or imag")
-            # Clean the factorization, clear memory.
-            ATinv.clean()
+                # Get the adjoint of the projections of all the receivers
+                # PTv needs to be nE,2
+                PTv = self._projectFieldsDeriv(src, f, None, v=v, adjoint=True)
+                dA_duIT = mkvc(ATinv * PTv)  # Force (nU,) shape
+                dA_dmT = self.getADeriv(freq, u_src, dA_duIT, adjoint=True)
+                dRHS_dmT = self.getRHSDeriv(freq, dA_duIT, adjoint=True)
+                # Make du_dmT
+                du_dmT = -dA_dmT + dRHS_dmT
+                # du_dmT needs to be of size (nP,) number of model parameters
+                Jtv += np.array(du_dmT, dtype=complex).real
         return Jtv
 
 
@@ -298,9 +448,8 @@ class Simulation1DPrimarySecondary(BaseNSEMSimulation):
                 startTime = time.time()
                 print("Starting work for {:.3e}".format(freq))
                 sys.stdout.flush()
-            A = self.getA(freq)
             rhs = self.getRHS(freq)
-            Ainv = self.Solver(A, **self.solver_opts)
+            Ainv = self._getSolver(freq)
             e_s = Ainv * rhs
 
             # Store the fields
@@ -464,10 +613,9 @@ class Simulation3DPrimarySecondary(BaseNSEMSimulation):
                 startTime = time.time()
                 print("Starting work for {:.3e}".format(freq))
                 sys.stdout.flush()
-            A = self.getA(freq)
             rhs = self.getRHS(freq)
             # Solve the system
-            Ainv = self.Solver(A, **self.solver_opts)
+            Ainv = self._getSolver(freq)
             e_s = Ainv * rhs
 
             # Store the fields
@@ -481,110 +629,8 @@ class Simulation3DPrimarySecondary(BaseNSEMSimulation):
             if self.verbose:
                 print("Ran for {:f} seconds".format(time.time() - startTime))
                 sys.stdout.flush()
-            Ainv.clean()
         return F
 
-    # def fields2(self, freq):
-    #     """
-    #     Function to calculate all the fields for the model m.
-    #
-    #     :param numpy.ndarray (nC,) m: Conductivity model
-    #     :rtype: SimPEG.electromagnetics.frequency_domain.fields.FieldsFDEM
-    #     :return: Fields object with of the solution
-    #
-    #     """
-    #     """
-    #     Function to calculate all the fields for the model m.
-    #
-    #     :param numpy.ndarray (nC,) m: Conductivity model
-    #     :rtype: SimPEG.electromagnetics.frequency_domain.fields.FieldsFDEM
-    #     :return: Fields object with of the solution
-    #
-    #     """
-    #     A = self.getA(freq)
-    #     rhs = self.getRHS(freq)
-    #     # Solve the system
-    #     Ainv = self.Solver(A, **self.solver_opts)
-    #     e_s = Ainv * rhs
-    #
-    #     # Store the fields
-    #     # Src = self.survey.get_sources_by_frequency(freq)[0]
-    #     # Store the fields
-    #     # Use self._solutionType
-    #     # self.F[Src, 'e_pxSolution'] = e_s[:, 0]
-    #     # self.F[Src, 'e_pySolution'] = e_s[:, 1]
-    #         # Note curl e = -iwb so b = -curl/iw
-    #
-    #     Ainv.clean()
-    #     return e_s
-    #
-    # def fieldsMulti(self, freq):
-    #     """
-    #     Function to calculate all the fields for the model m.
-    #
-    #     :param numpy.ndarray (nC,) m: Conductivity model
-    #     :rtype: SimPEG.electromagnetics.frequency_domain.fields.FieldsFDEM
-    #     :return: Fields object with of the solution
-    #
-    #     """
-    #     """
-    #     Function to calculate all the fields for the model m.
-    #
-    #     :param numpy.ndarray (nC,) m: Conductivity model
-    #     :rtype: SimPEG.electromagnetics.frequency_domain.fields.FieldsFDEM
-    #     :return: Fields object with of the solution
-    #
-    #     """
-    #     A = self.getA(freq)
-    #     rhs = self.getRHS(freq)
-    #     # Solve the system
-    #     Ainv = self.Solver(A, **self.solver_opts)
-    #     e_s = Ainv * rhs
-    #
-    #     # Store the fields
-    #     Src = self.survey.get_sources_by_frequency(freq)[0]
-    #     # Store the fields
-    #     # Use self._solutionType
-    #     self.F[Src, 'e_pxSolution'] = e_s[:, 0]
-    #     self.F[Src, 'e_pySolution'] = e_s[:, 1]
-    #         # Note curl e = -iwb so b = -curl/iw
-    #     Ainv.clean()
-    #
-    # def fieldsParallel(self, m=None):
-    #     parallel = 'dask'
-    #
-    #     if m is not None:
-    #         self.model = m
-    #
-    #     F = self.fieldsPair(self)
-    #
-    #     if parallel == 'dask':
-    #         output = []
-    #         f_ = dask.delayed(self.fields2, pure=True)
-    #         for freq in self.survey.frequencies:
-    #             output.append(da.from_delayed(f_(freq), (self.model.size, 2), dtype=float))
-    #
-    #         e_s = da.hstack(output).compute()
-    #         cnt = 0
-    #         for freq in self.survey.frequencies:
-    #             index = cnt * 2
-    #             # Store the fields
-    #             Src = self.survey.get_sources_by_frequency(freq)[0]
-    #             # Store the fields
-    #             # Use self._solutionType
-    #             F[Src, 'e_pxSolution'] = e_s[:, index]
-    #             F[Src, 'e_pySolution'] = e_s[:, index + 1]
-    #             cnt += 1
-    #
-    #     elif parallel == 'multipro':
-    #         self.F = F
-    #         pool = multiprocessing.Pool()
-    #         pool.map(self.fieldsMulti, self.survey.frequencies)
-    #         pool.close()
-    #         pool.join()
-    #
-    #     return F
-
 
 ############
 # Deprecated
@@ -0,0 +1,188 @@
+import numpy as np
+import properties
+import scipy.sparse as sp
+
+from ...utils import mkvc
+from ..base import BaseEMSimulation
+from .receivers import Point1DImpedance, Point3DImpedance, Point3DTipper
+from .survey import Survey
+from .utils.analytic_1d import getImpedances
+
+
+class Simulation1DLayered(BaseEMSimulation):
+    """
+    Natural source simulation of a layered earth below each station.
+
+    The impedances of all the stations and frequencies are computed at once
+    with the analytic recursion of
+    :func:`SimPEG.electromagnetics.natural_source.utils.getImpedances`, as
+    are their derivatives. Receivers at the same horizontal location form a
+    station. The conductivity model is either the same for all the stations
+    (n_layer values) or one set of layers per station, stitched together
+    (n_station * n_layer values, station by station), for a fast 1D
+    inversion of large MT arrays.
+
+    Over a 1D earth, Zyx = -Zxy = Z (Point1DImpedance measures Z), and Zxx,
+    Zyy and the tippers are zero.
+
+    .. code:: python
+
+        sim = Simulation1DLayered(
+            survey=survey, thicknesses=thicknesses, sigmaMap=maps.ExpMap()
+        )
+    """
+
+    survey = properties.Instance("a NSEM survey object", Survey, required=True)
+
+    thicknesses = properties.Array(
+        "thicknesses of the layers, from the top. The last layer is a half-space",
+        shape=("*",),
+        dtype=float,
+        default=np.array([]),
+    )
+
+    @properties.observer("survey")
+    def _clear_geometry_on_update(self, change):
+        for name in ["_geometry", "_Jmatrix"]:
+            if hasattr(self, name):
+                delattr(self, name)
+
+    @property
+    def deleteTheseOnModelUpdate(self):
+        toDelete = super(Simulation1DLayered, self).deleteTheseOnModelUpdate
+        return toDelete + ["_Jmatrix"]
+
+    @property
+    def n_layer(self):
+        """number of layers, including the half-space"""
+        return len(self.thicknesses) + 1
+
+    @property
+    def geometry(self):
+        """
+        Projection of the impedances to the data, a dict of arrays with one
+        value per datum:
+
+        - station: station of the receiver
+        - frequency: index of the frequency in :code:`frequencies`
+        - sign: factor of the impedance
+        - imag: True for the imaginary component
+        """
+        if getattr(self, "_geometry", None) is None:
+            rows = {name: [] for name in ["frequency", "sign", "imag"]}
+            locations = []
+            frequencies = self.frequencies
+            for src in self.survey.source_list:
+                iFreq = np.searchsorted(frequencies, src.frequency)
+                for rx in src.receiver_list:
+                    if isinstance(rx, Point1DImpedance):
+                        sign = 1.0
+                    elif isinstance(rx, Point3DImpedance):
+                        sign = {"xy": -1.0, "yx": 1.0}.get(rx.orientation, 0.0)
+                    elif isinstance(rx, Point3DTipper):
+                        sign = 0.0
+                    else:
+                        raise NotImplementedError(
+                            "{} receivers are not supported".format(type(rx).__name__)
+                        )
+                    loc = rx._locs_e() if hasattr(rx, "_locs_e") else rx.locations
+                    loc = np.atleast_2d(loc)
+                    if loc.shape[1] >= 3:
+                        locations.append(loc[:, :2])
+                    else:
+                        locations.append(np.zeros((len(loc), 2)))
+                    rows["frequency"].append(iFreq * np.ones(rx.nD, dtype=int))
+                    rows["sign"].append(sign * np.ones(rx.nD))
+                    rows["imag"].append(
+                        np.ones(rx.nD, dtype=bool) * (rx.component == "imag")
+                    )
+
+            # Stations in the order they first appear in the survey
+            _, first, inverse = np.unique(
+                np.vstack(locations), axis=0, return_index=True, return_inverse=True
+            )
+            order = np.argsort(np.argsort(first))
+            geometry = {name: np.hstack(value) for name, value in rows.items()}
+            geometry["station"] = order[mkvc(inverse)]
+            self._geometry = geometry
+        return self._geometry
+
+    @property
+    def frequencies(self):
+        """unique frequencies of the survey"""
+        return np.unique([src.frequency for src in self.survey.source_list])
+
+    @property
+    def n_station(self):
+        """number of stations"""
+        return self.geometry["station"].max() + 1
+
+    @property
+    def sigma_layers(self):
+        """Conductivities of the layers of each station, (n_station, n_layer)"""
+        sigma = np.atleast_1d(self.sigma).astype(float)
+        if sigma.size == self.n_layer:
+            return np.tile(sigma, (self.n_station, 1))
+        if sigma.size == self.n_station * self.n_layer:
+            return sigma.reshape((self.n_station, self.n_layer))
+        raise ValueError(
+            "sigma has {} values, expected {} (n_layer) or {} (n_station * "
+            "n_layer)".format(sigma.size, self.n_layer, self.n_station * self.n_layer)
+        )
+
+    def fields(self, m=None):
+        """
+        Impedances of the stations
+
+        :param numpy.ndarray m: model
+        :rtype: numpy.ndarray
+        :return: complex impedances (n_station, n_frequency)
+        """
+        if m is not None:
+            self.model = m
+        return getImpedances(self.sigma_layers, self.thicknesses, self.frequencies)
+
+    def dpred(self, m=None, f=None):
+        if f is None:
+            f = self.fields(m)
+        geometry = self.geometry
+        Z = geometry["sign"] * f[geometry["station"], geometry["frequency"]]
+        return np.where(geometry["imag"], Z.imag, Z.real)
+
+    def getJ(self, m, f=None):
+        """
+        Sensitivities of the data with respect to sigma. They are stored
+        until the model changes.
+        """
+        self.model = m
+        if getattr(self, "_Jmatrix", None) is None:
+            geometry = self.geometry
+            _, dZ = getImpedances(
+                self.sigma_layers, self.thicknesses, self.frequencies, derivative=True
+            )
+            J = (
+                geometry["sign"][:, None]
+                * dZ[geometry["station"], geometry["frequency"]]
+            )
+            J = np.where(geometry["imag"][:, None], J.imag, J.real)
+
+            if np.atleast_1d(self.sigma).size != self.n_layer:
+                # one set of layers per station: J is block sparse
+                cols = geometry["station"][:, None] * self.n_layer + np.arange(
+                    self.n_layer
+                )
+                rows = np.repeat(np.arange(len(J)), self.n_layer)
+                J = sp.csr_matrix(
+                    (J.ravel(), (rows, cols.ravel())),
+                    shape=(len(J), self.n_station * self.n_layer),
+                )
+            self._Jmatrix = J
+        return self._Jmatrix
+
+    def Jvec(self, m, v, f=None):
+        J = self.getJ(m, f=f)
+        return mkvc(J.dot(self.sigmaDeriv * v))
+
+    def Jtvec(self, m, v, f=None):
+        J = self.getJ(m, f=f)
+        return mkvc(self.sigmaDeriv.T * (J.T.dot(mkvc(v))))
@@ -0,0 +1,41 @@
+import numpy as np
+import properties
+
+from ..base_parallel import BaseSourceParallelSimulation
+from .simulation import BaseNSEMSimulation
+
+
+class FrequencyParallelSimulation(BaseSourceParallelSimulation):
+    """
+    Distributes the frequencies of a NSEM simulation over workers.
+
+    The frequencies are split in groups, one per worker, and each worker
+    simulates the sources of its frequencies. It holds a copy of the
+    simulation with its own factorizations, one per frequency, and fields.
+    :code:`fields`, :code:`dpred`, :code:`Jvec` and :code:`Jtvec` scatter
+    the model (and vector) to the workers and gather their results in the
+    order of the data of the survey.
+
+    .. code:: python
+
+        sim_parallel = FrequencyParallelSimulation(sim, n_cpu=8)
+        d = sim_parallel.dpred(m)
+        sim_parallel.close()
+
+    :param BaseNSEMSimulation simulation: simulation of the complete survey
+    """
+
+    simulation = properties.Instance(
+        "NSEM simulation of the complete survey", BaseNSEMSimulation, required=True
+    )
+
+    @property
+    def source_partition(self):
+        """Indices of the sources of each worker, grouped by frequency"""
+        frequencies = np.array([src.frequency for src in self.survey.source_list])
+        unique = np.unique(frequencies)
+        return [
+            np.nonzero(np.isin(frequencies, group))[0]
+            for group in np.array_split(unique, min(self.n_cpu, len(unique)))
+            if len(group) > 0
+        ]
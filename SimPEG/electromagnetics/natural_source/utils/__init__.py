@@ -8,7 +8,7 @@ NOTE: These utilities are not well test, use with care
 from __future__ import absolute_import
 
 from .solutions_1d import get1DEfields  # Add the names of the functions
-from .analytic_1d import getEHfields, getImpedance
+from .analytic_1d import getEHfields, getImpedance, getImpedances
 from .data_utils import (
     appResPhs,
     rec_to_ndarr,
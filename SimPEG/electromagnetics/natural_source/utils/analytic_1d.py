@@ -106,31 +106,74 @@ def getImpedance(m1d, sigma, freq):
 
 
     """
+    # The mesh goes up from the half-space, which has the conductivity of
+    # the deepest cell
+    sigma = np.asarray(sigma)
+    sigma_layers = np.r_[sigma[::-1], sigma[0]]
+    return getImpedances(sigma_layers, m1d.hx[::-1], freq)[0]
 
-    # Initiate the impedances
-    Z1d = np.empty(len(freq), dtype="complex")
-    h = m1d.hx  # vectorNx[:-1]
-    # Start the process
-    for nrFr, fr in enumerate(freq):
-        om = 2 * np.pi * fr
-        Zall = np.empty(len(h) + 1, dtype="complex")
-        # Calculate the impedance for the bottom layer
-        Zall[0] = (mu_0 * om) / np.sqrt(
-            mu_0 * eps_0 * (om) ** 2 - 1j * mu_0 * sigma[0] * om
-        )
 
-        for nr, hi in enumerate(h):
-            # Calculate the wave number
-            # print(nr,sigma[nr])
-            k = np.sqrt(mu_0 * eps_0 * om ** 2 - 1j * mu_0 * sigma[nr] * om)
-            Z = (mu_0 * om) / k
+def getImpedances(sigma, thicknesses, freq, derivative=False):
+    """Analytic solution for MT 1D layered earths. Returns the impedances at
+    the surface of many soundings, for all the frequencies at once.
 
-            Zall[nr + 1] = Z * (
-                (Zall[nr] + Z * np.tanh(1j * k * hi))
-                / (Z + Zall[nr] * np.tanh(1j * k * hi))
-            )
+    The impedances are computed from the half-space up,
+
+    .. math::
+
+        Z_j = \\zeta_j \\frac{Z_{j+1} + \\zeta_j \\tanh(i k_j h_j)}
+        {\\zeta_j + Z_{j+1} \\tanh(i k_j h_j)}
 
-        # pdb.set_trace()
-        Z1d[nrFr] = Zall[-1]
+    with :math:`\\zeta_j = \\omega \\mu_0 / k_j` the impedance of layer j,
+    :math:`k_j^2 = \\mu_0 \\epsilon_0 \\omega^2 - i \\mu_0 \\sigma_j \\omega`
+    and :math:`h_j` its thickness.
 
-    return Z1d
+    :param numpy.ndarray sigma: conductivities (n_sounding, n_layer), from the top layer to the half-space
+    :param numpy.ndarray thicknesses: thicknesses of the n_layer - 1 layers above the half-space
+    :param numpy.ndarray, vector freq: Frequencies to calculate data at.
+    :param bool derivative: also return the derivatives wrt the conductivities
+    :rtype: numpy.ndarray or tuple
+    :return: impedances (n_sounding, n_frequency), and their derivatives
+        (n_sounding, n_frequency, n_layer)
+    """
+    sigma = np.atleast_2d(sigma)
+    n_layer = sigma.shape[1]
+    om = 2 * np.pi * np.atleast_1d(freq)[None, :]
+
+    k = [
+        np.sqrt(mu_0 * eps_0 * om ** 2 - 1j * mu_0 * sigma[:, j, None] * om)
+        for j in range(n_layer)
+    ]
+    zeta = [mu_0 * om / kj for kj in k]
+
+    # Impedance of the half-space
+    Z = zeta[-1]
+    dZ_dk = [None] * n_layer
+    dZ_dZbelow = [None] * n_layer
+    dZ_dk[-1] = -zeta[-1] / k[-1]
+    for j in range(n_layer - 2, -1, -1):
+        # tanh(i k h), Re(i k h) >= 0
+        e = np.exp(-2j * k[j] * thicknesses[j])
+        t = (1.0 - e) / (1.0 + e)
+        num = Z + zeta[j] * t
+        den = zeta[j] + Z * t
+        if derivative:
+            sech2 = 1.0 - t ** 2
+            dZ_dzeta = num / den + zeta[j] * (t * den - num) / den ** 2
+            dZ_dt = zeta[j] * (zeta[j] ** 2 - Z ** 2) / den ** 2
+            dZ_dk[j] = dZ_dzeta * (-zeta[j] / k[j]) + dZ_dt * (
+                1j * thicknesses[j] * sech2
+            )
+            dZ_dZbelow[j] = zeta[j] ** 2 * sech2 / den ** 2
+        Z = zeta[j] * num / den
+
+    if not derivative:
+        return Z
+
+    dZ = np.empty(Z.shape + (n_layer,), dtype=complex)
+    chain = 1.0
+    for j in range(n_layer):
+        dZ[:, :, j] = chain * dZ_dk[j] * (-1j * mu_0 * om / (2.0 * k[j]))
+        if j < n_layer - 1:
+            chain = chain * dZ_dZbelow[j]
+    return Z, dZ
@@ -37,6 +37,24 @@ class FieldsTDEM(TimeFields):
     knownFields = {}
     dtype = float
 
+    def _initStore(self, name):
+        interval = getattr(self.simulation, "checkpoint_interval", None)
+        if (
+            interval is None
+            or name in self._fields
+            or name != self.simulation._fieldType + "Solution"
+        ):
+            return super(FieldsTDEM, self)._initStore(name)
+
+        field = CheckpointStorage(
+            self.simulation,
+            self._storageShape(self.knownFields[name]),
+            interval,
+            dtype=self._storageDtype(name),
+        )
+        self._fields[name] = field
+        return field
+
     def _GLoc(self, fieldType):
         """Grid location of the fieldType"""
         return self.aliasFields[fieldType][1]
@@ -90,6 +108,99 @@ class FieldsTDEM(TimeFields):
         return self._jDeriv_u(tInd, src, dun_dm_v) + self._jDeriv_m(tInd, src, v)
 
 
+class CheckpointStorage(object):
+    """
+    Storage for the solution of a TDEM simulation that only keeps every
+    `interval` time steps (the checkpoints). It is indexed like the
+    (nP, nSrc, nT+1) array it replaces.
+
+    Reading a time step that is not a checkpoint recomputes the segment of
+    `interval` time steps it belongs to from the preceding checkpoint. The
+    last segment is kept, so sweeping forward or backward through time
+    recomputes every time step at most once. Time steps are expected to be
+    written in order, as they are in the forward solve.
+
+    :param BaseTDEMSimulation simulation: the simulation that computed the
+        solution
+    :param tuple shape: shape of the solution (nP, nSrc, nT+1)
+    :param int interval: number of time steps between checkpoints
+    """
+
+    def __init__(self, simulation, shape, interval, dtype=float):
+        self.simulation = simulation
+        self.shape = shape
+        self.interval = interval
+        self.dtype = dtype
+
+        nP, nSrc, nT = shape
+        self._checkpoints = np.zeros((nP, nSrc, (nT - 1) // interval + 1), dtype=dtype)
+        self._segment = np.zeros((nP, nSrc, interval), dtype=dtype)
+        self._segmentInd = None
+        self._model = simulation.model
+
+    def __getitem__(self, key):
+        pInd, srcInd, timeInd = key
+        tInds = np.arange(self.shape[2])[timeInd]
+        if tInds.ndim == 0:
+            return self._getTimeStep(int(tInds))[pInd, srcInd]
+        return np.stack(
+            [self._getTimeStep(tInd)[pInd, srcInd] for tInd in tInds], axis=-1
+        )
+
+    def __setitem__(self, key, value):
+        pInd, srcInd, timeInd = key
+        tInds = np.arange(self.shape[2])[timeInd]
+        if tInds.ndim == 0:
+            self._setTimeStep(int(tInds), pInd, srcInd, value)
+            return
+        value = np.asarray(value)
+        for i, tInd in enumerate(tInds):
+            self._setTimeStep(
+                tInd, pInd, srcInd, value if value.ndim == 0 else value[..., i]
+            )
+
+    def _setTimeStep(self, tInd, pInd, srcInd, value):
+        segmentInd, i = divmod(tInd, self.interval)
+        if i == 0:
+            # a checkpoint starts a new segment
+            self._checkpoints[pInd, srcInd, segmentInd] = value
+            self._segmentInd = segmentInd
+        elif segmentInd != self._segmentInd:
+            self._recompute(segmentInd)
+        self._segment[pInd, srcInd, i] = value
+
+    def _getTimeStep(self, tInd):
+        segmentInd, i = divmod(tInd, self.interval)
+        if i == 0:
+            return self._checkpoints[:, :, segmentInd]
+        if segmentInd != self._segmentInd:
+            self._recompute(segmentInd)
+        return self._segment[:, :, i]
+
+    def _recompute(self, segmentInd):
+        """
+        Recompute the time steps of a segment from its checkpoint
+        """
+        sim = self.simulation
+        if sim.model is not self._model and not np.array_equal(sim.model, self._model):
+            raise ValueError(
+                "The model of the simulation has changed since these fields "
+                "were computed, the time steps in between checkpoints can not "
+                "be recomputed. Please recompute the fields."
+            )
+
+        tStart = segmentInd * self.interval
+        nSteps = min(self.interval, self.shape[2] - tStart)
+
+        self._segment[:, :, 0] = self._checkpoints[:, :, segmentInd]
+        for i in range(1, nSteps):
+            tInd = tStart + i - 1
+            self._segment[:, :, i] = sim._solveTimeStep(
+                tInd, self._segment[:, :, i - 1], sim._getAdiagSolver(tInd)
+            )
+        self._segmentInd = segmentInd
+
+
 class FieldsDerivativesEB(FieldsTDEM):
     """
     A fields object for satshing derivs in the EB formulation
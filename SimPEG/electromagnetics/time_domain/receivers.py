@@ -1,9 +1,11 @@
+import numpy as np
 import scipy.sparse as sp
 from ...utils.code_utils import deprecate_class, deprecate_property
 import properties
 
 from ...utils import mkvc
 from ...survey import BaseTimeRx
+from .sources import BaseWaveform
 
 
 class BaseRx(BaseTimeRx):
@@ -13,12 +15,28 @@ class BaseRx(BaseTimeRx):
     :param numpy.ndarray locations: receiver locations (ie. :code:`np.r_[x,y,z]`)
     :param numpy.ndarray times: times
     :param string orientation: receiver orientation 'x', 'y' or 'z'
+    :param BaseWaveform waveform: if set, the receiver measures the response
+        to this waveform, computed from the step-off response of the
+        simulation
     """
 
     orientation = properties.StringChoice(
         "orientation of the receiver. Must currently be 'x', 'y', 'z'", ["x", "y", "z"]
     )
 
+    waveform = properties.Instance(
+        "waveform convolved with the step-off response of the simulation. The "
+        "sources of the receiver must then use a StepOffWaveform",
+        BaseWaveform,
+    )
+
+    waveform_times = properties.Array(
+        "times at which the waveform is sampled for the convolution, the current "
+        "is linear in between. Defaults to 1001 samples over the waveform",
+        shape=("*",),
+        dtype=float,
+    )
+
     projComp = deprecate_property(
         orientation, "projComp", new_name="orientation", removal_version="0.15.0"
     )
@@ -31,6 +49,10 @@ class BaseRx(BaseTimeRx):
             self.orientation = orientation
         super().__init__(locations=locations, times=times, **kwargs)
 
+    @properties.observer(["waveform", "waveform_times", "times"])
+    def _clear_stored_projections(self, change):
+        self._Ps = {}
+
     def projGLoc(self, f):
         """Grid Location projection (e.g. Ex Fy ...)"""
         return f._GLoc(self.projField) + self.orientation
@@ -49,16 +71,6 @@ class BaseRx(BaseTimeRx):
         """
         return mesh.getInterpolationMat(self.locations, self.projGLoc(f))
 
-    def getTimeP(self, time_mesh, f):
-        """
-            Returns the time projection matrix.
-
-            .. note::
-
-                This is not stored in memory, but is created on demand.
-        """
-        return time_mesh.getInterpolationMat(self.times, self.projTLoc(f))
-
     def getP(self, mesh, time_mesh, f):
         """
             Returns the projection matrices as a
@@ -81,6 +93,40 @@ class BaseRx(BaseTimeRx):
 
         return P
 
+    def getFootprintP(self, mesh, time_mesh, f):
+        """
+            Returns the projection in compact form: the spatial interpolation
+            restricted to the mesh entries it touches (the footprint of the
+            receiver) and the time projection, instead of their Kronecker
+            product over all time steps.
+
+            :param discretize.base.BaseMesh mesh: mesh used
+            :param discretize.base.BaseMesh time_mesh: time mesh
+            :param Fields f: fields object
+            :rtype: tuple
+            :return: (index, Ps, Pt) with index the mesh entries of the
+                footprint, Ps the (n_locations, len(index)) spatial
+                interpolation from these entries and Pt the (n_times,
+                nT + 1) time projection
+
+            .. note::
+
+                Projection matrices are stored if storeProjections is True
+        """
+        key = ("footprint", mesh, time_mesh)
+        if key in self._Ps:
+            return self._Ps[key]
+
+        Ps = sp.csc_matrix(self.getSpatialP(mesh, f))
+        index = np.nonzero(np.diff(Ps.indptr))[0]
+        Pt = sp.csc_matrix(self.getTimeP(time_mesh, f))
+        P = (index, sp.csr_matrix(Ps[:, index]), Pt)
+
+        if self.storeProjections:
+            self._Ps[key] = P
+
+        return P
+
     def getTimeP(self, time_mesh, f):
         """
             Returns the time projection matrix.
@@ -94,8 +140,66 @@ class BaseRx(BaseTimeRx):
         #         self.times, self.projTLoc(f)
         #     )*time_mesh.faceDiv
         # else:
+        if self.waveform is not None:
+            return self.getConvolutionP(time_mesh, f)
         return time_mesh.getInterpolationMat(self.times, self.projTLoc(f))
 
+    def getConvolutionP(self, time_mesh, f):
+        """
+            Returns the time projection matrix that convolves the step-off
+            response on the nodes of the time mesh with the waveform of the
+            receiver.
+
+            The current is piecewise linear between the waveform samples
+            :math:`\\tau_k` with slopes :math:`g_k`, so that the response to
+            the waveform is
+
+            .. math::
+                d(t) = I(t) s(0) - \\sum_k g_k \\int_{\\tau_k}^{\\min(\\tau_{k+1}, t)}
+                s(t - \\tau) d\\tau
+
+            where :math:`s` is the step-off response, linear in between the
+            nodes of the time mesh and :math:`s(0)` is the response to a
+            constant unit current.
+        """
+        if self.projTLoc(f) != "N":
+            raise NotImplementedError(
+                "Convolution is only implemented for fields on the nodes of the "
+                "time mesh"
+            )
+
+        t_wave = self._get_waveform_times()
+        current = np.array([self.waveform.eval(t) for t in t_wave])
+        slopes = np.diff(current) / np.diff(t_wave)
+
+        # times since the step-off
+        nodes = time_mesh.vectorNx - time_mesh.vectorNx[0]
+        if self.times.max() - t_wave[0] > nodes[-1] * (1.0 + 1e-10):
+            raise ValueError(
+                "The time mesh ends at {:.3e} s but the receiver needs the step-off "
+                "response up to {:.3e} s after the start of the waveform".format(
+                    nodes[-1], self.times.max() - t_wave[0]
+                )
+            )
+
+        # the waveform samples before each receiver time
+        rows, k = np.nonzero(t_wave[:-1] < self.times[:, None])
+        t = self.times[rows]
+        u_start = t - t_wave[:-1][k]
+        u_end = t - np.minimum(t_wave[1:][k], t)
+        Pt = -_hat_function_integrals(
+            nodes,
+            np.r_[u_start, u_end],
+            weights=np.r_[slopes[k], -slopes[k]],
+            rows=np.r_[rows, rows],
+            n_rows=len(self.times),
+        )
+        Pt[:, 0] += np.interp(self.times, t_wave, current)
+        return sp.csr_matrix(Pt)
+
+    def _get_waveform_times(self):
+        return _sample_waveform_times(self.waveform, self.waveform_times)
+
     def eval(self, src, mesh, time_mesh, f):
         """
         Project fields to receivers to get data.
@@ -133,6 +237,79 @@ class BaseRx(BaseTimeRx):
             return P.T * v  # np.reshape(dP_dF_T, newshape, order='F')
 
 
+def _sample_waveform_times(waveform, waveform_times=None):
+    """
+    Times at which a waveform is sampled, the current is linear in between.
+
+    :param BaseWaveform waveform: waveform
+    :param numpy.ndarray waveform_times: samples, defaults to 1001 samples
+        from the start of the ramp on to the end of the waveform
+    :rtype: numpy.ndarray
+    :return: strictly increasing times
+    """
+    if waveform_times is not None:
+        t_wave = waveform_times
+    else:
+        t_start = getattr(waveform, "ramp_on", [0.0])[0]
+        t_end = waveform.offTime
+        if getattr(waveform, "ramp_off", None) is not None:
+            t_end = max(t_end, waveform.ramp_off[1])
+        if t_end <= t_start:
+            raise ValueError(
+                "Cannot sample a waveform that ends at {}, set waveform_times "
+                "on the receiver".format(t_end)
+            )
+        t_wave = np.linspace(t_start, t_end, 1001)
+    if len(t_wave) < 2 or np.any(np.diff(t_wave) <= 0.0):
+        raise ValueError("waveform_times must be strictly increasing")
+    return t_wave
+
+
+def _hat_function_integrals(nodes, u, weights=None, rows=None, n_rows=None):
+    """
+    Integrals from 0 to u of the piecewise linear hat functions on the nodes,
+    summed with weights into rows. A hat function left of the interval
+    containing u is integrated completely, so the integrals only need the
+    integral of each hat function and the two hat functions of the interval.
+
+    :param numpy.ndarray nodes: increasing nodes, starting at 0
+    :param numpy.ndarray u: upper bounds of the integrals, in [0, nodes[-1]]
+    :param numpy.ndarray weights: weights of the integrals, ones by default
+    :param numpy.ndarray rows: row of each integral, one row per integral by
+        default
+    :param int n_rows: number of rows, len(u) by default
+    :rtype: numpy.ndarray
+    :return: array of shape (n_rows, len(nodes))
+    """
+    n = len(nodes)
+    h = np.diff(nodes)
+    if weights is None:
+        weights = np.ones(len(u))
+    if rows is None:
+        rows = np.arange(len(u))
+    if n_rows is None:
+        n_rows = len(u)
+
+    # integrals of the hat functions over all of their support
+    complete = (np.r_[h, 0.0] + np.r_[0.0, h]) / 2.0
+
+    u = np.clip(u, 0.0, nodes[-1])
+    ind = np.clip(np.searchsorted(nodes, u, side="right") - 1, 0, len(h) - 1)
+    x = u - nodes[ind]
+
+    # sum of the weights of the integrals ending right of each hat function
+    w = np.bincount(rows * n + ind, weights, minlength=n_rows * n)
+    w = w.reshape(n_rows, n)
+    out = complete * (np.cumsum(w[:, ::-1], axis=1)[:, ::-1] - w)
+
+    # the hat functions of the interval containing u
+    left = np.r_[0.0, h][ind] / 2.0 + x - x ** 2 / (2.0 * h[ind])
+    right = x ** 2 / (2.0 * h[ind])
+    np.add.at(out, (rows, ind), weights * left)
+    np.add.at(out, (rows, ind + 1), weights * right)
+    return out
+
+
 class PointElectricField(BaseRx):
     """
     Electric field TDEM receiver
@@ -8,8 +8,11 @@ from ...utils.code_utils import deprecate_class
 from ...data import Data
 from ...simulation import BaseTimeSimulation
 from ...utils import mkvc, sdiag, speye, Zero
+from ...utils.solver_utils import SolverCache
 from ..base import BaseEMSimulation
 from .survey import Survey
+from .sources import StepOffWaveform
+from .receivers import BaseRx, PointMagneticFluxTimeDerivative
 from .fields import (
     Fields3DMagneticFluxDensity,
     Fields3DElectricField,
@@ -19,6 +22,18 @@ from .fields import (
     FieldsDerivativesHJ,
 )
 
+# evals of the receivers whose data are the projection of the fields with
+# getP, which dpred, Jvec and Jtvec apply as fused sparse products
+_projection_evals = (BaseRx.eval, PointMagneticFluxTimeDerivative.eval)
+
+
+def _is_projection_rx(rx):
+    """
+    True if the receiver overrides neither eval nor evalDeriv, so that its
+    data are the projection of the fields with getP
+    """
+    return type(rx).eval in _projection_evals and type(rx).evalDeriv is BaseRx.evalDeriv
+
 
 class BaseTDEMSimulation(BaseTimeSimulation, BaseEMSimulation):
     """
@@ -27,11 +42,64 @@ class BaseTDEMSimulation(BaseTimeSimulation, BaseEMSimulation):
     Euler.
     """
 
-    clean_on_model_update = ["_Adcinv"]  #: clear DC matrix factors on any model updates
+    clean_on_model_update = [
+        "_Adcinv",
+        "_Ammrinv",
+        "_Adiag_solvers",
+    ]  #: clear matrix factors on any model updates
     dt_threshold = 1e-8
 
+    #: True if getAdiag is symmetric, its factors then also serve the adjoint
+    _Adiag_symmetric = False
+
     survey = properties.Instance("a survey object", Survey, required=True)
 
+    checkpoint_interval = properties.Integer(
+        "If set, the solution is only stored every checkpoint_interval time "
+        "steps. The time steps in between are recomputed from the preceding "
+        "checkpoint when they are needed, e.g. during the back-solve of "
+        "Jtvec. A larger interval stores fewer time steps at the cost of "
+        "more recomputation; an interval close to sqrt(nT) keeps the least "
+        "in memory",
+        min=1,
+    )
+
+    max_factorizations = properties.Integer(
+        "maximum number of factorizations of the system matrix kept in memory. "
+        "There is one per unique time step length (and one more for its "
+        "transpose if it is not symmetric); they are shared by fields, Jvec "
+        "and Jtvec and kept between calls until the model changes",
+        default=4,
+        min=1,
+    )
+
+    @property
+    def _clear_on_mu_update(self):
+        return super(BaseTDEMSimulation, self)._clear_on_mu_update + [
+            "_initialVectorPotentials"
+        ]
+
+    @property
+    def _clear_on_sigma_update(self):
+        return super(BaseTDEMSimulation, self)._clear_on_sigma_update + [
+            "_initialPotentials",
+            "_initialVectorPotentials",
+        ]
+
+    @property
+    def _clean_on_mu_update(self):
+        return super(BaseTDEMSimulation, self)._clean_on_mu_update + [
+            "_Ammrinv",
+            "_Adiag_solvers",
+        ]
+
+    @property
+    def _clean_on_sigma_update(self):
+        return super(BaseTDEMSimulation, self)._clean_on_sigma_update + [
+            "_Adcinv",
+            "_Adiag_solvers",
+        ]
+
     # def fields_nostore(self, m):
     #     """
     #     Solve the forward problem without storing fields
@@ -62,48 +130,58 @@ class BaseTDEMSimulation(BaseTimeSimulation, BaseEMSimulation):
         if self.verbose:
             print("{}\nCalculating fields(m)\n{}".format("*" * 50, "*" * 50))
 
-        # timestep to solve forward
-        Ainv = None
-        for tInd, dt in enumerate(self.time_steps):
-            # keep factors if dt is the same as previous step b/c A will be the
-            # same
-            if Ainv is not None and (
-                tInd > 0 and abs(dt - self.time_steps[tInd - 1]) > self.dt_threshold
-            ):
-                Ainv.clean()
-                Ainv = None
-
-            if Ainv is None:
-                A = self.getAdiag(tInd)
-                if self.verbose:
-                    print("Factoring...   (dt = {:e})".format(dt))
-                Ainv = self.Solver(A, **self.solver_opts)
-                if self.verbose:
-                    print("Done")
-
-            rhs = self.getRHS(tInd + 1)  # this is on the nodes of the time mesh
-            Asubdiag = self.getAsubdiag(tInd)
-
+        # timestep to solve forward, time steps of the same length share a
+        # factorization of the pool
+        for tInd in range(self.nT):
             if self.verbose:
                 print("    Solving...   (tInd = {:d})".format(tInd + 1))
 
             # taking a step
-            sol = Ainv * (rhs - Asubdiag * f[:, (self._fieldType + "Solution"), tInd])
+            un = f[:, (self._fieldType + "Solution"), tInd]
+            sol = self._solveTimeStep(tInd, un, self._getAdiagSolver(tInd))
 
             if self.verbose:
                 print("    Done...")
 
-            if sol.ndim == 1:
-                sol.shape = (sol.size, 1)
             f[:, self._fieldType + "Solution", tInd + 1] = sol
 
         if self.verbose:
             print("{}\nDone calculating fields(m)\n{}".format("*" * 50, "*" * 50))
 
-        # clean factors and return
-        Ainv.clean()
         return f
 
+    def dpred(self, m=None, f=None):
+        """
+        dpred(m, f=None)
+        Create the projected data from a model. The fields are projected to
+        the receivers one time step at a time, and only at the time steps
+        the receivers need. Receivers that override eval or evalDeriv are
+        evaluated with eval.
+
+        :param numpy.ndarray m: inversion model (nP,)
+        :param SimPEG.electromagnetics.time_domain.fields.FieldsTDEM f: fields
+        :rtype: numpy.ndarray
+        :return: dpred (nD,)
+        """
+        if f is None:
+            f = self.fields(m)
+
+        data = np.zeros(self.survey.nD)
+        projections = self._getTimeProjections(f)
+        for tInd in sorted(projections):
+            for projField, sources, index, P in projections[tInd]:
+                data += P * self._getFieldsAt(f, projField, sources, index, tInd)
+
+        offset = 0
+        for src in self.survey.source_list:
+            for rx in src.receiver_list:
+                if not _is_projection_rx(rx):
+                    data[offset : offset + rx.nD] = rx.eval(
+                        src, self.mesh, self.time_mesh, f
+                    )
+                offset += rx.nD
+        return data
+
     def Jvec(self, m, v, f=None):
         """
         Jvec computes the sensitivity times a vector
@@ -131,84 +209,67 @@ class BaseTDEMSimulation(BaseTimeSimulation, BaseEMSimulation):
         # mat to store previous time-step's solution deriv times a vector for
         # each source
         # size: nu x nSrc
+        dun_dm_v = self._initialFieldsJvec(f, v)
 
-        # this is a bit silly
-
-        # if self._fieldType == 'b' or self._fieldType == 'j':
-        #     ifields = np.zeros((self.mesh.nF, len(Srcs)))
-        # elif self._fieldType == 'e' or self._fieldType == 'h':
-        #     ifields = np.zeros((self.mesh.nE, len(Srcs)))
-
-        # for i, src in enumerate(self.survey.source_list):
-        dun_dm_v = np.hstack(
-            [
-                mkvc(self.getInitialFieldsDeriv(src, v, f=f), 2)
-                for src in self.survey.source_list
-            ]
-        )
-        # can over-write this at each timestep
-        # store the field derivs we need to project to calc full deriv
-        df_dm_v = self.Fields_Derivs(self)
-
-        Adiaginv = None
+        # the field derivatives are projected to the receivers as we go, only
+        # at the time steps the receivers need
+        projections = self._getTimeProjections(f)
+        Jv = np.zeros(self.survey.nD)
 
-        for tInd, dt in zip(range(self.nT), self.time_steps):
-            # keep factors if dt is the same as previous step b/c A will be the
-            # same
-            if Adiaginv is not None and (tInd > 0 and dt != self.time_steps[tInd - 1]):
-                Adiaginv.clean()
-                Adiaginv = None
-
-            if Adiaginv is None:
-                A = self.getAdiag(tInd)
-                Adiaginv = self.Solver(A, **self.solver_opts)
+        # receivers that override evalDeriv get the field derivatives at all
+        # times
+        custom = self._getCustomReceivers()
+        df_dm_v_custom = {(iSrc, rx.projField): [] for _, iSrc, rx in custom}
 
+        for tInd in range(self.nT):
             Asubdiag = self.getAsubdiag(tInd)
 
-            for i, src in enumerate(self.survey.source_list):
-
-                # here, we are lagging by a timestep, so filling in as we go
-                for projField in set([rx.projField for rx in src.receiver_list]):
-                    df_dmFun = getattr(f, "_%sDeriv" % projField, None)
-                    # df_dm_v is dense, but we only need the times at
-                    # (rx.P.T * ones > 0)
-                    # This should be called rx.footprint
+            # here, we are lagging by a timestep, so filling in as we go
+            self._projectFieldsDeriv(
+                f, tInd, projections.get(tInd, []), dun_dm_v, v, Jv
+            )
+            self._customFieldsDeriv(f, tInd, df_dm_v_custom, dun_dm_v, v)
 
-                    df_dm_v[src, "{}Deriv".format(projField), tInd] = df_dmFun(
-                        tInd, src, dun_dm_v[:, i], v
-                    )
+            # all sources share the system matrix, so we step them together
+            # with one column per source
+            un = f[:, ftype, tInd + 1]
 
-                un_src = f[src, ftype, tInd + 1]
+            # cell centered on time mesh
+            dA_dm_v = self._sourceColumns(self.getAdiagDeriv(tInd, un, v), un.shape)
+            # on nodes of time mesh
+            dRHS_dm_v = self._getRHSDerivSources(tInd + 1, v)
 
-                # cell centered on time mesh
-                dA_dm_v = self.getAdiagDeriv(tInd, un_src, v)
-                # on nodes of time mesh
-                dRHS_dm_v = self.getRHSDeriv(tInd + 1, src, v)
+            dAsubdiag_dm_v = self._sourceColumns(
+                self.getAsubdiagDeriv(tInd, f[:, ftype, tInd], v), un.shape
+            )
 
-                dAsubdiag_dm_v = self.getAsubdiagDeriv(tInd, f[src, ftype, tInd], v)
+            JRHS = dRHS_dm_v - dAsubdiag_dm_v - dA_dm_v
 
-                JRHS = dRHS_dm_v - dAsubdiag_dm_v - dA_dm_v
+            # step in time and overwrite. The factorization is taken from the
+            # pool right before the solve: reading checkpointed fields may
+            # factor (and evict) others
+            Adiaginv = self._getAdiagSolver(tInd)
+            dun_dm_v = np.reshape(
+                Adiaginv * (JRHS - Asubdiag * dun_dm_v), un.shape, order="F"
+            )
 
-                # step in time and overwrite
-                if tInd != len(self.time_steps + 1):
-                    dun_dm_v[:, i] = Adiaginv * (JRHS - Asubdiag * dun_dm_v[:, i])
+        # the last time step
+        self._projectFieldsDeriv(
+            f, self.nT, projections.get(self.nT, []), dun_dm_v, v, Jv
+        )
+        self._customFieldsDeriv(f, self.nT, df_dm_v_custom, dun_dm_v, v)
+
+        for offset, iSrc, rx in custom:
+            df_dm_v = np.column_stack(df_dm_v_custom[(iSrc, rx.projField)])
+            Jv[offset : offset + rx.nD] = rx.evalDeriv(
+                self.survey.source_list[iSrc],
+                self.mesh,
+                self.time_mesh,
+                f,
+                mkvc(df_dm_v),
+            )
 
-        Jv = []
-        for src in self.survey.source_list:
-            for rx in src.receiver_list:
-                Jv.append(
-                    rx.evalDeriv(
-                        src,
-                        self.mesh,
-                        self.time_mesh,
-                        f,
-                        mkvc(df_dm_v[src, "%sDeriv" % rx.projField, :]),
-                    )
-                )
-        Adiaginv.clean()
-        # del df_dm_v, dun_dm_v, Asubdiag
-        # return mkvc(Jv)
-        return np.hstack(Jv)
+        return Jv
 
     def Jtvec(self, m, v, f=None):
 
@@ -240,114 +301,86 @@ class BaseTDEMSimulation(BaseTimeSimulation, BaseEMSimulation):
         if not isinstance(v, Data):
             v = Data(self.survey, v)
 
-        df_duT_v = self.Fields_Derivs(self)
-
-        # same size as fields at a single timestep
-        ATinv_df_duT_v = np.zeros(
-            (
-                len(self.survey.source_list),
-                len(f[self.survey.source_list[0], ftype, 0]),
-            ),
-            dtype=float,
+        # the receiver projections are applied at each time step during the
+        # back-solve, so the adjoint of the field derivatives is never stored
+        # for all times
+        projections = self._getTimeProjections(f)
+        v = np.hstack(
+            [v[src, rx] for src in self.survey.source_list for rx in src.receiver_list]
         )
-        JTv = np.zeros(m.shape, dtype=float)
 
-        # Loop over sources and receivers to create a fields object:
-        # PT_v, df_duT_v, df_dmT_v
-        # initialize storage for PT_v (don't need to preserve over sources)
-        PT_v = self.Fields_Derivs(self)
-        for src in self.survey.source_list:
-            # Looping over initializing field class is appending memory!
-            # PT_v = Fields_Derivs(self.mesh) # initialize storage
-            # #for PT_v (don't need to preserve over sources)
-            # initialize size
-            df_duT_v[src, "{}Deriv".format(self._fieldType), :] = np.zeros_like(
-                f[src, self._fieldType, :]
+        # receivers that override evalDeriv give the adjoint of their
+        # projection at all times, (nG, nT + 1) for each source and field
+        PT_v_custom = {}
+        for offset, iSrc, rx in self._getCustomReceivers():
+            PT_v = rx.evalDeriv(
+                self.survey.source_list[iSrc],
+                self.mesh,
+                self.time_mesh,
+                f,
+                v[offset : offset + rx.nD],
+                adjoint=True,
+            )
+            key = (iSrc, rx.projField)
+            PT_v_custom[key] = PT_v_custom.get(key, 0.0) + np.reshape(
+                PT_v, (-1, self.nT + 1), order="F"
             )
 
-            for rx in src.receiver_list:
-                PT_v[src, "{}Deriv".format(rx.projField), :] = rx.evalDeriv(
-                    src, self.mesh, self.time_mesh, f, mkvc(v[src, rx]), adjoint=True
-                )  # this is +=
-
-                # PT_v = np.reshape(curPT_v,(len(curPT_v)/self.time_mesh.nN,
-                # self.time_mesh.nN), order='F')
-                df_duTFun = getattr(f, "_{}Deriv".format(rx.projField), None)
-
-                for tInd in range(self.nT + 1):
-                    cur = df_duTFun(
-                        tInd,
-                        src,
-                        None,
-                        mkvc(PT_v[src, "{}Deriv".format(rx.projField), tInd]),
-                        adjoint=True,
-                    )
-
-                    df_duT_v[src, "{}Deriv".format(self._fieldType), tInd] = df_duT_v[
-                        src, "{}Deriv".format(self._fieldType), tInd
-                    ] + mkvc(cur[0], 2)
-                    JTv = cur[1] + JTv
-
-        del PT_v  # no longer need this
+        JTv = np.zeros(m.shape, dtype=float)
 
-        AdiagTinv = None
+        # one column per source
+        ATinv_df_duT_v = None
 
-        # Do the back-solve through time
-        # if the previous timestep is the same: no need to refactor the matrix
-        # for tInd, dt in zip(range(self.nT), self.time_steps):
+        # Do the back-solve through time, time steps of the same length share
+        # a factorization of the pool
 
         for tInd in reversed(range(self.nT)):
-            # tInd = tIndP - 1
-            if AdiagTinv is not None and (
-                tInd <= self.nT and self.time_steps[tInd] != self.time_steps[tInd + 1]
-            ):
-                AdiagTinv.clean()
-                AdiagTinv = None
-
-            # refactor if we need to
-            if AdiagTinv is None:  # and tInd > -1:
-                Adiag = self.getAdiag(tInd)
-                AdiagTinv = self.Solver(Adiag.T, **self.solver_opts)
-
-            if tInd < self.nT - 1:
-                Asubdiag = self.getAsubdiag(tInd + 1)
-
-            for isrc, src in enumerate(self.survey.source_list):
-
-                # solve against df_duT_v
-                if tInd >= self.nT - 1:
-                    # last timestep (first to be solved)
-                    ATinv_df_duT_v[isrc, :] = (
-                        AdiagTinv
-                        * df_duT_v[src, "{}Deriv".format(self._fieldType), tInd + 1]
-                    )
-                elif tInd > -1:
-                    ATinv_df_duT_v[isrc, :] = AdiagTinv * (
-                        mkvc(df_duT_v[src, "{}Deriv".format(self._fieldType), tInd + 1])
-                        - Asubdiag.T * mkvc(ATinv_df_duT_v[isrc, :])
-                    )
+            df_duT_v_n, df_dmT_v = self._projectFieldsDerivAdjoint(
+                f, tInd + 1, projections.get(tInd + 1, []), v
+            )
+            df_dmT_v = df_dmT_v + self._customFieldsDerivAdjoint(
+                f, tInd + 1, PT_v_custom, df_duT_v_n
+            )
+            JTv = df_dmT_v + JTv
 
-                dAsubdiagT_dm_v = self.getAsubdiagDeriv(
-                    tInd, f[src, ftype, tInd], ATinv_df_duT_v[isrc, :], adjoint=True
-                )
+            # solve against df_duT_v for all sources at once
+            if tInd >= self.nT - 1:
+                # last timestep (first to be solved)
+                rhs = df_duT_v_n
+            else:
+                Asubdiag = self.getAsubdiag(tInd + 1)
+                rhs = df_duT_v_n - Asubdiag.T * ATinv_df_duT_v
+            # taken from the pool right before the solve: reading checkpointed
+            # fields may factor (and evict) others
+            AdiagTinv = self._getAdiagSolver(tInd, adjoint=True)
+            ATinv_df_duT_v = np.reshape(AdiagTinv * rhs, rhs.shape, order="F")
+
+            dAsubdiagT_dm_v = self.getAsubdiagDeriv(
+                tInd, f[:, ftype, tInd], ATinv_df_duT_v, adjoint=True
+            )
 
-                dRHST_dm_v = self.getRHSDeriv(
-                    tInd + 1, src, ATinv_df_duT_v[isrc, :], adjoint=True
-                )  # on nodes of time mesh
+            dRHST_dm_v = self._getRHSDerivSources(
+                tInd + 1, ATinv_df_duT_v, adjoint=True
+            )  # on nodes of time mesh
 
-                un_src = f[src, ftype, tInd + 1]
-                # cell centered on time mesh
-                dAT_dm_v = self.getAdiagDeriv(
-                    tInd, un_src, ATinv_df_duT_v[isrc, :], adjoint=True
-                )
+            un = f[:, ftype, tInd + 1]
+            # cell centered on time mesh
+            dAT_dm_v = self.getAdiagDeriv(tInd, un, ATinv_df_duT_v, adjoint=True)
 
-                JTv = JTv + mkvc(-dAT_dm_v - dAsubdiagT_dm_v + dRHST_dm_v)
+            JTv = (
+                JTv
+                - self._sumSources(dAT_dm_v)
+                - self._sumSources(dAsubdiagT_dm_v)
+                + dRHST_dm_v
+            )
 
         # Treat the initial condition
-
-        # del df_duT_v, ATinv_df_duT_v, A, Asubdiag
-        if AdiagTinv is not None:
-            AdiagTinv.clean()
+        df_duT_v_0, df_dmT_v = self._projectFieldsDerivAdjoint(
+            f, 0, projections.get(0, []), v
+        )
+        JTv = JTv + df_dmT_v
+        JTv = JTv + self._customFieldsDerivAdjoint(f, 0, PT_v_custom, df_duT_v_0)
+        JTv = JTv + self._initialFieldsJtvec(f, df_duT_v_0, ATinv_df_duT_v)
 
         return mkvc(JTv).astype(float)
 
@@ -373,6 +406,320 @@ class BaseTDEMSimulation(BaseTimeSimulation, BaseEMSimulation):
 
         return s_m, s_e
 
+    def _getRHSDerivSources(self, tInd, v, adjoint=False):
+        """
+        Derivative of the RHS for all sources. For the forward product, v is
+        a model vector and the derivatives are returned with one column per
+        source. For the adjoint, v has one column per source and the
+        contributions of all sources are summed.
+        """
+        Srcs = self.survey.source_list
+
+        if adjoint:
+            RHSDeriv = Zero()
+            for i, src in enumerate(Srcs):
+                RHSDeriv = RHSDeriv + self.getRHSDeriv(tInd, src, v[:, i], adjoint)
+            return RHSDeriv
+
+        RHSDerivs = [self.getRHSDeriv(tInd, src, v) for src in Srcs]
+        if all(isinstance(RHSDeriv, Zero) for RHSDeriv in RHSDerivs):
+            return Zero()
+
+        n = self.mesh.nF if self._fieldType in ["b", "j"] else self.mesh.nE
+        return np.column_stack(
+            [
+                np.zeros(n) if isinstance(RHSDeriv, Zero) else mkvc(RHSDeriv)
+                for RHSDeriv in RHSDerivs
+            ]
+        )
+
+    @staticmethod
+    def _sourceColumns(x, shape):
+        """
+        Reshape the derivatives of all sources to (nU, nSrc)
+        """
+        if isinstance(x, Zero):
+            return x
+        return np.reshape(x, shape, order="F")
+
+    @staticmethod
+    def _sumSources(x):
+        """
+        Sum the adjoint derivatives of all sources (nP, nSrc) -> (nP,)
+        """
+        if isinstance(x, Zero) or x.ndim == 1:
+            return x
+        return x.sum(axis=1)
+
+    def _initialFieldsJvec(self, f, v):
+        """
+        Derivative of the initial fields times v, with one column per source
+        (nU, nSrc)
+        """
+        return np.hstack(
+            [
+                mkvc(self.getInitialFieldsDeriv(src, v, f=f), 2)
+                for src in self.survey.source_list
+            ]
+        )
+
+    def _initialFieldsJtvec(self, f, df_duT_v, ATinv_df_duT_v):
+        """
+        Contribution of the initial condition to Jtvec. Zero unless the
+        initial fields depend on the model. df_duT_v is the adjoint of the
+        field derivatives at the first time (nU, nSrc).
+        """
+        return Zero()
+
+    def _getAdiagSolver(self, tInd, adjoint=False):
+        """
+        Factorization of getAdiag(tInd), or of its transpose for the adjoint.
+        Time steps of the same length share a factorization, which is kept
+        for the current model (up to max_factorizations of them).
+
+        :param int tInd: time index
+        :param bool adjoint: factor the transpose
+        """
+        if getattr(self, "_Adiag_solvers", None) is None:
+            self._Adiag_solvers = SolverCache()
+        self._Adiag_solvers.max_size = self.max_factorizations
+
+        dt = self.time_steps[tInd]
+        adjoint = adjoint and not self._Adiag_symmetric
+        key = (dt, adjoint)
+        for dt_i, adjoint_i in self._Adiag_solvers.keys():
+            if adjoint_i == adjoint and abs(dt_i - dt) <= self.dt_threshold:
+                key = (dt_i, adjoint_i)
+                break
+
+        def factor():
+            if self.verbose:
+                print("Factoring...   (dt = {:e})".format(dt))
+            A = self.getAdiag(tInd)
+            if adjoint:
+                A = A.T
+            return self.Solver(A, **self.solver_opts)
+
+        return self._Adiag_solvers.get(key, factor)
+
+    def _solveTimeStep(self, tInd, un, Ainv):
+        """
+        Take a time step from the solution un at tInd for all sources
+
+        :param int tInd: time index
+        :param numpy.ndarray un: solution at tInd (nU, nSrc)
+        :param Ainv: factorization of getAdiag(tInd)
+        :rtype: numpy.ndarray
+        :return: solution at tInd + 1 (nU, nSrc)
+        """
+        rhs = self.getRHS(tInd + 1)  # this is on the nodes of the time mesh
+        Asubdiag = self.getAsubdiag(tInd)
+        sol = Ainv * (rhs - Asubdiag * un)
+        if sol.ndim == 1:
+            sol.shape = (sol.size, 1)
+        return sol
+
+    def _getTimeProjections(self, f):
+        """
+        Projections of the fields to the data, one time index at a time. The
+        receivers only keep the mesh entries around their locations and their
+        time weights (see :meth:`BaseRx.getFootprintP`), so for each time
+        index and projected field, the data of all receivers are a single
+        sparse product with the fields of the sources on the union of their
+        footprints.
+
+        :param SimPEG.electromagnetics.time_domain.fields.FieldsTDEM f: fields
+        Receivers that override eval or evalDeriv are left out, their rows
+        of P are zero.
+
+        :rtype: dict
+        :return: for each time index, a list of (projField, iSrc, index, P)
+            with iSrc the sources with receivers of projField, index the mesh
+            entries of their footprints and P the (nD, len(iSrc) * len(index))
+            projection of the field of these sources at these entries,
+            stacked source by source
+        """
+        entries = {}
+        offset = 0
+        for iSrc, src in enumerate(self.survey.source_list):
+            for rx in src.receiver_list:
+                if not _is_projection_rx(rx):
+                    # evaluated by the receiver, see _getCustomReceivers
+                    offset += rx.nD
+                    continue
+                if getattr(rx, "waveform", None) is not None and not isinstance(
+                    src.waveform, StepOffWaveform
+                ):
+                    raise ValueError(
+                        "Receivers with a waveform convolve the step-off response, "
+                        "their source must have a StepOffWaveform"
+                    )
+                index, Ps, Pt = rx.getFootprintP(self.mesh, self.time_mesh, f)
+                Ps = Ps.tocoo()
+                Pt = Pt.tocoo()
+                # every time weight times every spatial weight
+                entries.setdefault(rx.projField, []).append(
+                    (
+                        np.repeat(Pt.col, Ps.nnz),
+                        iSrc * np.ones(Pt.nnz * Ps.nnz, dtype=int),
+                        np.tile(index[Ps.col], Pt.nnz),
+                        offset + (Pt.row[:, None] * Ps.shape[0] + Ps.row).ravel(),
+                        (Pt.data[:, None] * Ps.data).ravel(),
+                    )
+                )
+                offset += rx.nD
+
+        projections = {}
+        for projField, blocks in entries.items():
+            tInd, iSrc, grid, rows, values = [np.hstack(x) for x in zip(*blocks)]
+            order = np.argsort(tInd, kind="stable")
+            splits = np.nonzero(np.diff(tInd[order]))[0] + 1
+            for ind in np.split(order, splits):
+                sources, src_col = np.unique(iSrc[ind], return_inverse=True)
+                index, grid_col = np.unique(grid[ind], return_inverse=True)
+                P = sp.csr_matrix(
+                    (values[ind], (rows[ind], src_col * len(index) + grid_col)),
+                    shape=(offset, len(sources) * len(index)),
+                )
+                projections.setdefault(tInd[ind[0]], []).append(
+                    (projField, sources, index, P)
+                )
+        return projections
+
+    def _getFieldsAt(self, f, projField, sources, index, tInd):
+        """
+        Field of the sources at the mesh entries index and time index tInd,
+        stacked source by source
+        """
+        source_list = self.survey.source_list
+        if projField == self._fieldType:
+            # the stored solution, read for all sources at once
+            field = f[[source_list[i] for i in sources], projField, tInd]
+            field = np.reshape(field, (-1, len(sources)), order="F")
+            return mkvc(field[index])
+        return np.hstack(
+            [mkvc(f[source_list[i], projField, tInd])[index] for i in sources]
+        )
+
+    def _projectFieldsDeriv(self, f, tInd, projections, dun_dm_v, v, Jv):
+        """
+        Add the projected field derivatives at tInd to Jv. The derivative of
+        the solution is gathered at the footprints of the receivers, without
+        forming the derivative of the field on the whole mesh. The other
+        fields (e.g. dbdt of the b-formulation) are still differentiated on the
+        whole mesh before their footprint entries are taken: their derivatives
+        are given by the fields as functions, not as matrices whose rows could
+        be restricted
+        """
+        for projField, sources, index, P in projections:
+            if projField == self._fieldType:
+                # the solution field, its derivative is dun_dm_v
+                df_dm_v = dun_dm_v[np.ix_(index, sources)]
+            else:
+                df_dmFun = getattr(f, "_{}Deriv".format(projField), None)
+                df_dm_v = np.column_stack(
+                    [
+                        mkvc(
+                            df_dmFun(
+                                tInd,
+                                self.survey.source_list[iSrc],
+                                dun_dm_v[:, iSrc],
+                                v,
+                            )
+                        )[index]
+                        for iSrc in sources
+                    ]
+                )
+            Jv += P * mkvc(df_dm_v)
+
+    def _projectFieldsDerivAdjoint(self, f, tInd, projections, v):
+        """
+        Adjoint of the projected field derivatives at tInd. As in
+        :meth:`_projectFieldsDeriv`, only the solution field stays on the
+        footprints, the adjoint derivatives of the other fields are applied to
+        a vector on the whole mesh, zero outside of the footprints
+
+        :rtype: tuple
+        :return: derivative with respect to the solution (nU, nSrc) and with
+            respect to the model
+        """
+        n = self.mesh.nF if self._fieldType in ["b", "j"] else self.mesh.nE
+        df_duT_v = np.zeros((n, self.survey.nSrc))
+        df_dmT_v = Zero()
+        for projField, sources, index, P in projections:
+            PT_v = np.reshape(P.T * v, (len(index), len(sources)), order="F")
+            if projField == self._fieldType:
+                df_duT_v[np.ix_(index, sources)] += PT_v
+                continue
+
+            df_duTFun = getattr(f, "_{}Deriv".format(projField), None)
+            loc = f.aliasFields[projField][1]
+            nG = {"F": self.mesh.nF, "E": self.mesh.nE, "CC": self.mesh.nC}[loc]
+            for iSrc, PT_v_i in zip(sources, PT_v.T):
+                PT_v_full = np.zeros(nG)
+                PT_v_full[index] = PT_v_i
+                cur = df_duTFun(
+                    tInd, self.survey.source_list[iSrc], None, PT_v_full, adjoint=True
+                )
+                df_duT_v[:, iSrc] = df_duT_v[:, iSrc] + mkvc(cur[0])
+                df_dmT_v = cur[1] + df_dmT_v
+        return df_duT_v, df_dmT_v
+
+    def _getCustomReceivers(self):
+        """
+        Receivers that override eval or evalDeriv. Their data are not a
+        projection that can be applied one time step at a time, Jvec and
+        Jtvec evaluate their derivatives with evalDeriv on the field
+        derivatives at all times, on the whole mesh.
+
+        :rtype: list
+        :return: (offset, iSrc, rx) with offset the first datum of the
+            receiver and iSrc the index of its source
+        """
+        custom = []
+        offset = 0
+        for iSrc, src in enumerate(self.survey.source_list):
+            for rx in src.receiver_list:
+                if not _is_projection_rx(rx):
+                    custom.append((offset, iSrc, rx))
+                offset += rx.nD
+        return custom
+
+    def _customFieldsDeriv(self, f, tInd, df_dm_v, dun_dm_v, v):
+        """
+        Append the field derivatives at tInd needed by the receivers of
+        :meth:`_getCustomReceivers` to the lists of df_dm_v, keyed by
+        (iSrc, projField)
+        """
+        for iSrc, projField in df_dm_v:
+            df_dmFun = getattr(f, "_{}Deriv".format(projField), None)
+            df_dm_v[(iSrc, projField)].append(
+                mkvc(
+                    df_dmFun(tInd, self.survey.source_list[iSrc], dun_dm_v[:, iSrc], v)
+                )
+            )
+
+    def _customFieldsDerivAdjoint(self, f, tInd, PT_v, df_duT_v):
+        """
+        Adjoint of the field derivatives at tInd for the receivers of
+        :meth:`_getCustomReceivers`. The derivative with respect to the
+        solution is added to df_duT_v (nU, nSrc).
+
+        :param dict PT_v: adjoint of the projections of the receivers,
+            (nG, nT + 1) keyed by (iSrc, projField)
+        :rtype: numpy.ndarray
+        :return: derivative with respect to the model
+        """
+        df_dmT_v = Zero()
+        for (iSrc, projField), PT_v_i in PT_v.items():
+            df_duTFun = getattr(f, "_{}Deriv".format(projField), None)
+            cur = df_duTFun(
+                tInd, self.survey.source_list[iSrc], None, PT_v_i[:, tInd], adjoint=True
+            )
+            df_duT_v[:, iSrc] = df_duT_v[:, iSrc] + mkvc(cur[0])
+            df_dmT_v = cur[1] + df_dmT_v
+        return df_dmT_v
+
     def getInitialFields(self):
         """
         Ask the sources for initial fields
@@ -435,6 +782,82 @@ class BaseTDEMSimulation(BaseTimeSimulation, BaseEMSimulation):
             self._Adcinv = self.Solver(Adc)
         return self._Adcinv
 
+    def getAmmr(self):
+        """
+        System matrix of the magnetometric resistivity (MMR) problem that
+        gives the initial magnetic fields of grounded sources, with the
+        stabilizing term of Chen, Haber & Oldenburg (2002)
+        """
+        vol = self.mesh.vol
+        return (
+            self.mesh.edgeCurl * self.MeMuI * self.mesh.edgeCurl.T
+            - self.mesh.faceDiv.T * sdiag(1.0 / vol * self.mui) * self.mesh.faceDiv
+        )
+
+    # Store matrix factors of the MMR problem for the initial magnetic fields
+    # of grounded sources
+    @property
+    def Ammrinv(self):
+        if getattr(self, "_Ammrinv", None) is None:
+            if self.verbose:
+                print("Factoring the system matrix for the MMR problem")
+            self._Ammrinv = self.Solver(self.getAmmr())
+        return self._Ammrinv
+
+    def _getInitialSolution(self, name, src, solver, rhs):
+        """
+        Solution of an initial-field problem for a source. The problem is
+        solved for all sources of the survey with initial fields in one block
+        solve, and the solutions are kept until the model changes.
+
+        :param str name: attribute that stores the solutions
+        :param BaseTDEMSrc src: source
+        :param str solver: name of the property with the factorization
+        :param str rhs: name of the method of the sources that returns the
+            right hand side
+        :rtype: numpy.ndarray
+        :return: solution for the source
+        """
+        cache = getattr(self, name, None)
+        if cache is None or not any(s is src for s, _ in cache):
+            source_list = [
+                s
+                for s in getattr(self.survey, "source_list", [])
+                if hasattr(s, rhs) and s.waveform.hasInitialFields
+            ]
+            if not any(s is src for s in source_list):
+                # not a source of the survey (if any)
+                return getattr(self, solver) * mkvc(getattr(src, rhs)(self))
+            RHS = np.column_stack([mkvc(getattr(s, rhs)(self)) for s in source_list])
+            sol = np.reshape(getattr(self, solver) * RHS, RHS.shape, order="F")
+            cache = list(zip(source_list, sol.T))
+            setattr(self, name, cache)
+        return next(sol for s, sol in cache if s is src)
+
+    def getInitialPotential(self, src):
+        """
+        Potential of the DC problem for the initial electric fields of a
+        grounded source, see :meth:`_getInitialSolution`
+
+        :param BaseTDEMSrc src: source with a getRHSdc method
+        :rtype: numpy.ndarray
+        :return: potential on the nodes (EB) or cell centers (HJ)
+        """
+        return self._getInitialSolution("_initialPotentials", src, "Adcinv", "getRHSdc")
+
+    def getInitialVectorPotential(self, src):
+        """
+        Vector potential of the MMR problem for the initial magnetic fields of
+        a grounded source, see :meth:`_getInitialSolution`
+
+        :param BaseTDEMSrc src: source with a getRHSmmr method
+        :rtype: numpy.ndarray
+        :return: vector potential on the faces
+        """
+        return self._getInitialSolution(
+            "_initialVectorPotentials", src, "Ammrinv", "getRHSmmr"
+        )
+
 
 ###############################################################################
 #                                                                             #
@@ -514,6 +937,11 @@ class Simulation3DMagneticFluxDensity(BaseTDEMSimulation):
     fieldsPair = Fields3DMagneticFluxDensity  #: A SimPEG.EM.TDEM.Fields3DMagneticFluxDensity object
     Fields_Derivs = FieldsDerivativesEB
 
+    @property
+    def _Adiag_symmetric(self):
+        # symmetric once it is multiplied by the inner product matrix
+        return self._makeASymmetric is True
+
     def getAdiag(self, tInd):
         """
         System matrix at a given time index
@@ -670,167 +1098,68 @@ class Simulation3DElectricField(BaseTDEMSimulation):
     fieldsPair = Fields3DElectricField  #: A Fields3DElectricField
     Fields_Derivs = FieldsDerivativesEB
 
-    # @profile
-    def Jtvec(self, m, v, f=None):
+    _Adiag_symmetric = True  #: the system matrix is symmetric
 
+    def _initialFieldsJvec(self, f, v):
         """
-            Jvec computes the adjoint of the sensitivity times a vector
+        Treating initial condition when a galvanic source is included. The DC
+        problems of the galvanic sources are solved in one block
         """
+        Srcs = self.survey.source_list
+        galvanic = [
+            i
+            for i, src in enumerate(Srcs)
+            if src.srcType == "galvanic" and src.waveform.hasInitialFields
+        ]
 
-        if f is None:
-            f = self.fields(m)
-
-        self.model = m
-        ftype = self._fieldType + "Solution"  # the thing we solved for
-
-        # Ensure v is a data object.
-        if not isinstance(v, Data):
-            v = Data(self.survey, v)
-
-        df_duT_v = self.Fields_Derivs(self)
-
-        # same size as fields at a single timestep
-        ATinv_df_duT_v = np.zeros(
-            (
-                len(self.survey.source_list),
-                len(f[self.survey.source_list[0], ftype, 0]),
-            ),
-            dtype=float,
-        )
-        JTv = np.zeros(m.shape, dtype=float)
+        dun_dm_v = np.zeros((self.mesh.nE, len(Srcs)))
+        for i, src in enumerate(Srcs):
+            if i not in galvanic:
+                dun_dm_v[:, i] = mkvc(self.getInitialFieldsDeriv(src, v, f=f))
 
-        # Loop over sources and receivers to create a fields object:
-        # PT_v, df_duT_v, df_dmT_v
-        # initialize storage for PT_v (don't need to preserve over sources)
-        PT_v = self.Fields_Derivs(self)
-        for src in self.survey.source_list:
-            # Looping over initializing field class is appending memory!
-            # PT_v = Fields_Derivs(self.mesh) # initialize storage
-            # #for PT_v (don't need to preserve over sources)
-            # initialize size
-            df_duT_v[src, "{}Deriv".format(self._fieldType), :] = np.zeros_like(
-                f[src, self._fieldType, :]
+        if len(galvanic) > 0:
+            AdcDeriv_v = np.column_stack(
+                [mkvc(self.getAdcDeriv(mkvc(f[Srcs[i], "e", 0]), v)) for i in galvanic]
             )
+            dun_dm_v[:, galvanic] = self.mesh.nodalGrad * np.reshape(
+                self.Adcinv * AdcDeriv_v, AdcDeriv_v.shape, order="F"
+            )
+        return dun_dm_v
 
-            for rx in src.receiver_list:
-                PT_v[src, "{}Deriv".format(rx.projField), :] = rx.evalDeriv(
-                    src, self.mesh, self.time_mesh, f, mkvc(v[src, rx]), adjoint=True
-                )
-                # this is +=
-
-                # PT_v = np.reshape(curPT_v,(len(curPT_v)/self.time_mesh.nN,
-                # self.time_mesh.nN), order='F')
-                df_duTFun = getattr(f, "_{}Deriv".format(rx.projField), None)
-
-                for tInd in range(self.nT + 1):
-                    cur = df_duTFun(
-                        tInd,
-                        src,
-                        None,
-                        mkvc(PT_v[src, "{}Deriv".format(rx.projField), tInd]),
-                        adjoint=True,
-                    )
-
-                    df_duT_v[src, "{}Deriv".format(self._fieldType), tInd] = df_duT_v[
-                        src, "{}Deriv".format(self._fieldType), tInd
-                    ] + mkvc(cur[0], 2)
-                    JTv = cur[1] + JTv
-
-        # no longer need this
-        del PT_v
-
-        AdiagTinv = None
-
-        # Do the back-solve through time
-        # if the previous timestep is the same: no need to refactor the matrix
-        # for tInd, dt in zip(range(self.nT), self.time_steps):
-
-        for tInd in reversed(range(self.nT)):
-            # tInd = tIndP - 1
-            if AdiagTinv is not None and (
-                tInd <= self.nT and self.time_steps[tInd] != self.time_steps[tInd + 1]
-            ):
-                AdiagTinv.clean()
-                AdiagTinv = None
-
-            # refactor if we need to
-            if AdiagTinv is None:  # and tInd > -1:
-                Adiag = self.getAdiag(tInd)
-                AdiagTinv = self.Solver(Adiag.T, **self.solver_opts)
-
-            if tInd < self.nT - 1:
-                Asubdiag = self.getAsubdiag(tInd + 1)
-
-            for isrc, src in enumerate(self.survey.source_list):
-
-                # solve against df_duT_v
-                if tInd >= self.nT - 1:
-                    # last timestep (first to be solved)
-                    ATinv_df_duT_v[isrc, :] = (
-                        AdiagTinv
-                        * df_duT_v[src, "{}Deriv".format(self._fieldType), tInd + 1]
-                    )
-                elif tInd > -1:
-                    ATinv_df_duT_v[isrc, :] = AdiagTinv * (
-                        mkvc(df_duT_v[src, "{}Deriv".format(self._fieldType), tInd + 1])
-                        - Asubdiag.T * mkvc(ATinv_df_duT_v[isrc, :])
-                    )
-
-                dAsubdiagT_dm_v = self.getAsubdiagDeriv(
-                    tInd, f[src, ftype, tInd], ATinv_df_duT_v[isrc, :], adjoint=True
-                )
-
-                dRHST_dm_v = self.getRHSDeriv(
-                    tInd + 1, src, ATinv_df_duT_v[isrc, :], adjoint=True
-                )  # on nodes of time mesh
-
-                un_src = f[src, ftype, tInd + 1]
-                # cell centered on time mesh
-                dAT_dm_v = self.getAdiagDeriv(
-                    tInd, un_src, ATinv_df_duT_v[isrc, :], adjoint=True
-                )
-
-                JTv = JTv + mkvc(-dAT_dm_v - dAsubdiagT_dm_v + dRHST_dm_v)
-
-        # Treating initial condition when a galvanic source is included
+    def _initialFieldsJtvec(self, f, df_duT_v, ATinv_df_duT_v):
+        """
+        Treating initial condition when a galvanic source is included. The DC
+        problems of the galvanic sources are solved in one block
+        """
+        ftype = self._fieldType + "Solution"
         tInd = -1
         Grad = self.mesh.nodalGrad
+        Asubdiag = self.getAsubdiag(0)
 
-        for isrc, src in enumerate(self.survey.source_list):
-            if src.srcType == "galvanic":
-
-                ATinv_df_duT_v[isrc, :] = Grad * (
-                    self.Adcinv
-                    * (
-                        Grad.T
-                        * (
-                            mkvc(
-                                df_duT_v[
-                                    src, "{}Deriv".format(self._fieldType), tInd + 1
-                                ]
-                            )
-                            - Asubdiag.T * mkvc(ATinv_df_duT_v[isrc, :])
-                        )
-                    )
-                )
+        Srcs = self.survey.source_list
+        galvanic = [i for i, src in enumerate(Srcs) if src.srcType == "galvanic"]
+        if len(galvanic) == 0:
+            return Zero()
 
-                dRHST_dm_v = self.getRHSDeriv(
-                    tInd + 1, src, ATinv_df_duT_v[isrc, :], adjoint=True
-                )  # on nodes of time mesh
+        rhs = Grad.T * (
+            df_duT_v[:, galvanic] - Asubdiag.T * ATinv_df_duT_v[:, galvanic]
+        )
+        ATinv_df_duT_v_0 = Grad * np.reshape(self.Adcinv * rhs, rhs.shape, order="F")
 
-                un_src = f[src, ftype, tInd + 1]
-                # cell centered on time mesh
-                dAT_dm_v = self.MeSigmaDeriv(
-                    un_src, ATinv_df_duT_v[isrc, :], adjoint=True
-                )
+        JTv = Zero()
+        for k, isrc in enumerate(galvanic):
+            src = Srcs[isrc]
+            dRHST_dm_v = self.getRHSDeriv(
+                tInd + 1, src, ATinv_df_duT_v_0[:, k], adjoint=True
+            )  # on nodes of time mesh
 
-                JTv = JTv + mkvc(-dAT_dm_v + dRHST_dm_v)
+            un_src = f[src, ftype, tInd + 1]
+            # cell centered on time mesh
+            dAT_dm_v = self.MeSigmaDeriv(un_src, ATinv_df_duT_v_0[:, k], adjoint=True)
 
-        # del df_duT_v, ATinv_df_duT_v, A, Asubdiag
-        if AdiagTinv is not None:
-            AdiagTinv.clean()
+            JTv = JTv + mkvc(-dAT_dm_v + dRHST_dm_v)
 
-        return mkvc(JTv).astype(float)
+        return JTv
 
     def getAdiag(self, tInd):
         """
@@ -966,6 +1295,8 @@ class Simulation3DMagneticField(BaseTDEMSimulation):
     fieldsPair = Fields3DMagneticField  #: Fields object pair
     Fields_Derivs = FieldsDerivativesHJ
 
+    _Adiag_symmetric = True  #: the system matrix is symmetric
+
     def getAdiag(self, tInd):
         """
         System matrix at a given time index
@@ -1056,6 +1387,11 @@ class Simulation3DCurrentDensity(BaseTDEMSimulation):
     fieldsPair = Fields3DCurrentDensity  #: Fields object pair
     Fields_Derivs = FieldsDerivativesHJ
 
+    @property
+    def _Adiag_symmetric(self):
+        # symmetric once it is multiplied by the inner product matrix
+        return self._makeASymmetric is True
+
     def getAdiag(self, tInd):
         """
         System matrix at a given time index
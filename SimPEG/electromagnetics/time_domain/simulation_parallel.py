@@ -0,0 +1,28 @@
+import properties
+
+from ..base_parallel import BaseSourceParallelSimulation
+from .simulation import BaseTDEMSimulation
+
+
+class SourceParallelSimulation(BaseSourceParallelSimulation):
+    """
+    Distributes the sources of a TDEM simulation over workers.
+
+    The sources are split in contiguous groups, one per worker. Each worker
+    holds a copy of the simulation for its sources, with its own
+    time-stepping factorizations and fields. :code:`fields`, :code:`dpred`,
+    :code:`Jvec` and :code:`Jtvec` scatter the model (and vector) to the
+    workers and gather their results in the order of the data of the survey.
+
+    .. code:: python
+
+        sim_parallel = SourceParallelSimulation(sim, n_cpu=8)
+        d = sim_parallel.dpred(m)
+        sim_parallel.close()
+
+    :param BaseTDEMSimulation simulation: simulation of the complete survey
+    """
+
+    simulation = properties.Instance(
+        "TDEM simulation of the complete survey", BaseTDEMSimulation, required=True
+    )
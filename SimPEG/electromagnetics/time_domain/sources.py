@@ -552,8 +552,7 @@ class LineCurrent(BaseTDEMSrc):
 
     def eInitial(self, prob):
         if self.waveform.hasInitialFields:
-            RHSdc = self.getRHSdc(prob)
-            soldc = prob.Adcinv * RHSdc
+            soldc = prob.getInitialPotential(self)
             return -prob.mesh.nodalGrad * soldc
         else:
             return Zero()
@@ -611,8 +610,7 @@ class RawVec_Grounded(BaseTDEMSrc):
 
     def phiInitial(self, prob):
         if self.waveform.hasInitialFields:
-            RHSdc = self.getRHSdc(prob)
-            return prob.Adcinv * RHSdc
+            return prob.getInitialPotential(self)
         else:
             return Zero()
 
@@ -664,25 +662,23 @@ class RawVec_Grounded(BaseTDEMSrc):
         if prob._fieldType not in ["j", "h"]:
             raise NotImplementedError
 
-        vol = prob.mesh.vol
+        return prob.getAmmr()
 
-        return (
-            prob.mesh.edgeCurl * prob.MeMuI * prob.mesh.edgeCurl.T
-            - prob.mesh.faceDiv.T
-            * sdiag(1.0 / vol * prob.mui)
-            * prob.mesh.faceDiv  # stabalizing term. See (Chen, Haber & Oldenburg 2002)
-        )
+    def getRHSmmr(self, prob):
+        s_e = self.s_e(prob, 0)
+        return s_e - self.jInitial(prob)
 
     def _aInitial(self, prob):
-        A = self._getAmmr(prob)
-        Ainv = prob.Solver(A)  # todo: store this
-        s_e = self.s_e(prob, 0)
-        rhs = s_e - self.jInitial(prob)
-        return Ainv * rhs
+        if prob._fieldType not in ["j", "h"]:
+            raise NotImplementedError
+
+        return prob.getInitialVectorPotential(self)
 
     def _aInitialDeriv(self, prob, v, adjoint=False):
-        A = self._getAmmr(prob)
-        Ainv = prob.Solver(A)  # todo: store this - move it to the problem
+        if prob._fieldType not in ["j", "h"]:
+            raise NotImplementedError
+
+        Ainv = prob.Ammrinv
 
         if adjoint is True:
             return -1 * (
@@ -3,3 +3,4 @@ from .current_utils import (
     getSourceTermLineCurrentPolygon,
     getStraightLineCurrentIntegral,
 )
+from .tiling_utils import create_local_mesh, create_tiled_misfit
@@ -0,0 +1,195 @@
+import numpy as np
+from discretize import TreeMesh
+
+from ... import props
+from ...data import Data
+from ...data_misfit import L2DataMisfit
+from ...maps import TileMap
+from ...objective_function import ComboObjectiveFunction
+
+
+def source_locations(source_list):
+    """
+    Locations of the sources and of their receivers
+
+    :param list source_list: list of sources
+    :rtype: numpy.ndarray
+    :return: (n, dim) array of locations
+    """
+    locations = []
+    for src in source_list:
+        if getattr(src, "location", None) is not None:
+            locations.append(np.atleast_2d(src.location))
+        for rx in src.receiver_list:
+            locations.append(np.atleast_2d(rx.locations))
+    return np.vstack(locations)
+
+
+def create_local_mesh(global_mesh, locations, footprint, padding_distance=None):
+    """
+    Create a local TreeMesh around a group of soundings.
+
+    Within the footprint around the locations, the local mesh has the cells
+    of the global mesh. Beyond it, the cells coarsen up to the padding
+    distance where the local mesh ends. The vertical extent is the one of
+    the global mesh. The local mesh is aligned with the global mesh and
+    never finer than it, so every local cell is a union of global cells as
+    required by :class:`SimPEG.maps.TileMap`.
+
+    :param discretize.TreeMesh global_mesh: global mesh
+    :param numpy.ndarray locations: (n, dim) locations of the soundings
+    :param float footprint: horizontal distance around the locations within
+        which the local mesh has the resolution of the global mesh
+    :param float padding_distance: horizontal distance beyond the footprint
+        covered by the local mesh, defaults to twice the footprint
+    :rtype: discretize.TreeMesh
+    :return: local mesh
+    """
+    if not isinstance(global_mesh, TreeMesh):
+        raise TypeError("global_mesh must be a TreeMesh")
+    if padding_distance is None:
+        padding_distance = 2.0 * footprint
+
+    locations = np.atleast_2d(locations)
+    lower = locations.min(axis=0)[:-1]
+    upper = locations.max(axis=0)[:-1]
+
+    gridCC = global_mesh.gridCC[:, :-1]
+    h_min = np.r_[[h.min() for h in global_mesh.h]]
+    n_global = np.r_[[len(h) for h in global_mesh.h]]
+    global_x0 = global_mesh.x0
+    # coarseness of the global cells: cells are 2 ** coarseness finest cells wide
+    coarseness = np.round(np.log2(global_mesh.h_gridded[:, 0] / h_min[0])).astype(int)
+    half_widths = 0.5 * global_mesh.h_gridded[:, :-1]
+
+    # The local mesh starts at a multiple of the largest global cell in its
+    # horizontal window and has no larger cells, so its cells line up with
+    # the global cells.
+    start = np.maximum(lower - footprint - padding_distance, global_x0[:-1])
+    end = np.minimum(
+        upper + footprint + padding_distance,
+        global_x0[:-1] + n_global[:-1] * h_min[:-1],
+    )
+    k = 0
+    while True:
+        unit = h_min[:-1] * 2 ** k
+        n = 2 ** np.ceil(np.log2((end - start) / h_min[:-1] + 1)).astype(int)
+        n = np.minimum(np.maximum(n, 2 ** k), n_global[:-1])
+        x0 = global_x0[:-1] + np.maximum(
+            np.floor((start - global_x0[:-1]) / unit) * unit, 0.0
+        )
+        x0 = np.minimum(x0, global_x0[:-1] + (n_global[:-1] - n) * h_min[:-1])
+        while np.any((x0 + n * h_min[:-1] < end) & (n < n_global[:-1])):
+            n = np.where(x0 + n * h_min[:-1] < end, 2 * n, n)
+            n = np.minimum(n, n_global[:-1])
+            x0 = np.minimum(x0, global_x0[:-1] + (n_global[:-1] - n) * h_min[:-1])
+
+        in_window = np.all(
+            (gridCC + half_widths > x0) & (gridCC - half_widths < x0 + n * h_min[:-1]),
+            axis=1,
+        )
+        k_window = coarseness[in_window].max()
+        if k_window <= k:
+            break
+        k = k_window
+
+    h_local = [h * np.ones(n_dim) for h, n_dim in zip(h_min[:-1], n)]
+    local_mesh = TreeMesh(h_local + [global_mesh.h[-1]], x0=np.r_[x0, global_x0[-1]])
+    local_mesh.refine(int(local_mesh.max_level - k), finalize=False)
+
+    # global cells within the footprint, at their global size
+    in_footprint = np.all(
+        (gridCC >= lower - footprint) & (gridCC <= upper + footprint), axis=1
+    )
+    levels = local_mesh.max_level - coarseness[in_footprint]
+    local_mesh.insert_cells(global_mesh.gridCC[in_footprint], levels, finalize=False)
+    local_mesh.finalize()
+    return local_mesh
+
+
+def _create_local_simulation(simulation, local_mesh, local_survey, tile_map):
+    """
+    Copy of the simulation on the local mesh, for the local survey. The
+    conductivity of the local cells averages the conductivity of the global
+    cells they contain.
+    """
+    kwargs = {}
+    for name, value in simulation._backend.items():
+        prop = simulation._props.get(name)
+        if name in ["mesh", "survey", "model"] or isinstance(prop, props.Mapping):
+            continue
+        if isinstance(prop, props.PhysicalProperty) and not np.isscalar(value):
+            continue
+        kwargs[name] = value
+    return simulation.__class__(
+        local_mesh,
+        survey=local_survey,
+        sigmaMap=tile_map * simulation.sigmaMap,
+        **kwargs
+    )
+
+
+def create_tiled_misfit(
+    simulation, data, footprint, sources_per_tile=1, padding_distance=None
+):
+    """
+    Data misfit of an airborne EM survey simulated on local meshes.
+
+    The sources are grouped in tiles of consecutive soundings. Each tile is
+    simulated on a local TreeMesh around its footprint (see
+    :func:`create_local_mesh`), with its conductivity mapped from the global
+    mesh by a :class:`SimPEG.maps.TileMap`. The cost of a tile does then not
+    depend on the extent of the survey. The misfits of the tiles are combined
+    in a :class:`SimPEG.objective_function.ComboObjectiveFunction`.
+
+    :param BaseEMSimulation simulation: simulation of the complete survey on
+        the global TreeMesh, with a sigmaMap from the model to the global mesh
+    :param SimPEG.data.Data data: data of the complete survey
+    :param float footprint: horizontal distance around the soundings
+        simulated at the resolution of the global mesh
+    :param int sources_per_tile: number of consecutive sources in a tile
+    :param float padding_distance: horizontal padding beyond the footprint
+    :rtype: SimPEG.objective_function.ComboObjectiveFunction
+    :return: sum of the data misfits of the tiles
+    """
+    if simulation.sigmaMap is None:
+        raise ValueError("The simulation needs a sigmaMap to create local meshes")
+
+    global_mesh = simulation.mesh
+    global_active = np.ones(global_mesh.nC, dtype=bool)
+    source_list = simulation.survey.source_list
+    data_start = np.r_[0, np.cumsum([src.nD for src in source_list])]
+    standard_deviation = data.standard_deviation
+
+    misfits = []
+    for start in range(0, len(source_list), sources_per_tile):
+        end = min(start + sources_per_tile, len(source_list))
+        local_sources = source_list[start:end]
+
+        local_mesh = create_local_mesh(
+            global_mesh,
+            source_locations(local_sources),
+            footprint,
+            padding_distance=padding_distance,
+        )
+        tile_map = TileMap(global_mesh, global_active, local_mesh, exclude_outside=True)
+        if not np.all(tile_map.local_active):
+            raise ValueError(
+                "The local mesh of sources {} to {} is finer than the global "
+                "mesh".format(start, end - 1)
+            )
+
+        local_survey = simulation.survey.__class__(local_sources)
+        local_simulation = _create_local_simulation(
+            simulation, local_mesh, local_survey, tile_map
+        )
+
+        ind = slice(data_start[start], data_start[end])
+        local_data = Data(
+            local_survey,
+            dobs=data.dobs[ind],
+            standard_deviation=standard_deviation[ind],
+        )
+        misfits.append(L2DataMisfit(data=local_data, simulation=local_simulation))
+
+    return ComboObjectiveFunction(objfcts=misfits)
@@ -1,5 +1,10 @@
+import hashlib
+import multiprocessing
+import os
+import shutil
 import numpy as np
 import scipy.sparse as sp
+from scipy.sparse.linalg import LinearOperator
 import properties
 from ...utils.code_utils import deprecate_class, deprecate_property
 
@@ -9,7 +14,149 @@ from ... import maps
 from ...utils import mkvc
 
 from .survey import SurveyVRM
-from .receivers import Point, SquareLoop
+from .receivers import SquareLoop
+
+
+############################################
+# GEOMETRY KERNEL
+############################################
+
+# Gaussian quadrature weights
+_QUADRATURE_WEIGHTS = [
+    np.r_[2.0],
+    np.r_[1.0, 1.0],
+    np.r_[0.555556, 0.888889, 0.555556],
+    np.r_[0.347855, 0.652145, 0.652145, 0.347855],
+    np.r_[0.236927, 0.478629, 0.568889, 0.478629, 0.236927],
+    np.r_[0.171324, 0.467914, 0.360762, 0.360762, 0.467914, 0.171324],
+    np.r_[0.129485, 0.279705, 0.381830, 0.417959, 0.381830, 0.279705, 0.129485],
+]
+
+# Gaussian quadrature locations on [-1,1]
+_QUADRATURE_POINTS = [
+    np.r_[0.0],
+    np.r_[-0.57735, 0.57735],
+    np.r_[-0.774597, 0.0, 0.774597],
+    np.r_[-0.861136, -0.339981, 0.339981, 0.861136],
+    np.r_[-0.906180, -0.538469, 0, 0.538469, 0.906180],
+    np.r_[-0.932470, -0.238619, -0.661209, 0.661209, 0.238619, 0.932470],
+    np.r_[-0.949108, -0.741531, -0.405845, 0.0, 0.405845, 0.741531, 0.949108],
+]
+
+# Number of point-cell pairs the kernel is computed for at once
+_BLOCK_SIZE = 2 ** 14
+
+# Number of entries of A in the blocks of rows of the products with A
+_ROW_BLOCK_SIZE = 2 ** 22
+
+# Corners of the cells (lower=0, upper=1 bound along x, y and z) in the order
+# of the alternating sums of the kernel
+_CORNERS = [
+    (0, 0, 0),
+    (1, 0, 0),
+    (1, 1, 0),
+    (0, 1, 0),
+    (0, 1, 1),
+    (0, 0, 1),
+    (1, 0, 1),
+    (1, 1, 1),
+]
+
+
+def _getGeometryKernel(xyz, xyzc, xyzh, orientation, hmin):
+
+    """
+    Geometry kernel mapping the magnetization of voxel cells to the
+    orientation component of the field at a set of points. The kernel is
+    computed for all the points and cells at once by broadcasting.
+..
+..    REQUIRED ARGUMENTS:
+..
+..    xyz: M by 3 numpy array of observation points
+..
+..    xyzc: N by 3 numpy array containing cell center locations [xc,yc,zc]
+..
+..    xyzh: N by 3 numpy array containing cell dimensions [hx,hy,hz]
+..
+..    orientation: field component 'x', 'y' or 'z'
+..
+..    hmin: smallest cell dimensions [hx,hy,hz] used for numerical stability
+..
+..    OUTPUTS:
+..
+..    G: List of the M X N kernels for the x, y and z components of the
+..    magnetization
+
+    """
+
+    c = -(1 / (4 * np.pi))
+    tol = 1e-10  # Tolerance constant for numerical stability
+    tol2 = 1000.0  # Tolerance constant for numerical stability
+
+    # Distances from the points to the lower and upper bounds of the cells
+    uvw = []
+    for ii in range(0, 3):
+        d1 = xyz[:, ii, None] - (xyzc[:, ii] - xyzh[:, ii] / 2)
+        d1[np.abs(d1) < tol] = hmin[ii] / tol2
+        d2 = xyz[:, ii, None] - (xyzc[:, ii] + xyzh[:, ii] / 2)
+        d2[np.abs(d2) < tol] = -hmin[ii] / tol2
+        uvw.append((d1, d2))
+
+    dComp = orientation.lower()
+    u, v, w = uvw
+    u2, v2, w2 = [(d1 ** 2, d2 ** 2) for d1, d2 in uvw]
+    G = [np.zeros(np.shape(u[0])) for ii in range(0, 3)]
+
+    for sign, (ii, jj, kk) in zip([1, -1, 1, -1, 1, -1, 1, -1], _CORNERS):
+
+        d = u2[ii] + v2[jj]
+        d += w2[kk]
+        np.sqrt(d, out=d)
+
+        if dComp == "x":
+            terms = [
+                np.arctan((v[jj] * w[kk]) / (u[ii] * d + tol)),
+                np.log(d - w[kk]),
+                np.log(d - v[jj]),
+            ]
+
+        elif dComp == "y":
+            terms = [
+                np.log(d - w[kk]),
+                np.arctan((u[ii] * w[kk]) / (v[jj] * d + tol)),
+                np.log(d - u[ii]),
+            ]
+
+        elif dComp == "z":
+            terms = [
+                np.log(d - v[jj]),
+                np.log(d - u[ii]),
+                np.arctan((v[jj] * w[kk]) / (u[ii] * d + tol)),
+            ]
+            terms[2] += np.arctan((u[ii] * w[kk]) / (v[jj] * d + tol))
+            terms[2] *= -1
+
+        for g, term in zip(G, terms):
+            if sign > 0:
+                g += term
+            else:
+                g -= term
+
+    for g in G:
+        g *= c
+
+    return G
+
+
+def _setPoolSimulation(simulation):
+    # Simulation of the processes building the A matrices of the sources
+    global _pool_simulation
+    _pool_simulation = simulation
+
+
+def _getPoolAMatrix(args):
+    xyzc, xyzh, pp = args
+    return _pool_simulation._getSourceAMatrix(xyzc, xyzh, pp)
 
 
 ############################################
@@ -28,6 +175,16 @@ class BaseVRMSimulation(BaseSimulation):
         "Sensitivity refinement radii from sources", dtype=float
     )
     indActive = properties.Array("Topography active cells", dtype=bool)
+    sensitivity_dtype = properties.StringChoice(
+        "Precision of the stored A matrix",
+        choices=["float64", "float32"],
+        default="float64",
+    )
+    n_cpu = properties.Integer(
+        "Number of processes the sources are distributed over to build A",
+        default=1,
+        min=1,
+    )
 
     ref_factor = deprecate_property(
         refinement_factor,
@@ -91,7 +248,7 @@ class BaseVRMSimulation(BaseSimulation):
     def _refinement_factor_observer(self, change):
         if change["value"] > 4:
             print(
-                "Refinement factor larger than 4 may result in computations which exceed memory limits"
+                "Refinement factor larger than 4 may result in long computation times"
             )
         if self.refinement_distance is not None and change["value"] != len(
             self.refinement_distance
@@ -148,6 +305,117 @@ class BaseVRMSimulation(BaseSimulation):
 
         return h0
 
+    def _getQuadrature(self, rxObj):
+
+        """
+        Offsets and weights of the points the geometry is evaluated at for
+        each location of a receiver. A point receiver is evaluated at its
+        locations. A square loop receiver is the weighted sum of the points
+        of a Gaussian quadrature over the area of the loop.
+..
+..        REQUIRED ARGUMENTS:
+..
+..        rxObj: VRM receiver
+..
+..        OUTPUTS:
+..
+..        offsets: nq X 3 array of offsets from each receiver location
+..
+..        wt: nq array of quadrature weights
+
+        """
+
+        if not isinstance(rxObj, SquareLoop):
+            return np.zeros((1, 3)), np.ones(1)
+
+        ds = _QUADRATURE_POINTS[rxObj.quadOrder - 1]
+        wt = _QUADRATURE_WEIGHTS[rxObj.quadOrder - 1]
+        nw = len(wt)
+        wt = rxObj.nTurns * (rxObj.width / 2) ** 2 * mkvc(np.outer(wt, wt))
+
+        # Quadrature points on the plane of the loop
+        plane = {"x": [1, 2], "y": [0, 2], "z": [0, 1]}[rxObj.orientation.lower()]
+        offsets = np.zeros((nw ** 2, 3))
+        offsets[:, plane[0]] = 0.5 * rxObj.width * np.kron(ds, np.ones(nw))
+        offsets[:, plane[1]] = 0.5 * rxObj.width * np.kron(np.ones(nw), ds)
+
+        return offsets, wt
+
+    def _getGeometryBlocks(self, xyzc, xyzh, pp, hmin=None):
+
+        """
+        Generator of the geometry matrix for source pp, by blocks of receiver
+        locations and cells. Each block is computed at once by broadcasting
+        the locations against the cells. The blocks are small enough for the
+        intermediate arrays of the kernel to stay in cache.
+..
+..        REQUIRED ARGUMENTS:
+..
+..        xyzc: N by 3 numpy array containing cell center locations [xc,yc,zc]
+..
+..        xyzh: N by 3 numpy array containing cell dimensions [hx,hy,hz]
+..
+..        pp: Source index
+..
+..        OPTIONAL ARGUMENTS:
+..
+..        hmin: smallest cell dimensions used for numerical stability,
+..        defaults to the smallest dimensions of xyzh
+..
+..        OUTPUTS:
+..
+..        rows: Slice of the receiver locations (rows) in the block
+..
+..        cols: Slice of the cells in the block
+..
+..        G: List of the blocks of the geometry matrix for the x, y and z
+..        components of the magnetization
+
+        """
+
+        srcObj = self.survey.source_list[pp]
+
+        nC = np.shape(xyzc)[0]  # Number of cells
+        if hmin is None:
+            hmin = np.min(xyzh, axis=0)
+
+        COUNT = 0
+
+        for rxObj in srcObj.receiver_list:
+
+            locs = rxObj.locations
+            nLoc = np.shape(locs)[0]
+            offsets, wt = self._getQuadrature(rxObj)
+            nq = len(wt)
+
+            # Number of cells and of locations in a block
+            nCells = min(max(_BLOCK_SIZE // nq, 1), nC)
+            nLocs = min(max(_BLOCK_SIZE // (nq * nCells), 1), nLoc)
+
+            for start in range(0, nLoc, nLocs):
+
+                block = locs[start : start + nLocs, :]
+                nb = np.shape(block)[0]
+                xyz = np.reshape(block[:, None, :] + offsets, (nb * nq, 3))
+                rows = slice(COUNT, COUNT + nb)
+
+                for cstart in range(0, nC, nCells):
+
+                    cols = slice(cstart, min(cstart + nCells, nC))
+                    G = _getGeometryKernel(
+                        xyz, xyzc[cols, :], xyzh[cols, :], rxObj.orientation, hmin
+                    )
+
+                    if nq > 1:
+                        G = [
+                            np.einsum("q,bqc->bc", wt, np.reshape(g, (nb, nq, -1)))
+                            for g in G
+                        ]
+
+                    yield rows, cols, G
+
+                COUNT = COUNT + nb
+
     def _getGeometryMatrix(self, xyzc, xyzh, pp):
 
         """
@@ -173,533 +441,124 @@ class BaseVRMSimulation(BaseSimulation):
         nC = np.shape(xyzc)[0]  # Number of cells
         nRx = srcObj.nRx  # Number of receiver in all rxList
 
-        ax = np.reshape(xyzc[:, 0] - xyzh[:, 0] / 2, (1, nC))
-        bx = np.reshape(xyzc[:, 0] + xyzh[:, 0] / 2, (1, nC))
-        ay = np.reshape(xyzc[:, 1] - xyzh[:, 1] / 2, (1, nC))
-        by = np.reshape(xyzc[:, 1] + xyzh[:, 1] / 2, (1, nC))
-        az = np.reshape(xyzc[:, 2] - xyzh[:, 2] / 2, (1, nC))
-        bz = np.reshape(xyzc[:, 2] + xyzh[:, 2] / 2, (1, nC))
-
         G = np.zeros((nRx, 3 * nC))
-        c = -(1 / (4 * np.pi))
-        tol = 1e-10  # Tolerance constant for numerical stability
-        tol2 = 1000.0  # Tolerance constant for numerical stability
 
-        COUNT = 0
+        for rows, cols, Gblock in self._getGeometryBlocks(xyzc, xyzh, pp):
+            for ii in range(0, 3):
+                G[rows, ii * nC + cols.start : ii * nC + cols.stop] = Gblock[ii]
 
-        for qq in range(0, len(srcObj.receiver_list)):
+        return G
 
-            rxObj = srcObj.receiver_list[qq]
-            dComp = rxObj.orientation
-            locs = rxObj.locations
-            nLoc = np.shape(locs)[0]
+    def _getAMatrix(self, xyzc, xyzh, pp, out=None, hmin=None):
 
-            if isinstance(rxObj, Point) and not isinstance(rxObj, SquareLoop):
-
-                if dComp.lower() == "x":
-                    for rr in range(0, nLoc):
-                        u1 = locs[rr, 0] - ax
-                        u1[np.abs(u1) < tol] = np.min(xyzh[:, 0]) / tol2
-                        u2 = locs[rr, 0] - bx
-                        u2[np.abs(u2) < tol] = -np.min(xyzh[:, 0]) / tol2
-                        v1 = locs[rr, 1] - ay
-                        v1[np.abs(v1) < tol] = np.min(xyzh[:, 1]) / tol2
-                        v2 = locs[rr, 1] - by
-                        v2[np.abs(v2) < tol] = -np.min(xyzh[:, 1]) / tol2
-                        w1 = locs[rr, 2] - az
-                        w1[np.abs(w1) < tol] = np.min(xyzh[:, 2]) / tol2
-                        w2 = locs[rr, 2] - bz
-                        w2[np.abs(w2) < tol] = -np.min(xyzh[:, 2]) / tol2
-
-                        d111 = np.sqrt(u1 ** 2 + v1 ** 2 + w1 ** 2)
-                        d211 = np.sqrt(u2 ** 2 + v1 ** 2 + w1 ** 2)
-                        d221 = np.sqrt(u2 ** 2 + v2 ** 2 + w1 ** 2)
-                        d121 = np.sqrt(u1 ** 2 + v2 ** 2 + w1 ** 2)
-                        d122 = np.sqrt(u1 ** 2 + v2 ** 2 + w2 ** 2)
-                        d112 = np.sqrt(u1 ** 2 + v1 ** 2 + w2 ** 2)
-                        d212 = np.sqrt(u2 ** 2 + v1 ** 2 + w2 ** 2)
-                        d222 = np.sqrt(u2 ** 2 + v2 ** 2 + w2 ** 2)
-
-                        Gxx = (
-                            np.arctan((v1 * w1) / (u1 * d111 + tol))
-                            - np.arctan((v1 * w1) / (u2 * d211 + tol))
-                            + np.arctan((v2 * w1) / (u2 * d221 + tol))
-                            - np.arctan((v2 * w1) / (u1 * d121 + tol))
-                            + np.arctan((v2 * w2) / (u1 * d122 + tol))
-                            - np.arctan((v1 * w2) / (u1 * d112 + tol))
-                            + np.arctan((v1 * w2) / (u2 * d212 + tol))
-                            - np.arctan((v2 * w2) / (u2 * d222 + tol))
-                        )
-
-                        Gyx = (
-                            np.log(d111 - w1)
-                            - np.log(d211 - w1)
-                            + np.log(d221 - w1)
-                            - np.log(d121 - w1)
-                            + np.log(d122 - w2)
-                            - np.log(d112 - w2)
-                            + np.log(d212 - w2)
-                            - np.log(d222 - w2)
-                        )
-
-                        Gzx = (
-                            np.log(d111 - v1)
-                            - np.log(d211 - v1)
-                            + np.log(d221 - v2)
-                            - np.log(d121 - v2)
-                            + np.log(d122 - v2)
-                            - np.log(d112 - v1)
-                            + np.log(d212 - v1)
-                            - np.log(d222 - v2)
-                        )
-
-                        G[COUNT, :] = c * np.c_[Gxx, Gyx, Gzx]
-                        COUNT = COUNT + 1
-
-                elif dComp.lower() == "y":
-                    for rr in range(0, nLoc):
-                        u1 = locs[rr, 0] - ax
-                        u1[np.abs(u1) < tol] = np.min(xyzh[:, 0]) / tol2
-                        u2 = locs[rr, 0] - bx
-                        u2[np.abs(u2) < tol] = -np.min(xyzh[:, 0]) / tol2
-                        v1 = locs[rr, 1] - ay
-                        v1[np.abs(v1) < tol] = np.min(xyzh[:, 1]) / tol2
-                        v2 = locs[rr, 1] - by
-                        v2[np.abs(v2) < tol] = -np.min(xyzh[:, 1]) / tol2
-                        w1 = locs[rr, 2] - az
-                        w1[np.abs(w1) < tol] = np.min(xyzh[:, 2]) / tol2
-                        w2 = locs[rr, 2] - bz
-                        w2[np.abs(w2) < tol] = -np.min(xyzh[:, 2]) / tol2
-
-                        d111 = np.sqrt(u1 ** 2 + v1 ** 2 + w1 ** 2)
-                        d211 = np.sqrt(u2 ** 2 + v1 ** 2 + w1 ** 2)
-                        d221 = np.sqrt(u2 ** 2 + v2 ** 2 + w1 ** 2)
-                        d121 = np.sqrt(u1 ** 2 + v2 ** 2 + w1 ** 2)
-                        d122 = np.sqrt(u1 ** 2 + v2 ** 2 + w2 ** 2)
-                        d112 = np.sqrt(u1 ** 2 + v1 ** 2 + w2 ** 2)
-                        d212 = np.sqrt(u2 ** 2 + v1 ** 2 + w2 ** 2)
-                        d222 = np.sqrt(u2 ** 2 + v2 ** 2 + w2 ** 2)
-
-                        Gxy = (
-                            np.log(d111 - w1)
-                            - np.log(d211 - w1)
-                            + np.log(d221 - w1)
-                            - np.log(d121 - w1)
-                            + np.log(d122 - w2)
-                            - np.log(d112 - w2)
-                            + np.log(d212 - w2)
-                            - np.log(d222 - w2)
-                        )
-
-                        Gyy = (
-                            np.arctan((u1 * w1) / (v1 * d111 + tol))
-                            - np.arctan((u2 * w1) / (v1 * d211 + tol))
-                            + np.arctan((u2 * w1) / (v2 * d221 + tol))
-                            - np.arctan((u1 * w1) / (v2 * d121 + tol))
-                            + np.arctan((u1 * w2) / (v2 * d122 + tol))
-                            - np.arctan((u1 * w2) / (v1 * d112 + tol))
-                            + np.arctan((u2 * w2) / (v1 * d212 + tol))
-                            - np.arctan((u2 * w2) / (v2 * d222 + tol))
-                        )
-
-                        Gzy = (
-                            np.log(d111 - u1)
-                            - np.log(d211 - u2)
-                            + np.log(d221 - u2)
-                            - np.log(d121 - u1)
-                            + np.log(d122 - u1)
-                            - np.log(d112 - u1)
-                            + np.log(d212 - u2)
-                            - np.log(d222 - u2)
-                        )
-
-                        G[COUNT, :] = c * np.c_[Gxy, Gyy, Gzy]
-                        COUNT = COUNT + 1
-
-                elif dComp.lower() == "z":
-                    for rr in range(0, nLoc):
-                        u1 = locs[rr, 0] - ax
-                        u1[np.abs(u1) < tol] = np.min(xyzh[:, 0]) / tol2
-                        u2 = locs[rr, 0] - bx
-                        u2[np.abs(u2) < tol] = -np.min(xyzh[:, 0]) / tol2
-                        v1 = locs[rr, 1] - ay
-                        v1[np.abs(v1) < tol] = np.min(xyzh[:, 1]) / tol2
-                        v2 = locs[rr, 1] - by
-                        v2[np.abs(v2) < tol] = -np.min(xyzh[:, 1]) / tol2
-                        w1 = locs[rr, 2] - az
-                        w1[np.abs(w1) < tol] = np.min(xyzh[:, 2]) / tol2
-                        w2 = locs[rr, 2] - bz
-                        w2[np.abs(w2) < tol] = -np.min(xyzh[:, 2]) / tol2
-
-                        d111 = np.sqrt(u1 ** 2 + v1 ** 2 + w1 ** 2)
-                        d211 = np.sqrt(u2 ** 2 + v1 ** 2 + w1 ** 2)
-                        d221 = np.sqrt(u2 ** 2 + v2 ** 2 + w1 ** 2)
-                        d121 = np.sqrt(u1 ** 2 + v2 ** 2 + w1 ** 2)
-                        d122 = np.sqrt(u1 ** 2 + v2 ** 2 + w2 ** 2)
-                        d112 = np.sqrt(u1 ** 2 + v1 ** 2 + w2 ** 2)
-                        d212 = np.sqrt(u2 ** 2 + v1 ** 2 + w2 ** 2)
-                        d222 = np.sqrt(u2 ** 2 + v2 ** 2 + w2 ** 2)
-
-                        Gxz = (
-                            np.log(d111 - v1)
-                            - np.log(d211 - v1)
-                            + np.log(d221 - v2)
-                            - np.log(d121 - v2)
-                            + np.log(d122 - v2)
-                            - np.log(d112 - v1)
-                            + np.log(d212 - v1)
-                            - np.log(d222 - v2)
-                        )
-
-                        Gyz = (
-                            np.log(d111 - u1)
-                            - np.log(d211 - u2)
-                            + np.log(d221 - u2)
-                            - np.log(d121 - u1)
-                            + np.log(d122 - u1)
-                            - np.log(d112 - u1)
-                            + np.log(d212 - u2)
-                            - np.log(d222 - u2)
-                        )
-
-                        Gzz = (
-                            -np.arctan((v1 * w1) / (u1 * d111 + tol))
-                            + np.arctan((v1 * w1) / (u2 * d211 + tol))
-                            - np.arctan((v2 * w1) / (u2 * d221 + tol))
-                            + np.arctan((v2 * w1) / (u1 * d121 + tol))
-                            - np.arctan((v2 * w2) / (u1 * d122 + tol))
-                            + np.arctan((v1 * w2) / (u1 * d112 + tol))
-                            - np.arctan((v1 * w2) / (u2 * d212 + tol))
-                            + np.arctan((v2 * w2) / (u2 * d222 + tol))
-                        )
-
-                        Gzz = (
-                            Gzz
-                            - np.arctan((u1 * w1) / (v1 * d111 + tol))
-                            + np.arctan((u2 * w1) / (v1 * d211 + tol))
-                            - np.arctan((u2 * w1) / (v2 * d221 + tol))
-                            + np.arctan((u1 * w1) / (v2 * d121 + tol))
-                            - np.arctan((u1 * w2) / (v2 * d122 + tol))
-                            + np.arctan((u1 * w2) / (v1 * d112 + tol))
-                            - np.arctan((u2 * w2) / (v1 * d212 + tol))
-                            + np.arctan((u2 * w2) / (v2 * d222 + tol))
-                        )
-
-                        G[COUNT, :] = c * np.c_[Gxz, Gyz, Gzz]
-                        COUNT = COUNT + 1
-
-            elif isinstance(rxObj, SquareLoop):
-
-                # Gaussian quadrature weights
-                wt = [
-                    np.r_[2.0],
-                    np.r_[1.0, 1.0],
-                    np.r_[0.555556, 0.888889, 0.555556],
-                    np.r_[0.347855, 0.652145, 0.652145, 0.347855],
-                    np.r_[0.236927, 0.478629, 0.568889, 0.478629, 0.236927],
-                    np.r_[0.171324, 0.467914, 0.360762, 0.360762, 0.467914, 0.171324],
-                    np.r_[
-                        0.129485,
-                        0.279705,
-                        0.381830,
-                        0.417959,
-                        0.381830,
-                        0.279705,
-                        0.129485,
-                    ],
-                ]
-                wt = wt[rxObj.quadOrder - 1]
-                nw = len(wt)
-                wt = (
-                    rxObj.nTurns
-                    * (rxObj.width / 2) ** 2
-                    * np.reshape(np.outer(wt, wt), (1, nw ** 2))
-                )
+        """
+        Creates the dense matrix G*H0 which maps from the susceptibility of the
+        cells to the receiver locations for source pp. The geometry matrix is
+        never formed, the blocks of G*H0 are written to out as they are
+        computed.
+..
+..        REQUIRED ARGUMENTS:
+..
+..        xyzc: N by 3 numpy array containing cell center locations [xc,yc,zc]
+..
+..        xyzh: N by 3 numpy array containing cell dimensions [hx,hy,hz]
+..
+..        pp: Source index
+..
+..        OPTIONAL ARGUMENTS:
+..
+..        out: nRx X N array (or memmap) the matrix is written to
+..
+..        hmin: smallest cell dimensions used for numerical stability
+..
+..        OUTPUTS:
+..
+..        A: nRx X N array
 
-                # Gaussian quadrature locations on [-1,1]
-                ds = [
-                    np.r_[0.0],
-                    np.r_[-0.57735, 0.57735],
-                    np.r_[-0.774597, 0.0, 0.774597],
-                    np.r_[-0.861136, -0.339981, 0.339981, 0.861136],
-                    np.r_[-0.906180, -0.538469, 0, 0.538469, 0.906180],
-                    np.r_[
-                        -0.932470, -0.238619, -0.661209, 0.661209, 0.238619, 0.932470
-                    ],
-                    np.r_[
-                        -0.949108,
-                        -0.741531,
-                        -0.405845,
-                        0.0,
-                        0.405845,
-                        0.741531,
-                        0.949108,
-                    ],
-                ]
-
-                s1 = (
-                    0.5
-                    * rxObj.width
-                    * np.reshape(
-                        np.kron(ds[rxObj.quadOrder - 1], np.ones(nw)), (nw ** 2, 1)
-                    )
-                )
-                s2 = (
-                    0.5
-                    * rxObj.width
-                    * np.reshape(
-                        np.kron(np.ones(nw), ds[rxObj.quadOrder - 1]), (nw ** 2, 1)
+        """
+
+        srcObj = self.survey.source_list[pp]
+
+        if out is None:
+            out = np.zeros((srcObj.nRx, np.shape(xyzc)[0]))
+
+        h0 = srcObj.getH0(xyzc)
+
+        for rows, cols, G in self._getGeometryBlocks(xyzc, xyzh, pp, hmin=hmin):
+            out[rows, cols] = (
+                G[0] * h0[cols, 0] + G[1] * h0[cols, 1] + G[2] * h0[cols, 2]
+            )
+
+        return out
+
+    def _getSourceAMatrix(self, xyzc, xyzh, pp, out=None):
+
+        """
+        Creates the A matrix for source pp, with the sensitivities of the
+        cells near the source refined.
+..
+..        REQUIRED ARGUMENTS:
+..
+..        xyzc: N by 3 numpy array containing cell center locations [xc,yc,zc]
+..
+..        xyzh: N by 3 numpy array containing cell dimensions [hx,hy,hz]
+..
+..        pp: Source index
+..
+..        OPTIONAL ARGUMENTS:
+..
+..        out: nRx X N array (or memmap) the matrix is written to
+..
+..        OUTPUTS:
+..
+..        A: nRx X N array of type sensitivity_dtype
+
+        """
+
+        srcObj = self.survey.source_list[pp]
+
+        if out is None:
+            out = np.zeros(
+                (srcObj.nRx, np.shape(xyzc)[0]), dtype=self.sensitivity_dtype
+            )
+
+        # Create initial A matrix
+        A = self._getAMatrix(xyzc, xyzh, pp, out=out)
+
+        # Refine A matrix
+        refinement_factor = self.refinement_factor
+        refinement_distance = self.refinement_distance
+
+        if refinement_factor > 0:
+
+            refFlag = srcObj._getRefineFlags(
+                xyzc, refinement_factor, refinement_distance
+            )
+
+            for qq in range(1, refinement_factor + 1):
+                if len(refFlag[refFlag == qq]) != 0:
+                    A[:, refFlag == qq] = self._getSubsetAcolumns(
+                        xyzc, xyzh, pp, qq, refFlag
                     )
-                )
 
-                if dComp.lower() == "x":
-                    for rr in range(0, nLoc):
-
-                        u1 = np.kron(np.ones((nw ** 2, 1)), locs[rr, 0] - ax)
-                        u1[np.abs(u1) < tol] = np.min(xyzh[:, 0]) / tol2
-                        u2 = np.kron(np.ones((nw ** 2, 1)), locs[rr, 0] - bx)
-                        u2[np.abs(u2) < tol] = -np.min(xyzh[:, 0]) / tol2
-
-                        v1 = np.kron(np.ones((nw ** 2, 1)), locs[rr, 1] - ay) + np.kron(
-                            s1, np.ones((1, nC))
-                        )
-                        v1[np.abs(v1) < tol] = np.min(xyzh[:, 1]) / tol2
-                        v2 = np.kron(np.ones((nw ** 2, 1)), locs[rr, 1] - by) + np.kron(
-                            s1, np.ones((1, nC))
-                        )
-                        v2[np.abs(v2) < tol] = -np.min(xyzh[:, 1]) / tol2
-
-                        w1 = np.kron(np.ones((nw ** 2, 1)), locs[rr, 2] - az) + np.kron(
-                            s2, np.ones((1, nC))
-                        )
-                        w1[np.abs(w1) < tol] = np.min(xyzh[:, 2]) / tol2
-                        w2 = np.kron(np.ones((nw ** 2, 1)), locs[rr, 2] - bz) + np.kron(
-                            s2, np.ones((1, nC))
-                        )
-                        w2[np.abs(w2) < tol] = -np.min(xyzh[:, 2]) / tol2
-
-                        d111 = np.sqrt(u1 ** 2 + v1 ** 2 + w1 ** 2)
-                        d211 = np.sqrt(u2 ** 2 + v1 ** 2 + w1 ** 2)
-                        d221 = np.sqrt(u2 ** 2 + v2 ** 2 + w1 ** 2)
-                        d121 = np.sqrt(u1 ** 2 + v2 ** 2 + w1 ** 2)
-                        d122 = np.sqrt(u1 ** 2 + v2 ** 2 + w2 ** 2)
-                        d112 = np.sqrt(u1 ** 2 + v1 ** 2 + w2 ** 2)
-                        d212 = np.sqrt(u2 ** 2 + v1 ** 2 + w2 ** 2)
-                        d222 = np.sqrt(u2 ** 2 + v2 ** 2 + w2 ** 2)
-
-                        Gxx = (
-                            np.arctan((v1 * w1) / (u1 * d111 + tol))
-                            - np.arctan((v1 * w1) / (u2 * d211 + tol))
-                            + np.arctan((v2 * w1) / (u2 * d221 + tol))
-                            - np.arctan((v2 * w1) / (u1 * d121 + tol))
-                            + np.arctan((v2 * w2) / (u1 * d122 + tol))
-                            - np.arctan((v1 * w2) / (u1 * d112 + tol))
-                            + np.arctan((v1 * w2) / (u2 * d212 + tol))
-                            - np.arctan((v2 * w2) / (u2 * d222 + tol))
-                        )
-
-                        Gxx = np.dot(wt, Gxx)
-
-                        Gyx = (
-                            np.log(d111 - w1)
-                            - np.log(d211 - w1)
-                            + np.log(d221 - w1)
-                            - np.log(d121 - w1)
-                            + np.log(d122 - w2)
-                            - np.log(d112 - w2)
-                            + np.log(d212 - w2)
-                            - np.log(d222 - w2)
-                        )
-
-                        Gyx = np.dot(wt, Gyx)
-
-                        Gzx = (
-                            np.log(d111 - v1)
-                            - np.log(d211 - v1)
-                            + np.log(d221 - v2)
-                            - np.log(d121 - v2)
-                            + np.log(d122 - v2)
-                            - np.log(d112 - v1)
-                            + np.log(d212 - v1)
-                            - np.log(d222 - v2)
-                        )
-
-                        Gzx = np.dot(wt, Gzx)
-
-                        G[COUNT, :] = c * np.c_[Gxx, Gyx, Gzx]
-                        COUNT = COUNT + 1
-
-                elif dComp.lower() == "y":
-                    for rr in range(0, nLoc):
-
-                        u1 = np.kron(np.ones((nw ** 2, 1)), locs[rr, 0] - ax) + np.kron(
-                            s1, np.ones((1, nC))
-                        )
-                        u1[np.abs(u1) < tol] = np.min(xyzh[:, 0]) / tol2
-                        u2 = np.kron(np.ones((nw ** 2, 1)), locs[rr, 0] - bx) + np.kron(
-                            s1, np.ones((1, nC))
-                        )
-                        u2[np.abs(u2) < tol] = -np.min(xyzh[:, 0]) / tol2
-
-                        v1 = np.kron(np.ones((nw ** 2, 1)), locs[rr, 1] - ay)
-                        v1[np.abs(v1) < tol] = np.min(xyzh[:, 1]) / tol2
-                        v2 = np.kron(np.ones((nw ** 2, 1)), locs[rr, 1] - by)
-                        v2[np.abs(v2) < tol] = -np.min(xyzh[:, 1]) / tol2
-
-                        w1 = np.kron(np.ones((nw ** 2, 1)), locs[rr, 2] - az) + np.kron(
-                            s2, np.ones((1, nC))
-                        )
-                        w1[np.abs(w1) < tol] = np.min(xyzh[:, 2]) / tol2
-                        w2 = np.kron(np.ones((nw ** 2, 1)), locs[rr, 2] - bz) + np.kron(
-                            s2, np.ones((1, nC))
-                        )
-                        w2[np.abs(w2) < tol] = -np.min(xyzh[:, 2]) / tol2
-
-                        d111 = np.sqrt(u1 ** 2 + v1 ** 2 + w1 ** 2)
-                        d211 = np.sqrt(u2 ** 2 + v1 ** 2 + w1 ** 2)
-                        d221 = np.sqrt(u2 ** 2 + v2 ** 2 + w1 ** 2)
-                        d121 = np.sqrt(u1 ** 2 + v2 ** 2 + w1 ** 2)
-                        d122 = np.sqrt(u1 ** 2 + v2 ** 2 + w2 ** 2)
-                        d112 = np.sqrt(u1 ** 2 + v1 ** 2 + w2 ** 2)
-                        d212 = np.sqrt(u2 ** 2 + v1 ** 2 + w2 ** 2)
-                        d222 = np.sqrt(u2 ** 2 + v2 ** 2 + w2 ** 2)
-
-                        Gxy = (
-                            np.log(d111 - w1)
-                            - np.log(d211 - w1)
-                            + np.log(d221 - w1)
-                            - np.log(d121 - w1)
-                            + np.log(d122 - w2)
-                            - np.log(d112 - w2)
-                            + np.log(d212 - w2)
-                            - np.log(d222 - w2)
-                        )
-
-                        Gxy = np.dot(wt, Gxy)
-
-                        Gyy = (
-                            np.arctan((u1 * w1) / (v1 * d111 + tol))
-                            - np.arctan((u2 * w1) / (v1 * d211 + tol))
-                            + np.arctan((u2 * w1) / (v2 * d221 + tol))
-                            - np.arctan((u1 * w1) / (v2 * d121 + tol))
-                            + np.arctan((u1 * w2) / (v2 * d122 + tol))
-                            - np.arctan((u1 * w2) / (v1 * d112 + tol))
-                            + np.arctan((u2 * w2) / (v1 * d212 + tol))
-                            - np.arctan((u2 * w2) / (v2 * d222 + tol))
-                        )
-
-                        Gyy = np.dot(wt, Gyy)
-
-                        Gzy = (
-                            np.log(d111 - u1)
-                            - np.log(d211 - u2)
-                            + np.log(d221 - u2)
-                            - np.log(d121 - u1)
-                            + np.log(d122 - u1)
-                            - np.log(d112 - u1)
-                            + np.log(d212 - u2)
-                            - np.log(d222 - u2)
-                        )
-
-                        Gzy = np.dot(wt, Gzy)
-
-                        G[COUNT, :] = c * np.c_[Gxy, Gyy, Gzy]
-                        COUNT = COUNT + 1
-
-                elif dComp.lower() == "z":
-                    for rr in range(0, nLoc):
-
-                        u1 = np.kron(np.ones((nw ** 2, 1)), locs[rr, 0] - ax) + np.kron(
-                            s1, np.ones((1, nC))
-                        )
-                        u1[np.abs(u1) < tol] = np.min(xyzh[:, 0]) / tol2
-                        u2 = np.kron(np.ones((nw ** 2, 1)), locs[rr, 0] - bx) + np.kron(
-                            s1, np.ones((1, nC))
-                        )
-
-                        u2[np.abs(u2) < tol] = -np.min(xyzh[:, 0]) / tol2
-                        v1 = np.kron(np.ones((nw ** 2, 1)), locs[rr, 1] - ay) + np.kron(
-                            s2, np.ones((1, nC))
-                        )
-                        v1[np.abs(v1) < tol] = np.min(xyzh[:, 1]) / tol2
-                        v2 = np.kron(np.ones((nw ** 2, 1)), locs[rr, 1] - by) + np.kron(
-                            s2, np.ones((1, nC))
-                        )
-                        v2[np.abs(v2) < tol] = -np.min(xyzh[:, 1]) / tol2
-
-                        w1 = np.kron(np.ones((nw ** 2, 1)), locs[rr, 2] - az)
-                        w1[np.abs(w1) < tol] = np.min(xyzh[:, 2]) / tol2
-                        w2 = np.kron(np.ones((nw ** 2, 1)), locs[rr, 2] - bz)
-                        w2[np.abs(w2) < tol] = -np.min(xyzh[:, 2]) / tol2
-
-                        d111 = np.sqrt(u1 ** 2 + v1 ** 2 + w1 ** 2)
-                        d211 = np.sqrt(u2 ** 2 + v1 ** 2 + w1 ** 2)
-                        d221 = np.sqrt(u2 ** 2 + v2 ** 2 + w1 ** 2)
-                        d121 = np.sqrt(u1 ** 2 + v2 ** 2 + w1 ** 2)
-                        d122 = np.sqrt(u1 ** 2 + v2 ** 2 + w2 ** 2)
-                        d112 = np.sqrt(u1 ** 2 + v1 ** 2 + w2 ** 2)
-                        d212 = np.sqrt(u2 ** 2 + v1 ** 2 + w2 ** 2)
-                        d222 = np.sqrt(u2 ** 2 + v2 ** 2 + w2 ** 2)
-
-                        Gxz = (
-                            np.log(d111 - v1)
-                            - np.log(d211 - v1)
-                            + np.log(d221 - v2)
-                            - np.log(d121 - v2)
-                            + np.log(d122 - v2)
-                            - np.log(d112 - v1)
-                            + np.log(d212 - v1)
-                            - np.log(d222 - v2)
-                        )
-
-                        Gxz = np.dot(wt, Gxz)
-
-                        Gyz = (
-                            np.log(d111 - u1)
-                            - np.log(d211 - u2)
-                            + np.log(d221 - u2)
-                            - np.log(d121 - u1)
-                            + np.log(d122 - u1)
-                            - np.log(d112 - u1)
-                            + np.log(d212 - u2)
-                            - np.log(d222 - u2)
-                        )
-
-                        Gyz = np.dot(wt, Gyz)
-
-                        Gzz = (
-                            -np.arctan((v1 * w1) / (u1 * d111 + tol))
-                            + np.arctan((v1 * w1) / (u2 * d211 + tol))
-                            - np.arctan((v2 * w1) / (u2 * d221 + tol))
-                            + np.arctan((v2 * w1) / (u1 * d121 + tol))
-                            - np.arctan((v2 * w2) / (u1 * d122 + tol))
-                            + np.arctan((v1 * w2) / (u1 * d112 + tol))
-                            - np.arctan((v1 * w2) / (u2 * d212 + tol))
-                            + np.arctan((v2 * w2) / (u2 * d222 + tol))
-                        )
-
-                        Gzz = (
-                            Gzz
-                            - np.arctan((u1 * w1) / (v1 * d111 + tol))
-                            + np.arctan((u2 * w1) / (v1 * d211 + tol))
-                            - np.arctan((u2 * w1) / (v2 * d221 + tol))
-                            + np.arctan((u1 * w1) / (v2 * d121 + tol))
-                            - np.arctan((u1 * w2) / (v2 * d122 + tol))
-                            + np.arctan((u1 * w2) / (v1 * d112 + tol))
-                            - np.arctan((u2 * w2) / (v1 * d212 + tol))
-                            + np.arctan((u2 * w2) / (v2 * d222 + tol))
-                        )
-
-                        Gzz = np.dot(wt, Gzz)
-
-                        G[COUNT, :] = c * np.c_[Gxz, Gyz, Gzz]
-                        COUNT = COUNT + 1
-
-        return np.matrix(G)
-
-    def _getAMatricies(self):
-
-        """Returns the full geometric operator"""
+        return A
+
+    def _getAMatricies(self, out=None):
+
+        """
+        Returns the list of the A matrices of the sources. The sources are
+        distributed over n_cpu processes.
+..
+..        OPTIONAL ARGUMENTS:
+..
+..        out: array (numpy, memmap or zarr) the A matrices of the sources are
+..        written to, one after the other along the rows
+..
+..        OUTPUTS:
+..
+..        A: List of the A matrices, or out
+
+        """
 
         indActive = self.indActive
 
@@ -709,32 +568,36 @@ class BaseVRMSimulation(BaseSimulation):
         xyzh = meshObj.h_gridded[indActive, :]
 
         # GET LIST OF A MATRICIES
-        A = []
-        for pp in range(0, self.survey.nSrc):
-
-            # Create initial A matrix
-            G = self._getGeometryMatrix(xyzc, xyzh, pp)
-            H0 = self._getH0matrix(xyzc, pp)
-            A.append(G * H0)
-
-            # Refine A matrix
-            refinement_factor = self.refinement_factor
-            refinement_distance = self.refinement_distance
-
-            if refinement_factor > 0:
-
-                srcObj = self.survey.source_list[pp]
-                refFlag = srcObj._getRefineFlags(
-                    xyzc, refinement_factor, refinement_distance
-                )
+        nSrc = self.survey.nSrc
+        n_cpu = min(self.n_cpu, nSrc)
+        rows = np.r_[0, np.cumsum([srcObj.nRx for srcObj in self.survey.source_list])]
 
-                for qq in range(1, refinement_factor + 1):
-                    if len(refFlag[refFlag == qq]) != 0:
-                        A[pp][:, refFlag == qq] = self._getSubsetAcolumns(
-                            xyzc, xyzh, pp, qq, refFlag
-                        )
+        # numpy arrays and memmaps are written to in place
+        if isinstance(out, np.ndarray):
+            outs = [out[rows[pp] : rows[pp + 1], :] for pp in range(0, nSrc)]
+        else:
+            outs = nSrc * [None]
+
+        if n_cpu > 1:
+            with multiprocessing.Pool(
+                n_cpu, initializer=_setPoolSimulation, initargs=(self,)
+            ) as pool:
+                A = pool.imap(_getPoolAMatrix, [(xyzc, xyzh, pp) for pp in range(nSrc)])
+                if out is None:
+                    A = list(A)
+                else:
+                    for pp, App in enumerate(A):
+                        out[rows[pp] : rows[pp + 1], :] = App
+        else:
+            A = []
+            for pp in range(0, nSrc):
+                App = self._getSourceAMatrix(xyzc, xyzh, pp, out=outs[pp])
+                if out is None:
+                    A.append(App)
+                elif outs[pp] is None:
+                    out[rows[pp] : rows[pp + 1], :] = App
 
-        return A
+        return A if out is None else out
 
     def _getSubsetAcolumns(self, xyzc, xyzh, pp, qq, refFlag):
 
@@ -760,6 +623,8 @@ class BaseVRMSimulation(BaseSimulation):
 
         """
 
+        srcObj = self.survey.source_list[pp]
+
         # GET SUBMESH GRID
         n = 2 ** qq
         [nx, ny, nz] = np.meshgrid(
@@ -769,24 +634,37 @@ class BaseVRMSimulation(BaseSimulation):
         )
         nxyz_sub = np.c_[mkvc(nx), mkvc(ny), mkvc(nz)]
 
-        xyzh_sub = xyzh[refFlag == qq, :]  # Get widths of cells to be refined
-        xyzc_sub = (
-            xyzc[refFlag == qq, :] - xyzh[refFlag == qq, :] / 2
+        xyzh_ref = xyzh[refFlag == qq, :]  # Get widths of cells to be refined
+        xyzc_ref = (
+            xyzc[refFlag == qq, :] - xyzh_ref / 2
         )  # Get bottom southwest corners of cells to be refined
-        m = np.shape(xyzc_sub)[0]
-        xyzc_sub = np.kron(
-            xyzc_sub, np.ones((n ** 3, 1))
-        )  # Kron for n**3 refined cells
-        xyzh_sub = np.kron(
-            xyzh_sub / n, np.ones((n ** 3, 1))
-        )  # Kron for n**3 refined cells with widths h/n
-        nxyz_sub = np.kron(np.ones((m, 1)), nxyz_sub)  # Kron for n**3 refined cells
-        xyzc_sub = xyzc_sub + xyzh_sub * nxyz_sub
-
-        # GET SUBMESH A MATRIX AND COLLAPSE TO COLUMNS
-        G = self._getGeometryMatrix(xyzc_sub, xyzh_sub, pp)
-        H0 = self._getH0matrix(xyzc_sub, pp)
-        Acols = (G * H0) * sp.kron(sp.diags(np.ones(m)), np.ones((n ** 3, 1)))
+        m = np.shape(xyzc_ref)[0]
+        hmin = np.min(xyzh_ref, axis=0) / n
+
+        # GET SUBMESH A MATRIX AND COLLAPSE TO COLUMNS. The refined cells are
+        # built for blocks of cells and summed into the columns of their cell
+        # one block of the geometry at a time
+        Acols = np.zeros((srcObj.nRx, m))
+        nBlock = max(_BLOCK_SIZE // n ** 3, 1)
+
+        for start in range(0, m, nBlock):
+
+            inds = np.arange(start, min(start + nBlock, m))
+            parent = np.repeat(inds, n ** 3)
+            xyzh_sub = xyzh_ref[parent, :] / n  # n**3 refined cells with widths h/n
+            xyzc_sub = xyzc_ref[parent, :] + xyzh_sub * np.tile(
+                nxyz_sub, (len(inds), 1)
+            )
+            h0 = srcObj.getH0(xyzc_sub)
+
+            for rows, cols, G in self._getGeometryBlocks(
+                xyzc_sub, xyzh_sub, pp, hmin=hmin
+            ):
+                A = G[0] * h0[cols, 0] + G[1] * h0[cols, 1] + G[2] * h0[cols, 2]
+
+                # Sum the refined cells of each cell in the block
+                first = np.r_[0, np.nonzero(np.diff(parent[cols]))[0] + 1]
+                Acols[rows, parent[cols][first]] += np.add.reduceat(A, first, axis=1)
 
         return Acols
 
@@ -819,6 +697,13 @@ class Simulation3DLinear(BaseVRMSimulation):
 
     survey = properties.Instance("VRM Survey", SurveyVRM)
 
+    store_sensitivities = properties.StringChoice(
+        "Store A in memory ('ram'), on disk as a numpy memmap ('disk') or a "
+        "'zarr' array, or compute it for each product ('forward_only')",
+        choices=["ram", "disk", "zarr", "forward_only"],
+        default="ram",
+    )
+
     xi, xiMap, xiDeriv = props.Invertible(
         "Amalgamated Viscous Remanent Magnetization Parameter xi = dchi/ln(tau2/tau1)"
     )
@@ -838,6 +723,12 @@ class Simulation3DLinear(BaseVRMSimulation):
         The geometric sensitivity matrix for the linear VRM problem. Accessing
         this property requires that the problem be paired with a survey object.
 
+        With store_sensitivities='disk' or 'zarr', A is stored in
+        sensitivity_path under a hash of the mesh, active cells, refinement,
+        sources and receivers. A stored matrix is reused by later simulations
+        with the same geometry. With 'forward_only', A is computed each time
+        it is accessed and is not stored.
+
         """
 
         if self._AisSet is False:
@@ -849,10 +740,20 @@ class Simulation3DLinear(BaseVRMSimulation):
             if self._A is not None:
                 self._A = None
 
-            print("CREATING A MATRIX")
+            if self.store_sensitivities in ["disk", "zarr"]:
+                A = self._getStoredA()
+            else:
+                print("CREATING A MATRIX")
 
-            # COLLAPSE ALL A MATRICIES INTO SINGLE OPERATOR
-            self._A = np.vstack(self._getAMatricies())
+                # COLLAPSE ALL A MATRICIES INTO SINGLE OPERATOR
+                A = self._getAMatricies(
+                    out=np.empty(self._Ashape, dtype=self.sensitivity_dtype)
+                )
+
+            if self.store_sensitivities == "forward_only":
+                return A
+
+            self._A = A
             self._AisSet = True
 
             return self._A
@@ -861,55 +762,244 @@ class Simulation3DLinear(BaseVRMSimulation):
 
             return self._A
 
+    @property
+    def _Ashape(self):
+        nRx = np.sum([srcObj.nRx for srcObj in self.survey.source_list])
+        return (int(nRx), int(np.sum(self.indActive)))
+
+    @property
+    def _Ahash(self):
+
+        """
+        Hash of everything the A matrix depends on: the active cells, the
+        refinement, the inducing fields of the sources at the cells and the
+        geometry of the receivers
+        """
+
+        indActive = self.indActive
+        xyzc = self.mesh.gridCC[indActive, :]
+        xyzh = self.mesh.h_gridded[indActive, :]
+
+        sha = hashlib.sha1()
+        sha.update(self.sensitivity_dtype.encode())
+        for array in [xyzc, xyzh, self.refinement_distance, [self.refinement_factor]]:
+            sha.update(np.asarray(array, dtype=float).tobytes())
+
+        for srcObj in self.survey.source_list:
+            sha.update(np.asarray(srcObj.getH0(xyzc), dtype=float).tobytes())
+            for rxObj in srcObj.receiver_list:
+                sha.update(type(rxObj).__name__.encode())
+                sha.update(rxObj.orientation.lower().encode())
+                sha.update(np.asarray(rxObj.locations, dtype=float).tobytes())
+                if isinstance(rxObj, SquareLoop):
+                    sha.update(
+                        np.r_[rxObj.width, rxObj.nTurns, rxObj.quadOrder].tobytes()
+                    )
+
+        return sha.hexdigest()
+
+    def _getStoredA(self):
+
+        """
+        Opens the A matrix stored in sensitivity_path, or computes and stores
+        it. The sources are written to the file as they are computed.
+        """
+
+        shape = self._Ashape
+        name = os.path.join(self.sensitivity_path, "A_" + self._Ahash)
+        os.makedirs(self.sensitivity_path, exist_ok=True)
+
+        if self.store_sensitivities == "disk":
+
+            name = name + ".npy"
+            if os.path.exists(name):
+                A = np.load(name, mmap_mode="r")
+                if A.shape == shape:
+                    print(
+                        "Found sensitivity file at {} with expected shape".format(name)
+                    )
+                    return A
+
+            print("CREATING A MATRIX")
+            print("writing sensitivity to {}".format(name))
+
+            # Written to a temporary file, renamed once complete
+            temp = name[:-4] + "_{}.tmp".format(os.getpid())
+            A = np.lib.format.open_memmap(
+                temp, mode="w+", dtype=self.sensitivity_dtype, shape=shape
+            )
+            self._getAMatricies(out=A)
+            A.flush()
+            del A
+            os.replace(temp, name)
+
+            return np.load(name, mmap_mode="r")
+
+        try:
+            import zarr
+        except ImportError:
+            raise ImportError(
+                "zarr is required for store_sensitivities='zarr', please install it"
+            )
+
+        name = name + ".zarr"
+        if os.path.exists(name):
+            A = zarr.open(name, mode="r")
+            if A.shape == shape:
+                print("Found sensitivity file at {} with expected shape".format(name))
+                return A
+
+        print("CREATING A MATRIX")
+        print("writing sensitivity to {}".format(name))
+
+        # Written to a temporary directory, renamed once complete
+        temp = name[:-5] + "_{}.tmp".format(os.getpid())
+        A = zarr.open(
+            temp,
+            mode="w",
+            shape=shape,
+            chunks=(self._nRowBlock, shape[1]),
+            dtype=self.sensitivity_dtype,
+        )
+        self._getAMatricies(out=A)
+        del A
+        if os.path.exists(name):
+            # an array of another shape cannot be replaced by a rename
+            shutil.rmtree(name)
+        os.replace(temp, name)
+
+        return zarr.open(name, mode="r")
+
+    @property
+    def _nRowBlock(self):
+        # Number of rows of A in the blocks of the products
+        return max(_ROW_BLOCK_SIZE // max(self._Ashape[1], 1), 1)
+
+    def _Avec(self, v):
+
+        """
+        Computes A*v by blocks of rows of A, which are cast to float64 one at a
+        time. With store_sensitivities='forward_only', the A matrices of the
+        sources are computed one at a time instead.
+        """
+
+        if self.store_sensitivities == "forward_only":
+            return np.hstack([App.dot(v) for App in self._iterSourceAMatricies()])
+
+        A = self.A
+        Av = np.empty(self._Ashape[0])
+        for start in range(0, self._Ashape[0], self._nRowBlock):
+            rows = slice(start, start + self._nRowBlock)
+            Av[rows] = np.asarray(A[rows], dtype=float).dot(v)
+
+        return Av
+
+    def _Atvec(self, v):
+
+        """
+        Computes A.T*v by blocks of rows of A, which are cast to float64 one at
+        a time. With store_sensitivities='forward_only', the A matrices of the
+        sources are computed one at a time instead.
+        """
+
+        Atv = np.zeros(self._Ashape[1])
+
+        if self.store_sensitivities == "forward_only":
+            COUNT = 0
+            for App in self._iterSourceAMatricies():
+                Atv += App.T.dot(v[COUNT : COUNT + np.shape(App)[0]])
+                COUNT = COUNT + np.shape(App)[0]
+            return Atv
+
+        A = self.A
+        for start in range(0, self._Ashape[0], self._nRowBlock):
+            rows = slice(start, start + self._nRowBlock)
+            Atv += np.asarray(A[rows], dtype=float).T.dot(v[rows])
+
+        return Atv
+
+    def _iterSourceAMatricies(self):
+        # A matrices of the sources, computed one at a time
+        xyzc = self.mesh.gridCC[self.indActive, :]
+        xyzh = self.mesh.h_gridded[self.indActive, :]
+        for pp in range(0, self.survey.nSrc):
+            yield self._getSourceAMatrix(xyzc, xyzh, pp)
+
     @property
     def T(self):
 
         """
-        The characteristic decay matrix for the VRM problem. Accessing this
+        The characteristic decay operator for the VRM problem. Accessing this
         property requires that the problem be paired with a survey object.
+        The operator applies the characteristic decay of each receiver to the
+        rows of A*m; the Kronecker products of the decays with identities
+        are never formed.
 
         """
 
+        nRows = np.sum([nLoc for nLoc, eta in self._decays])
+        nD = np.sum([nLoc * len(eta) for nLoc, eta in self._decays])
+
+        return LinearOperator(
+            (nD, nRows), matvec=self._Tvec, rmatvec=self._Ttvec, dtype=float
+        )
+
+    @property
+    def _decays(self):
+
+        """Number of locations and characteristic decay of each receiver"""
+
         if self._TisSet is False:
 
             if self.survey is None:
-                AssertionError("A survey must be set to generate A matrix")
+                AssertionError("A survey must be set to generate T operator")
 
-            # Remove any previously stored T matrix
-            if self._T is not None:
-                self._T = None
+            T = []
 
-            print("CREATING T MATRIX")
+            for srcObj in self.survey.source_list:
 
-            srcList = self.survey.source_list
-            nSrc = len(srcList)
-            T = []
+                waveObj = srcObj.waveform
 
-            for pp in range(0, nSrc):
+                for rxObj in srcObj.receiver_list:
+
+                    nLoc = np.shape(rxObj.locations)[0]
+                    eta = waveObj.getCharDecay(rxObj.fieldType, rxObj.times)
 
-                rxList = srcList[pp].receiver_list
-                nRx = len(rxList)
-                waveObj = srcList[pp].waveform
+                    T.append((nLoc, mkvc(eta)))
 
-                for qq in range(0, nRx):
+            self._T = T
+            self._TisSet = True
 
-                    times = rxList[qq].times
-                    nLoc = np.shape(rxList[qq].locations)[0]
+        return self._T
 
-                    I = sp.diags(np.ones(nLoc))
-                    eta = waveObj.getCharDecay(rxList[qq].fieldType, times)
-                    eta = np.matrix(eta).T
+    def _Tvec(self, v):
 
-                    T.append(sp.kron(I, eta))
+        """Applies the characteristic decays to the rows v of A*m"""
 
-            self._T = sp.block_diag(T)
-            self._TisSet = True
+        v = mkvc(v)
+        d = []
+        COUNT = 0
+
+        for nLoc, eta in self._decays:
+            d.append(np.outer(v[COUNT : COUNT + nLoc], eta).ravel())
+            COUNT = COUNT + nLoc
 
-            return self._T
+        return np.hstack(d)
 
-        elif self._TisSet is True:
+    def _Ttvec(self, v):
 
-            return self._T
+        """Applies the transpose of the characteristic decays to data v"""
+
+        v = mkvc(v)
+        w = []
+        COUNT = 0
+
+        for nLoc, eta in self._decays:
+            nD = nLoc * len(eta)
+            w.append(np.reshape(v[COUNT : COUNT + nD], (nLoc, len(eta))).dot(eta))
+            COUNT = COUNT + nD
+
+        return np.hstack(w)
 
     def fields(self, m):
 
@@ -921,11 +1011,9 @@ class Simulation3DLinear(BaseVRMSimulation):
         self.model = m  # Initiates/updates model and initiates mapping
 
         # Project to active mesh cells
-        # m = np.matrix(self.xiMap * m).T
-        m = np.matrix(self.xiMap * m).T
+        m = self.xiMap * m
 
-        # Must return as a numpy array
-        return mkvc(sp.coo_matrix.dot(self.T, np.dot(self.A, m)))
+        return self._Tvec(self._Avec(m))
 
     def Jvec(self, m, v, f=None):
 
@@ -938,16 +1026,13 @@ class Simulation3DLinear(BaseVRMSimulation):
         dxidm = self.xiMap.deriv(m)
 
         # dxidm*v
-        v = np.matrix(dxidm * v).T
+        v = dxidm * v
 
         # Dot product with A
-        v = self.A * v
+        v = self._Avec(v)
 
-        # Get active time rows of T
-        T = self.T.tocsr()[self.survey.t_active, :]
-
-        # Must return an array
-        return mkvc(sp.csr_matrix.dot(T, v))
+        # Get active time rows of T*A*dxidm*v
+        return self._Tvec(v)[self.survey.t_active]
 
     def Jtvec(self, m, v, f=None):
 
@@ -956,15 +1041,13 @@ class Simulation3DLinear(BaseVRMSimulation):
         if self.survey is None:
             AssertionError("A survey must be set to generate A matrix")
 
-        # Define v as a column vector
-        v = np.matrix(v).T
-
         # Get T'*Pd'*v
-        T = self.T.tocsr()[self.survey.t_active, :]
-        v = sp.csc_matrix.dot(T.transpose(), v)
+        w = np.zeros(len(self.survey.t_active))
+        w[self.survey.t_active] = v
+        v = self._Ttvec(w)
 
         # Multiply by A'
-        v = (np.dot(v.T, self.A)).T
+        v = self._Atvec(v)
 
         # Jacobian of xi wrt model
         dxidm = self.xiMap.deriv(m)
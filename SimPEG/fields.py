@@ -1,4 +1,5 @@
 from six import string_types
+import tempfile
 import numpy as np
 import properties
 
@@ -74,9 +75,15 @@ class Fields(properties.HasProperties):
         sz = 0.0
         for f in self.knownFields:
             loc = self.knownFields[f]
-            sz += np.array(self._storageShape(loc)).prod() * 8.0 / (1024 ** 2)
+            itemsize = np.dtype(self._storageDtype(f)).itemsize
+            sz += np.array(self._storageShape(loc)).prod() * itemsize / (1024 ** 2)
         return "{0:e} MB".format(sz)
 
+    @property
+    def storage(self):
+        """Storage backend of the fields, set by the simulation"""
+        return getattr(self.simulation, "field_storage", "float64")
+
     def _storageShape(self, loc):
         nSrc = self.survey.nSrc
 
@@ -97,17 +104,71 @@ class Fields(properties.HasProperties):
 
         loc = self.knownFields[name]
 
+        field = self._createStore(self._storageShape(loc), self._storageDtype(name))
+
+        self._fields[name] = field
+
+        return field
+
+    def _storageDtype(self, name):
         if isinstance(self.dtype, dict):
             dtype = self.dtype[name]
         else:
             dtype = self.dtype
 
-        # field = zarr.create(self._storageShape(loc), dtype=dtype)
-        field = np.zeros(self._storageShape(loc), dtype=dtype)
+        if self.storage == "float32":
+            if np.issubdtype(np.dtype(dtype), np.complexfloating):
+                return np.complex64
+            return np.float32
+        return dtype
 
-        self._fields[name] = field
+    def _storageChunks(self, shape):
+        """
+        Chunks of the storage: all grid points of a field together, chunked
+        along the sources (and times) by the simulation's field_chunks
+        """
+        chunks = getattr(self.simulation, "field_chunks", None)
+        if chunks is None:
+            return shape
+        chunks = list(chunks)[: len(shape) - 1]
+        chunks += list(shape[1 + len(chunks) :])
+        return (shape[0],) + tuple(min(c, n) for c, n in zip(chunks, shape[1:]))
+
+    def _createStore(self, shape, dtype):
+        """
+        Allocate the storage of a field with the storage backend of the
+        simulation
 
-        return field
+        :param tuple shape: shape of the storage
+        :param dtype: data type of the storage
+        """
+        if self.storage in ["float64", "float32"]:
+            return np.zeros(shape, dtype=dtype)
+
+        directory = getattr(self.simulation, "field_storage_path", None)
+        if self.storage == "memmap":
+            # in Fortran order, every source (and time step) of a field is a
+            # contiguous block of the file. The file is removed once closed
+            return np.memmap(
+                tempfile.TemporaryFile(dir=directory),
+                dtype=dtype,
+                mode="w+",
+                shape=shape,
+                order="F",
+            )
+
+        try:
+            import zarr
+        except ImportError:
+            raise ImportError(
+                "zarr is required for field_storage='zarr', please install it"
+            )
+        store = zarr.TempStore(dir=directory)
+        return ZarrFieldStorage(
+            zarr.zeros(
+                shape, chunks=self._storageChunks(shape), dtype=dtype, store=store
+            )
+        )
 
     def _srcIndex(self, srcTestList):
         if type(srcTestList) is slice:
@@ -213,6 +274,45 @@ class Fields(properties.HasProperties):
         return self._fields.__contains__(other)
 
 
+class ZarrFieldStorage(object):
+    """
+    numpy style indexing of a zarr array for the field storage
+
+    zarr only supports lists or arrays of indices through orthogonal
+    indexing, which is what the fields need to index sources and times.
+    """
+
+    def __init__(self, array):
+        self.array = array
+
+    @property
+    def shape(self):
+        return self.array.shape
+
+    @property
+    def dtype(self):
+        return self.array.dtype
+
+    @property
+    def size(self):
+        return int(np.prod(self.shape))
+
+    @property
+    def ndim(self):
+        return len(self.shape)
+
+    def _key(self, key):
+        if not isinstance(key, tuple):
+            key = (key,)
+        return tuple(np.asarray(k) if isinstance(k, list) else k for k in key)
+
+    def __getitem__(self, key):
+        return self.array.oindex[self._key(key)]
+
+    def __setitem__(self, key, value):
+        self.array.oindex[self._key(key)] = value
+
+
 class TimeFields(Fields):
     """Fancy Field Storage for time domain problems
     .. code:: python
@@ -4,10 +4,13 @@ from __future__ import print_function
 from __future__ import unicode_literals
 
 import numpy as np
+import os
 import scipy.sparse as sp
+import tempfile
 import time
 import properties
 from ...utils.code_utils import deprecate_class
+from ...utils.solver_utils import SolverCache
 import warnings
 
 from ... import utils
@@ -49,6 +52,87 @@ class SimulationNDCellCentered(BaseTimeSimulation):
 
     root_finder_tol = properties.Float("tolerance of the root_finder", default=1e-4)
 
+    root_finder_lag_jacobian = properties.Bool(
+        "Reuse the factorization of the Jacobian of the root_finder over its "
+        "iterations and the time steps while it keeps reducing the residual",
+        default=False,
+    )
+
+    root_finder_krylov = properties.Bool(
+        "With root_finder_lag_jacobian, solve the steps of the root_finder "
+        "with GMRES preconditioned by the lagged factorization",
+        default=False,
+    )
+
+    jacobian_storage = properties.StringChoice(
+        "storage of the Jacobian blocks of the time steps between sensitivity "
+        "products: recomputed in every product ('none'), kept in memory ('ram') "
+        "or saved in jacobian_storage_path ('disk'). When they are stored, the "
+        "factorizations of the diagonal blocks are also kept in memory",
+        choices=["none", "ram", "disk"],
+        default="none",
+    )
+
+    jacobian_storage_path = properties.String(
+        "directory of the disk-backed Jacobian storage, defaults to the "
+        "temporary directory of the system"
+    )
+
+    max_factorizations = properties.Integer(
+        "maximum number of factorizations of the diagonal Jacobian blocks kept "
+        "in memory when jacobian_storage is 'ram' or 'disk', all of them if "
+        "it is not set",
+        min=1,
+    )
+
+    adaptive_time_steps = properties.Bool(
+        "Adapt the time steps to the convergence of the root_finder and to "
+        "the truncation error. time_steps then sets the duration of the "
+        "simulation and the first time step, and holds the accepted time "
+        "steps after fields is computed",
+        default=False,
+    )
+
+    dt_min = properties.Float(
+        "smallest adaptive time step, 1e-4 times the first time step if it is "
+        "not set",
+        min=0.0,
+    )
+
+    dt_max = properties.Float("largest adaptive time step", min=0.0)
+
+    dt_growth = properties.Float(
+        "factor the adaptive time step grows by after a quick convergence",
+        default=1.5,
+        min=1.0,
+    )
+
+    dt_reduction = properties.Float(
+        "factor the adaptive time step is cut by when a step is rejected",
+        default=0.5,
+        min=0.0,
+        max=1.0,
+    )
+
+    dt_growth_iterations = properties.Integer(
+        "the adaptive time step grows when the root_finder converges in at "
+        "most this number of iterations",
+        default=3,
+        min=1,
+    )
+
+    truncation_tol = properties.Float(
+        "tolerance of the local truncation error of the adaptive time steps, "
+        "estimated from the change of the fields with respect to a linear "
+        "extrapolation of the previous time steps. It is not controlled if it "
+        "is not set",
+        min=0.0,
+    )
+
+    deleteTheseOnModelUpdate = ["_jacobian_blocks"]
+
+    clean_on_model_update = ["_Adiag_solvers"]
+
     @properties.observer("model")
     def _on_model_change(self, change):
         """Update the nested model functions when the
@@ -73,15 +157,56 @@ class SimulationNDCellCentered(BaseTimeSimulation):
         if self.water_retention.needs_model:
             self.water_retention.model = model
 
-    def getBoundaryConditions(self, ii, u_ii):
+    @properties.observer(
+        [
+            "boundary_conditions",
+            "initial_conditions",
+            "time_steps",
+            "jacobian_storage",
+            "jacobian_storage_path",
+        ]
+    )
+    def _on_jacobian_update(self, change):
+        """The stored Jacobian blocks and their factorizations depend on the
+        fields, clear them when the problem changes. The directory of the
+        disk-backed blocks is removed, a new one is made in
+        jacobian_storage_path when they are stored again
+        """
+        if getattr(self, "_Adiag_solvers", None) is not None:
+            self._Adiag_solvers.clean()
+            self._Adiag_solvers = None
+        if hasattr(self, "_jacobian_blocks"):
+            del self._jacobian_blocks
+        if getattr(self, "_jacobian_directory", None) is not None:
+            self._jacobian_directory.cleanup()
+            self._jacobian_directory = None
+
+    @properties.observer("time_steps")
+    def _on_time_steps_update(self, change):
+        """Time steps set by the user are the requested time steps of the
+        adaptive time stepping
+        """
+        if hasattr(self, "_requested_time_steps"):
+            del self._requested_time_steps
+
+    def getBoundaryConditions(self, ii, u_ii, time=None):
         if isinstance(self.boundary_conditions, np.ndarray):
             return self.boundary_conditions
 
-        time = self.time_mesh.vectorCCx[ii]
+        if time is None:
+            time = self.time_mesh.vectorCCx[ii]
 
         return self.boundary_conditions(time, u_ii)
 
-    @properties.observer(["do_newton", "root_finder_max_iter", "root_finder_tol"])
+    @properties.observer(
+        [
+            "do_newton",
+            "root_finder_max_iter",
+            "root_finder_tol",
+            "root_finder_lag_jacobian",
+            "root_finder_krylov",
+        ]
+    )
     def _on_root_finder_update(self, change):
         """Setting do_newton etc. will clear the root_finder,
         which will be reinitialized when called
@@ -97,6 +222,8 @@ class SimulationNDCellCentered(BaseTimeSimulation):
                 doLS=self.do_newton,
                 maxIter=self.root_finder_max_iter,
                 tol=self.root_finder_tol,
+                lagJacobian=self.root_finder_lag_jacobian,
+                doKrylov=self.root_finder_krylov,
                 Solver=self.solver,
             )
         return self._root_finder
@@ -108,6 +235,9 @@ class SimulationNDCellCentered(BaseTimeSimulation):
         else:
             assert m is None
 
+        if self.adaptive_time_steps:
+            return self._fieldsAdaptive(m)
+
         tic = time.time()
         u = list(range(self.nT + 1))
         u[0] = self.initial_conditions
@@ -132,6 +262,82 @@ class SimulationNDCellCentered(BaseTimeSimulation):
                 )
         return u
 
+    def _fieldsAdaptive(self, m):
+        """Fields with adaptive time steps
+
+        The time steps start from the first requested time step. A step is
+        rejected and cut by dt_reduction when the root_finder does not
+        converge, or when the local truncation error is larger than
+        truncation_tol. It grows by dt_growth when the root_finder converges
+        in at most dt_growth_iterations iterations (with a truncation error
+        below half the tolerance), up to dt_max. The accepted time steps
+        replace time_steps, so that the receivers, Jvec and Jtvec use them.
+        """
+        requested = getattr(self, "_requested_time_steps", None)
+        if requested is None:
+            requested = self.time_steps
+        t_end = self.t0 + np.sum(requested)
+        dt = requested[0]
+        dt_min = self.dt_min if self.dt_min is not None else 1e-4 * requested[0]
+        dt_max = self.dt_max if self.dt_max is not None else np.inf
+
+        tic = time.time()
+        t = self.t0
+        u = [self.initial_conditions]
+        time_steps = []
+        n_rejected = 0
+        while t_end - t > 1e-10 * (t_end - self.t0):
+            dt = min(dt, t_end - t)
+            ii = len(time_steps)
+            bc = self.getBoundaryConditions(ii, u[ii], time=t + dt / 2.0)
+            u_next = self.root_finder.root(
+                lambda hn1m, return_g=True: self.getResidual(
+                    m, u[ii], hn1m, dt, bc, return_g=return_g
+                ),
+                u[ii],
+            )
+            converged = (
+                u_next is not None
+                and self.root_finder.iter <= self.root_finder.maxIter
+                and np.all(np.isfinite(u_next))
+            )
+
+            error = 0.0
+            if converged and self.truncation_tol is not None and ii > 0:
+                predicted = u[ii] + dt / time_steps[-1] * (u[ii] - u[ii - 1])
+                error = dt / (dt + time_steps[-1]) * np.max(np.abs(u_next - predicted))
+
+            if not converged or (
+                self.truncation_tol is not None and error > self.truncation_tol
+            ):
+                n_rejected += 1
+                if dt <= dt_min:
+                    raise Exception(
+                        "Adaptive time stepping failed at t={:e}, the time step "
+                        "is below dt_min ({:e})".format(t, dt_min)
+                    )
+                dt = max(dt * self.dt_reduction, dt_min)
+                continue
+
+            u.append(u_next)
+            time_steps.append(dt)
+            t += dt
+            if self.debug:
+                print(
+                    "Solving Fields (t = {0:e}, dt = {1:e}) {2:d} Iterations, "
+                    "{3:d} rejected steps, {4:4.2f} seconds".format(
+                        t, dt, self.root_finder.iter, n_rejected, time.time() - tic
+                    )
+                )
+            if self.root_finder.iter <= self.dt_growth_iterations and (
+                self.truncation_tol is None or error <= 0.5 * self.truncation_tol
+            ):
+                dt = min(dt * self.dt_growth, dt_max)
+
+        self.time_steps = np.array(time_steps)
+        self._requested_time_steps = requested
+        return u
+
     def dpred(self, m, f=None):
         """Create the projected data from a model.
         The field, f, (if provided) will be used for the predicted data
@@ -225,6 +431,59 @@ class SimulationNDCellCentered(BaseTimeSimulation):
 
         return Asub, Adiag, B
 
+    def _getJacobianBlocks(self, m, f, ii):
+        """Asub, Adiag and B of time step ii, from diagsJacobian, stored for
+        the model according to jacobian_storage
+        """
+        if self.jacobian_storage == "none":
+            bc = self.getBoundaryConditions(ii, f[ii])
+            return self.diagsJacobian(m, f[ii], f[ii + 1], self.time_steps[ii], bc)
+
+        if m is not None:
+            self.model = m
+        if getattr(self, "_jacobian_blocks", None) is None:
+            self._jacobian_blocks = {}
+        blocks = self._jacobian_blocks.get(ii)
+        if blocks is None:
+            bc = self.getBoundaryConditions(ii, f[ii])
+            blocks = self.diagsJacobian(m, f[ii], f[ii + 1], self.time_steps[ii], bc)
+            if self.jacobian_storage == "disk":
+                if getattr(self, "_jacobian_directory", None) is None:
+                    self._jacobian_directory = tempfile.TemporaryDirectory(
+                        dir=self.jacobian_storage_path
+                    )
+                files = [
+                    os.path.join(
+                        self._jacobian_directory.name,
+                        "jacobian_{}_{}.npz".format(ii, name),
+                    )
+                    for name in ["Asub", "Adiag", "B"]
+                ]
+                for fname, block in zip(files, blocks):
+                    sp.save_npz(fname, sp.csr_matrix(block))
+                self._jacobian_blocks[ii] = files
+            else:
+                self._jacobian_blocks[ii] = blocks
+        if self.jacobian_storage == "disk":
+            return tuple(sp.load_npz(fname) for fname in self._jacobian_blocks[ii])
+        return self._jacobian_blocks[ii]
+
+    def _getAdiagSolver(self, Adiag, ii, adjoint=False):
+        """Factorization of the diagonal block of time step ii, or of its
+        transpose for the adjoint, kept for the model if the Jacobian blocks
+        are stored
+        """
+
+        def factor():
+            return self.solver(Adiag.T if adjoint else Adiag, **self.solver_opts)
+
+        if self.jacobian_storage == "none":
+            return factor()
+        if getattr(self, "_Adiag_solvers", None) is None:
+            self._Adiag_solvers = SolverCache()
+        self._Adiag_solvers.max_size = self.max_factorizations
+        return self._Adiag_solvers.get((ii, adjoint), factor)
+
     @utils.timeIt
     def getResidual(self, m, hn, h, dt, bc, return_g=True):
         """Used by the root finder when going between timesteps
@@ -265,30 +524,78 @@ class SimulationNDCellCentered(BaseTimeSimulation):
         return r, J
 
     @utils.timeIt
-    def Jfull(self, m=None, f=None):
+    def Jfull(self, m=None, f=None, columns=None, path=None):
+        """Full sensitivity matrix, or some of its columns
+
+        The derivatives of the fields with respect to the model solve the
+        block bidiagonal system of diagsJacobian::
+
+            Adiag_0 du_0 = B_0
+            Asub_i du_i-1 + Adiag_i du_i = B_i
+
+        It is solved by forward substitution, one time step at a time, and
+        the derivatives of each time step are projected to the data as they
+        are found, so only one time step is held in memory. The columns of B
+        are only formed for the requested model parameters.
+
+        :param numpy.ndarray m: model
+        :param list f: fields
+        :param numpy.ndarray columns: model parameters of the columns of J,
+            all of them by default
+        :param str path: .npy file J is written to, J is kept in memory by
+            default
+        :rtype: numpy.ndarray
+        :return: J, (nD, len(columns)), a memmap of the file if path is given
+        """
         if f is None:
             f = self.fields(m)
+        if m is not None:
+            self.model = m
 
-        nn = len(f) - 1
-        Asubs, Adiags, Bs = list(range(nn)), list(range(nn)), list(range(nn))
-        for ii in range(nn):
-            dt = self.time_steps[ii]
-            bc = self.getBoundaryConditions(ii, f[ii])
-            Asubs[ii], Adiags[ii], Bs[ii] = self.diagsJacobian(
-                m, f[ii], f[ii + 1], dt, bc
+        nC, nP = self.mesh.nC, len(self.model)
+        nU = nC * len(f)
+        if columns is None:
+            columns = np.arange(nP)
+        V = sp.identity(nP, format="csc")[:, columns]
+
+        # derivatives of the data with respect to the fields and the model
+        dd_du = sp.vstack(
+            [
+                rx.deriv(f, self, du_dm_v=sp.identity(nU), v=sp.csr_matrix((nP, nU)))
+                for rx in self.survey.receiver_list
+            ]
+        ).tocsc()
+        dd_dm = [
+            rx.deriv(f, self, du_dm_v=sp.csr_matrix((nU, V.shape[1])), v=V)
+            for rx in self.survey.receiver_list
+        ]
+
+        if path is None:
+            J = np.zeros((dd_du.shape[0], V.shape[1]))
+        else:
+            J = np.lib.format.open_memmap(
+                path, mode="w+", shape=(dd_du.shape[0], V.shape[1])
             )
-        Ad = sp.block_diag(Adiags)
-        zRight = utils.spzeros((len(Asubs) - 1) * Asubs[0].shape[0], Adiags[0].shape[1])
-        zTop = utils.spzeros(Adiags[0].shape[0], len(Adiags) * Adiags[0].shape[1])
-        As = sp.vstack((zTop, sp.hstack((sp.block_diag(Asubs[1:]), zRight))))
-        A = As + Ad
-        B = np.array(sp.vstack(Bs).todense())
-
-        Ainv = self.solver(A, **self.solver_opts)
-        AinvB = Ainv * B
-        z = np.zeros((self.mesh.nC, B.shape[1]))
-        du_dm = np.vstack((z, AinvB))
-        J = self.survey.deriv(self, f, du_dm_v=du_dm)  # not multiplied by v
+        row = 0
+        for rx, dd_dm_rx in zip(self.survey.receiver_list, dd_dm):
+            if not isinstance(dd_dm_rx, utils.Zero):
+                J[row : row + rx.nD] = (
+                    dd_dm_rx.toarray() if sp.issparse(dd_dm_rx) else dd_dm_rx
+                )
+            row += rx.nD
+
+        du = None
+        for ii in range(len(f) - 1):
+            Asub, Adiag, B = self._getJacobianBlocks(m, f, ii)
+            rhs = B * V
+            rhs = rhs.toarray() if sp.issparse(rhs) else np.asarray(rhs)
+            if du is not None:
+                rhs = rhs - Asub * du
+            du = self._getAdiagSolver(Adiag, ii) * rhs
+            J += dd_du[:, (ii + 1) * nC : (ii + 2) * nC] * du
+
+        if path is not None:
+            J.flush()
         return J
 
     @utils.timeIt
@@ -299,17 +606,13 @@ class SimulationNDCellCentered(BaseTimeSimulation):
         JvC = list(range(len(f) - 1))  # Cell to hold each row of the long vector
 
         # This is done via forward substitution.
-        bc = self.getBoundaryConditions(0, f[0])
-        temp, Adiag, B = self.diagsJacobian(m, f[0], f[1], self.time_steps[0], bc)
-        Adiaginv = self.solver(Adiag, **self.solver_opts)
+        temp, Adiag, B = self._getJacobianBlocks(m, f, 0)
+        Adiaginv = self._getAdiagSolver(Adiag, 0)
         JvC[0] = Adiaginv * (B * v)
 
         for ii in range(1, len(f) - 1):
-            bc = self.getBoundaryConditions(ii, f[ii])
-            Asub, Adiag, B = self.diagsJacobian(
-                m, f[ii], f[ii + 1], self.time_steps[ii], bc
-            )
-            Adiaginv = self.solver(Adiag, **self.solver_opts)
+            Asub, Adiag, B = self._getJacobianBlocks(m, f, ii)
+            Adiaginv = self._getAdiagSolver(Adiag, ii)
             JvC[ii] = Adiaginv * (B * v - Asub * JvC[ii - 1])
 
         du_dm_v = np.concatenate([np.zeros(self.mesh.nC)] + JvC)
@@ -319,7 +622,7 @@ class SimulationNDCellCentered(BaseTimeSimulation):
     @utils.timeIt
     def Jtvec(self, m, v, f=None):
         if f is None:
-            f = self.field(m)
+            f = self.fields(m)
 
         PTv, PTdv = self.survey.derivAdjoint(self, f, v=v)
 
@@ -327,13 +630,10 @@ class SimulationNDCellCentered(BaseTimeSimulation):
         minus = 0
         BJtv = 0
         for ii in range(len(f) - 1, 0, -1):
-            bc = self.getBoundaryConditions(ii - 1, f[ii - 1])
-            Asub, Adiag, B = self.diagsJacobian(
-                m, f[ii - 1], f[ii], self.time_steps[ii - 1], bc
-            )
+            Asub, Adiag, B = self._getJacobianBlocks(m, f, ii - 1)
             # select the correct part of v
             vpart = list(range((ii) * Adiag.shape[0], (ii + 1) * Adiag.shape[0]))
-            AdiaginvT = self.solver(Adiag.T, **self.solver_opts)
+            AdiaginvT = self._getAdiagSolver(Adiag, ii - 1, adjoint=True)
             JTvC = AdiaginvT * (PTv[vpart] - minus)
             minus = Asub.T * JTvC  # this is now the super diagonal.
             BJtv = BJtv + B.T * JTvC
@@ -3325,6 +3325,9 @@ class TileMap(IdentityMap):
 
     tol = 1e-8  # Tolerance to avoid zero division
     components = 1  # Number of components in the model. =3 for vector model
+    # Drop the global cells outside the local mesh, instead of lumping them
+    # into its boundary cells
+    exclude_outside = False
 
     def __init__(self, global_mesh, global_active, local_mesh, **kwargs):
         """
@@ -3379,13 +3382,20 @@ class TileMap(IdentityMap):
         """
         if getattr(self, "_P", None) is None:
 
-            in_local = self.local_mesh._get_containing_cell_indexes(
-                self.global_mesh.gridCC
-            )
+            gridCC = self.global_mesh.gridCC
+            if self.exclude_outside:
+                # only the global cells inside the local mesh contribute
+                x0 = self.local_mesh.x0
+                x1 = x0 + np.r_[[h.sum() for h in self.local_mesh.h]]
+                inside = np.where(np.all((gridCC >= x0) & (gridCC <= x1), axis=1))[0]
+            else:
+                inside = np.arange(self.global_mesh.nC)
+
+            in_local = self.local_mesh._get_containing_cell_indexes(gridCC[inside])
 
             P = (
                 sp.csr_matrix(
-                    (self.global_mesh.vol, (in_local, np.arange(self.global_mesh.nC))),
+                    (self.global_mesh.vol[inside], (in_local, inside)),
                     shape=(self.local_mesh.nC, self.global_mesh.nC),
                 )
                 * speye(self.global_mesh.nC)[:, self.global_active]
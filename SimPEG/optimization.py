@@ -34,6 +34,7 @@ __all__ = [
 ]
 
 SolverICG = SolverWrapI(sp.linalg.cg, checkAccuracy=False)
+SolverIGMRES = SolverWrapI(sp.linalg.gmres, checkAccuracy=False)
 
 
 class StoppingCriteria(object):
@@ -1060,6 +1061,20 @@ class NewtonRoot(object):
         For iterative solving of dh = -J\\r, use O.solveTol = TOL. For direct
         solves, use SOLVETOL = 0 (default)
 
+        With lagJacobian, the factorization of the Jacobian is reused over
+        the iterations, and over the calls to root (e.g. the time steps of
+        a simulation), as long as a step with it reduces the norm of the
+        residual by at least lagRate. Otherwise the Jacobian is factored
+        again, at the next iteration, or at the current one if the step did
+        not reduce the residual. With doKrylov as well, the Jacobian is
+        assembled at every iteration and the steps are solved with GMRES
+        (relative tolerance krylovTol), preconditioned by the lagged
+        factorization, which is only renewed when GMRES does not converge.
+
+        The numbers of factorizations, Jacobian assemblies and residual
+        evaluations are counted in nFactorizations, nJacobians and
+        nResiduals, over all the calls to root.
+
         Rowan Cockett
         16-May-2013 16:29:51
         University of British Columbia
@@ -1074,12 +1089,33 @@ class NewtonRoot(object):
     comments = False
     doLS = True
 
+    lagJacobian = False
+    lagRate = 0.5
+    doKrylov = False
+    krylovTol = 1e-2
+    krylovMaxIter = 5
+
     Solver = Solver
     solverOpts = {}
 
     def __init__(self, **kwargs):
+        self.nFactorizations = 0
+        self.nJacobians = 0
+        self.nResiduals = 0
         setKwargs(self, **kwargs)
 
+    def _evaluate(self, fun, x, return_g):
+        self.nResiduals += 1
+        if return_g:
+            self.nJacobians += 1
+        return fun(x, return_g=return_g)
+
+    def _factor(self, J, Jinv=None):
+        if Jinv is not None and hasattr(Jinv, "clean"):
+            Jinv.clean()
+        self.nFactorizations += 1
+        return self.Solver(J, **self.solverOpts)
+
     def root(self, fun, x):
         """root(fun, x)
 
@@ -1095,18 +1131,66 @@ class NewtonRoot(object):
         if self.comments:
             print("Newton Method:\n")
 
+        Jinv = None
+        if self.lagJacobian and getattr(self, "_Jinv", None) is not None:
+            Jinv, size = self._Jinv
+            if size != x.size:
+                Jinv = self._Jinv = None
+        refactor = Jinv is None
+        r = step = None
+
         self.iter = 0
         while True:
 
-            r, J = fun(x, return_g=True)
-
-            Jinv = self.Solver(J, **self.solverOpts)
-            dh = -(Jinv * r)
+            if not self.lagJacobian:
+                r, J = self._evaluate(fun, x, True)
+                Jinv = self._factor(J)
+                fresh = True
+                dh = -(Jinv * r)
+            else:
+                fresh = False
+                if refactor or self.doKrylov:
+                    r, J = self._evaluate(fun, x, True)
+                elif r is None:
+                    r = self._evaluate(fun, x, False)
+                if refactor:
+                    Jinv = self._factor(J, Jinv)
+                    refactor, fresh = False, True
+
+                if self.doKrylov and not fresh:
+                    M = sp.linalg.LinearOperator(
+                        J.shape, lambda v: Jinv * v, dtype=float
+                    )
+                    Ainv = SolverIGMRES(
+                        J,
+                        M=M,
+                        tol=self.krylovTol,
+                        atol=0.0,
+                        maxiter=self.krylovMaxIter,
+                    )
+                    dh = -(Ainv * r)
+                    if Ainv.info != 0:
+                        # the preconditioner is too far from the Jacobian
+                        Jinv = self._factor(J, Jinv)
+                        dh = -(Jinv * r)
+                    # the Jacobian is current, only the solve is inexact
+                    fresh = True
+                else:
+                    dh = -(Jinv * r)
 
             muLS = 1.0
             LScnt = 1
             xt = x + dh
-            rt = fun(xt, return_g=False)
+            rt = self._evaluate(fun, xt, False)
+
+            if not fresh and not norm(rt) < self.tol:
+                if not norm(rt) <= norm(r) or (step is not None and norm(dh) > step):
+                    # the lagged Jacobian diverges: factor it again
+                    if self.comments:
+                        print("\tLagged Jacobian rejected\n")
+                    refactor = True
+                    continue
+                refactor = norm(rt) > self.lagRate * norm(r)
 
             if self.comments and self.doLS:
                 print("\tLinesearch:\n")
@@ -1124,9 +1208,10 @@ class NewtonRoot(object):
                     print("Newton Method: Line search break.")
                     return None
                 xt = x + muLS * dh
-                rt = fun(xt, return_g=False)
+                rt = self._evaluate(fun, xt, False)
 
-            x = xt
+            step = norm(xt - x)
+            x, r = xt, rt
             self.iter += 1
             if norm(rt) < self.tol:
                 break
@@ -1137,6 +1222,14 @@ class NewtonRoot(object):
                 )
                 break
 
+        if self.lagJacobian:
+            self._Jinv = (Jinv, x.size)
+        if self.comments:
+            print(
+                "{0:d} factorizations, {1:d} Jacobians, {2:d} residuals\n".format(
+                    self.nFactorizations, self.nJacobians, self.nResiduals
+                )
+            )
         return x
 
 
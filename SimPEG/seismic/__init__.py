@@ -1 +1,2 @@
 from . import straight_ray_tomography
+from . import eikonal_tomography
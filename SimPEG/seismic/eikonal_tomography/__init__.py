@@ -0,0 +1,4 @@
+from .simulation import SimulationNDEikonal as Simulation
+from ..straight_ray_tomography.survey import StraightRaySurvey as Survey
+from ...survey import BaseSrc as Src
+from ...survey import BaseRx as Rx
@@ -0,0 +1,354 @@
+import itertools
+import multiprocessing
+
+import numpy as np
+import properties
+import scipy.sparse as sp
+
+from ...simulation import BaseSimulation
+from ...utils import mkvc
+from ... import props
+from ..straight_ray_tomography.survey import StraightRaySurvey
+
+
+def _setPoolSimulation(simulation):
+    # Simulation of the processes sweeping the blocks of sources
+    global _pool_simulation
+    _pool_simulation = simulation
+
+
+def _getPoolTraveltimes(args):
+    return _pool_simulation._getTraveltimes(*args)
+
+
+class SimulationNDEikonal(BaseSimulation):
+    """
+    First-arrival travel time tomography.
+
+    The travel times T of each source solve the eikonal equation
+    :math:`|\\nabla T| = s` on the cell centers of a 2D or 3D TensorMesh,
+    discretized with the first order upwind (Godunov) scheme. Around the
+    source, in the cell containing it and in its neighbours, T is the
+    straight ray travel time. The discrete equations are solved by fast
+    sweeping: Gauss-Seidel updates of the cells in the 2^dim orderings of
+    the axes, until the travel times do not change. The cells of a diagonal
+    plane of an ordering do not depend on each other, so they are updated
+    at once, for all the sources together. The sources are distributed over
+    n_cpu processes.
+
+    The sensitivities are those of the discrete equations. Their
+    linearization L, one row per cell and source, relates each cell to the
+    upwind neighbours of its update; it is triangular in the order of the
+    travel times and is factored by the solver. Jvec solves with L and
+    Jtvec with its transpose (adjoint-state), so the sensitivity matrix is
+    never formed.
+
+    The data are the travel times interpolated at the receivers.
+    """
+
+    slowness, slownessMap, slownessDeriv = props.Invertible("Slowness model (1/v)")
+
+    survey = properties.Instance("a travel time survey", StraightRaySurvey)
+
+    tolerance = properties.Float(
+        "Relative change of the travel times stopping the sweeps",
+        default=1e-12,
+        min=0.0,
+    )
+
+    max_iterations = properties.Integer(
+        "Maximum number of iterations, each sweeping all the orderings",
+        default=50,
+        min=1,
+    )
+
+    n_cpu = properties.Integer(
+        "Number of processes the sources are distributed over", default=1, min=1,
+    )
+
+    deleteTheseOnModelUpdate = ["_traveltimes", "_L"]
+
+    clean_on_model_update = ["_Linv", "_LTinv"]
+
+    def __init__(self, mesh=None, **kwargs):
+        super(SimulationNDEikonal, self).__init__(mesh=mesh, **kwargs)
+        if self.mesh._meshType != "TENSOR" or self.mesh.dim == 1:
+            raise NotImplementedError(
+                "SimulationNDEikonal requires a 2D or 3D TensorMesh"
+            )
+
+    @properties.observer(["survey", "mesh"])
+    def _clear_sources_on_update(self, change):
+        # the travel times and their linearization are those of the sources
+        # of the previous survey, on the previous mesh
+        for mat in self.clean_on_model_update:
+            if getattr(self, mat, None) is not None:
+                getattr(self, mat).clean()
+                setattr(self, mat, None)
+        names = self.deleteTheseOnModelUpdate + ["_source_geometry", "_projection_list"]
+        if change["name"] == "mesh":
+            names = names + ["_sweep_geometry"]
+        for name in names:
+            if hasattr(self, name):
+                delattr(self, name)
+
+    @property
+    def _sweepGeometry(self):
+        """
+        Upwind neighbours of the cells, distances to them, and the diagonal
+        planes of the cells in each ordering of the axes
+        """
+        if getattr(self, "_sweep_geometry", None) is None:
+            mesh = self.mesh
+            vnC = np.array(mesh.vnC)
+            nC = mesh.nC
+            strides = np.r_[1, np.cumprod(vnC[:-1])]
+            ijk = [(np.arange(nC) // strides[d]) % vnC[d] for d in range(mesh.dim)]
+
+            # neighbours on each side, nC outside of the mesh
+            neighbours, distances = [], []
+            for d, cc in enumerate(
+                [mesh.vectorCCx, mesh.vectorCCy, mesh.vectorCCz][: mesh.dim]
+            ):
+                dcc = np.diff(cc)
+                for side in [-1, 1]:
+                    outside = ijk[d] == (0 if side < 0 else vnC[d] - 1)
+                    neighbours.append(
+                        np.where(outside, nC, np.arange(nC) + side * strides[d])
+                    )
+                    inside = ijk[d][~outside] + min(side, 0)
+                    h = np.ones(nC)
+                    h[~outside] = dcc[inside]
+                    distances.append(h)
+
+            planes = []
+            for signs in itertools.product([1, -1], repeat=mesh.dim):
+                level = sum(
+                    ijk[d] if sign > 0 else vnC[d] - 1 - ijk[d]
+                    for d, sign in enumerate(signs)
+                )
+                order = np.argsort(level, kind="stable")
+                planes.append(np.split(order, np.cumsum(np.bincount(level))[:-1]))
+
+            self._sweep_geometry = {
+                "ijk": ijk,
+                "neighbours": np.array(neighbours),
+                "distances": np.array(distances),
+                "planes": planes,
+            }
+        return self._sweep_geometry
+
+    @property
+    def _sources(self):
+        """
+        Cells around each source, where the travel times are fixed, and
+        their distances to the source, (nC, nSrc) arrays
+        """
+        if getattr(self, "_source_geometry", None) is None:
+            mesh = self.mesh
+            vectorN = [mesh.vectorNx, mesh.vectorNy, mesh.vectorNz][: mesh.dim]
+            ijk = self._sweepGeometry["ijk"]
+            source_list = self.survey.source_list
+            fixed = np.ones((mesh.nC, len(source_list)), dtype=bool)
+            distance = np.zeros((mesh.nC, len(source_list)))
+            for ii, src in enumerate(source_list):
+                loc = mkvc(src.location)[: mesh.dim]
+                for d, x in enumerate(vectorN):
+                    i = np.searchsorted(x, loc[d], side="right") - 1
+                    fixed[:, ii] &= np.abs(ijk[d] - np.clip(i, 0, len(x) - 2)) <= 1
+                distance[:, ii] = np.sqrt(np.sum((mesh.gridCC - loc) ** 2, axis=1))
+            self._source_geometry = {"fixed": fixed, "distance": distance}
+        return self._source_geometry
+
+    @property
+    def _projections(self):
+        """Interpolation of the travel times of each source at its receivers"""
+        if getattr(self, "_projection_list", None) is None:
+            self._projection_list = [
+                sp.vstack(
+                    [rx.getP(self.mesh, "CC") for rx in src.receiver_list]
+                ).tocsr()
+                for src in self.survey.source_list
+            ]
+        return self._projection_list
+
+    def _solveLocal(self, T, cells, s, return_upwind=False):
+        """
+        Godunov update of the travel times of cells, for all the sources
+
+        :param numpy.ndarray T: travel times (nC + 1, nSrc), inf in the last row
+        :param numpy.ndarray cells: cells to update
+        :param numpy.ndarray s: slowness of the cells
+        :param bool return_upwind: also return the upwind neighbours, their
+            distances and their number
+        :rtype: numpy.ndarray
+        :return: updated travel times (len(cells), nSrc)
+        """
+        geometry = self._sweepGeometry
+        dim = self.mesh.dim
+        shape = (dim, 2, len(cells), T.shape[1])
+        neighbours = geometry["neighbours"][:, cells]
+        a = T[neighbours].reshape(shape)
+
+        # the smallest neighbour along each axis, sorted
+        upwind = np.argmin(a, axis=1)[:, None]
+        a = np.take_along_axis(a, upwind, axis=1)[:, 0]
+        order = np.argsort(a, axis=0)
+        a = np.take_along_axis(a, order, axis=0)
+
+        def take_upwind(x):
+            x = np.broadcast_to(x.reshape(shape[:3] + (1,)), shape)
+            return np.take_along_axis(
+                np.take_along_axis(x, upwind, axis=1)[:, 0], order, axis=0
+            )
+
+        h2 = take_upwind(geometry["distances"][:, cells]) ** 2
+
+        # the neighbours are included in the update while they are upwind
+        s = s[:, None]
+        Tc = a[0] + s * np.sqrt(h2[0])
+        nUpwind = np.ones(Tc.shape, dtype=int)
+        with np.errstate(invalid="ignore"):
+            for m in range(2, dim + 1):
+                A = np.sum(1.0 / h2[:m], axis=0)
+                B = np.sum(a[:m] / h2[:m], axis=0)
+                C = np.sum(a[:m] ** 2 / h2[:m], axis=0) - s ** 2
+                disc = B ** 2 - A * C
+                update = (Tc > a[m - 1]) & (disc >= 0.0)
+                Tc = np.where(update, (B + np.sqrt(np.abs(disc))) / A, Tc)
+                nUpwind[update] = m
+
+        if return_upwind:
+            return Tc, take_upwind(neighbours), a, h2, nUpwind
+        return Tc
+
+    def _getTraveltimes(self, s, sources):
+        """
+        Travel times of sources, for slownesses s, by fast sweeping
+
+        :param numpy.ndarray s: slowness of the cells
+        :param numpy.ndarray sources: indices of the sources
+        :rtype: numpy.ndarray
+        :return: travel times (nC, len(sources))
+        """
+        nC = self.mesh.nC
+        fixed = self._sources["fixed"][:, sources]
+        fixed = np.r_[fixed, np.zeros((1, len(sources)), dtype=bool)]
+        T = np.full((nC + 1, len(sources)), np.inf)
+        T[fixed] = (s[:, None] * self._sources["distance"][:, sources])[fixed[:-1]]
+
+        for _ in range(self.max_iterations):
+            T_previous = T.copy()
+            for planes in self._sweepGeometry["planes"]:
+                for cells in planes:
+                    Tc = self._solveLocal(T, cells, s[cells])
+                    T[cells] = np.where(
+                        fixed[cells], T[cells], np.minimum(T[cells], Tc)
+                    )
+            change = np.max(np.abs(T[:-1] - T_previous[:-1]))
+            if change <= self.tolerance * np.max(T[:-1]):
+                break
+        return T[:-1]
+
+    @property
+    def traveltimes(self):
+        """Travel times of the sources at the cell centers, (nC, nSrc)"""
+        if getattr(self, "_traveltimes", None) is None:
+            s = self.slowness
+            nSrc = len(self.survey.source_list)
+            n_cpu = min(self.n_cpu, nSrc)
+            if n_cpu > 1:
+                blocks = [(s, inds) for inds in np.array_split(np.arange(nSrc), n_cpu)]
+                with multiprocessing.Pool(
+                    n_cpu, initializer=_setPoolSimulation, initargs=(self,)
+                ) as pool:
+                    T = np.hstack(pool.map(_getPoolTraveltimes, blocks))
+            else:
+                T = self._getTraveltimes(s, np.arange(nSrc))
+            self._traveltimes = T
+        return self._traveltimes
+
+    def fields(self, m=None):
+        """
+        Travel times of the sources at the cell centers
+
+        :param numpy.ndarray m: model
+        :rtype: numpy.ndarray
+        :return: travel times (nC, nSrc)
+        """
+        if m is not None:
+            self.model = m
+        return self.traveltimes
+
+    def dpred(self, m=None, f=None):
+        if f is None:
+            f = self.fields(m)
+        return np.hstack([P * f[:, ii] for ii, P in enumerate(self._projections)])
+
+    def _getL(self):
+        """
+        Linearization of the discrete eikonal equations about the travel times
+        of the current model, for all the sources, and the derivative of their
+        right hand side with respect to the slowness. It is kept until the
+        model changes.
+
+        :rtype: tuple
+        :return: L (nC * nSrc, nC * nSrc) and dRHS (nC, nSrc)
+        """
+        if getattr(self, "_L", None) is None:
+            f = self.traveltimes
+            nC, nSrc = f.shape
+            fixed = self._sources["fixed"]
+            s = self.slowness
+            T = np.r_[f, np.full((1, nSrc), np.inf)]
+            _, neighbours, a, h2, nUpwind = self._solveLocal(
+                T, np.arange(nC), s, return_upwind=True
+            )
+
+            # sum_k (T - a_k)^2 / h_k^2 = s^2 over the upwind neighbours k
+            offset = nC * np.arange(nSrc)
+            rows = np.broadcast_to(np.arange(nC)[:, None] + offset, a.shape)
+            cols = neighbours + offset
+            upwind = (np.arange(self.mesh.dim)[:, None, None] < nUpwind) & ~fixed
+            rows, cols = rows[upwind], cols[upwind]
+            w = (np.broadcast_to(f, a.shape)[upwind] - a[upwind]) / h2[upwind]
+            diagonal = np.bincount(rows, weights=w, minlength=nC * nSrc)
+            diagonal[mkvc(fixed)] = 1.0
+            L = sp.csr_matrix(
+                (
+                    np.r_[diagonal, -w],
+                    (
+                        np.r_[np.arange(nC * nSrc), rows],
+                        np.r_[np.arange(nC * nSrc), cols],
+                    ),
+                ),
+                shape=(nC * nSrc, nC * nSrc),
+            )
+            dRHS = np.where(fixed, self._sources["distance"], s[:, None])
+            self._L = L, dRHS
+        return self._L
+
+    def Jvec(self, m, v, f=None):
+        self.model = m
+        if f is None:
+            f = self.fields(m)
+        L, dRHS = self._getL()
+        if getattr(self, "_Linv", None) is None:
+            self._Linv = self.solver(L, **self.solver_opts)
+        ds = self.slownessDeriv * v
+        dT = (self._Linv * mkvc(dRHS * ds[:, None])).reshape(f.shape, order="F")
+        return np.hstack([P * dT[:, ii] for ii, P in enumerate(self._projections)])
+
+    def Jtvec(self, m, v, f=None):
+        self.model = m
+        if f is None:
+            f = self.fields(m)
+        L, dRHS = self._getL()
+        if getattr(self, "_LTinv", None) is None:
+            self._LTinv = self.solver(L.T.tocsr(), **self.solver_opts)
+        nD = np.cumsum([0] + [P.shape[0] for P in self._projections])
+        PTv = np.column_stack(
+            [P.T * v[nD[ii] : nD[ii + 1]] for ii, P in enumerate(self._projections)]
+        )
+        adjoint = (self._LTinv * mkvc(PTv)).reshape(f.shape, order="F")
+        return self.slownessDeriv.T * np.sum(dRHS * adjoint, axis=1)
@@ -1,10 +1,13 @@
+import multiprocessing
+
 import numpy as np
+import properties
 import scipy.sparse as sp
 import matplotlib.pyplot as plt
 from ...utils.code_utils import deprecate_class
 
 from ...simulation import LinearSimulation
-from ...utils import sub2ind
+from ...utils import mkvc, sub2ind
 from ... import props
 
 
@@ -60,42 +63,167 @@ def lengthInCell(O, D, x, y, plotIt=False):
     return None
 
 
+# Number of (ray, plane) intersections sorted at once
+_BLOCK_SIZE = 2 ** 20
+
+
+def _getPlanes(mesh):
+    """
+    Coordinates of the cell faces along each axis. Between two consecutive
+    crossings of these planes, a ray stays in a single cell.
+    """
+    if mesh._meshType == "TREE":
+        bsw = mesh.gridCC - mesh.h_gridded / 2.0
+        tne = mesh.gridCC + mesh.h_gridded / 2.0
+        return [np.unique(np.r_[bsw[:, i], tne[:, i]]) for i in range(mesh.dim)]
+    return [mesh.vectorNx, mesh.vectorNy, mesh.vectorNz][: mesh.dim]
+
+
+def _getRaySegments(mesh, O, D, planes=None):
+    """
+    Lengths of the rays O + a * D, 0 <= a <= 1, in the cells they cross.
+
+    As in Siddon's algorithm, the crossings of each ray with the cell faces
+    are found from the sorted intersection parameters a, here for all the
+    rays at once. Each segment between consecutive crossings is in the cell
+    containing its midpoint.
+
+    :param discretize.base.BaseMesh mesh: TensorMesh or TreeMesh
+    :param numpy.ndarray O: starting points of the rays (nRay, dim)
+    :param numpy.ndarray D: vectors from the start to the end of the rays (nRay, dim)
+    :param list planes: coordinates of the cell faces along each axis
+    :rtype: tuple
+    :return: ray, cell and length of each segment
+    """
+    if planes is None:
+        planes = _getPlanes(mesh)
+    O = np.atleast_2d(O).astype(float)
+    D = np.atleast_2d(D).astype(float)
+
+    # parameters where the rays enter and leave the mesh
+    a_in, a_out = np.zeros(O.shape[0]), np.ones(O.shape[0])
+    with np.errstate(divide="ignore", invalid="ignore"):
+        a = [(x[None, :] - O[:, i, None]) / D[:, i, None] for i, x in enumerate(planes)]
+    for i, x in enumerate(planes):
+        # rays parallel to the planes do not cross them
+        parallel = D[:, i] == 0.0
+        a[i][parallel, :] = 0.0
+        outside = parallel & ((O[:, i] < x[0]) | (O[:, i] > x[-1]))
+        a_in = np.maximum(
+            a_in, np.where(parallel, 0.0, np.minimum(a[i][:, 0], a[i][:, -1]))
+        )
+        a_out = np.minimum(
+            a_out, np.where(parallel, 1.0, np.maximum(a[i][:, 0], a[i][:, -1]))
+        )
+        a_out[outside] = 0.0
+    a_out = np.maximum(a_in, a_out)
+
+    alpha = np.sort(
+        np.hstack(
+            [a_in[:, None], a_out[:, None]]
+            + [np.clip(ai, a_in[:, None], a_out[:, None]) for ai in a]
+        ),
+        axis=1,
+    )
+    length = np.diff(alpha, axis=1) * np.sqrt(np.sum(D ** 2, axis=1))[:, None]
+    middle = (alpha[:, 1:] + alpha[:, :-1]) / 2.0
+    keep = length > 0.0
+    ray = np.repeat(np.arange(O.shape[0]), keep.sum(axis=1))
+    points = [
+        (O[:, i, None] + middle * D[:, i, None])[keep] for i in range(len(planes))
+    ]
+
+    if mesh._meshType == "TREE":
+        cell = mesh._get_containing_cell_indexes(np.c_[tuple(points)])
+    else:
+        ijk = [
+            np.clip(np.searchsorted(x, p, side="right") - 1, 0, len(x) - 2)
+            for x, p in zip(planes, points)
+        ]
+        cell = sub2ind(mesh.vnC, np.c_[tuple(ijk)])
+    return ray, mkvc(cell).astype(int), length[keep]
+
+
+def _setPoolMesh(mesh, planes):
+    # Mesh of the processes tracing the blocks of rays
+    global _pool_mesh
+    _pool_mesh = (mesh, planes)
+
+
+def _getPoolRaySegments(args):
+    mesh, planes = _pool_mesh
+    return _getRaySegments(mesh, *args, planes=planes)
+
+
 def lineintegral(M, Tx, Rx):
-    O, D = Tx, Rx - Tx
-    I, J, V = [], [], []
-    for i in range(M.nCx):
-        for j in range(M.nCy):
-            x = M.vectorNx[[i, i + 1]]
-            y = M.vectorNy[[j, j + 1]]
-            v = lengthInCell(O, D, x, y)
-            if v is not None:
-                I += [i]
-                J += [j]
-                V += [v]
-    inds = sub2ind(M.vnC, np.array([I, J]).T)
-    return inds, V
+    _, inds, V = _getRaySegments(M, Tx, Rx - Tx)
+    return inds, list(V)
 
 
 class Simulation2DIntegral(LinearSimulation):
+    """
+    Straight-ray travel time tomography.
+
+    The entries of the sensitivity matrix A are the lengths of the rays,
+    from each source to its receivers, in the cells they cross, so that the
+    travel times are A times the slowness. The mesh is a 2D or 3D TensorMesh,
+    or a TreeMesh. The rays are traced in blocks, distributed over n_cpu
+    processes.
+    """
 
     slowness, slownessMap, slownessDeriv = props.Invertible("Slowness model (1/v)")
 
+    n_cpu = properties.Integer(
+        "Number of processes the blocks of rays are distributed over", default=1, min=1,
+    )
+
     @property
     def A(self):
         if getattr(self, "_A", None) is not None:
             return self._A
 
-        self._A = sp.lil_matrix((self.survey.nD, self.mesh.nC))
-        row = 0
+        mesh = self.mesh
+        O, D = [], []
         for src in self.survey.source_list:
             for rx in src.receiver_list:
-                for loc_i in range(rx.locations.shape[0]):
-                    inds, V = lineintegral(
-                        self.mesh, src.location, rx.locations[loc_i, :]
-                    )
-                    self._A[inds * 0 + row, inds] = V
-                    row += 1
-
+                locations = np.atleast_2d(rx.locations)[:, : mesh.dim]
+                O.append(np.tile(mkvc(src.location)[: mesh.dim], (len(locations), 1)))
+                D.append(locations - O[-1])
+        O, D = np.vstack(O), np.vstack(D)
+
+        planes = _getPlanes(mesh)
+        nBlock = max(_BLOCK_SIZE // (sum(len(x) for x in planes) + 2), 1)
+        blocks = [
+            (O[ii : ii + nBlock], D[ii : ii + nBlock])
+            for ii in range(0, len(O), nBlock)
+        ]
+        n_cpu = min(self.n_cpu, len(blocks))
+        if n_cpu > 1:
+            with multiprocessing.Pool(
+                n_cpu, initializer=_setPoolMesh, initargs=(mesh, planes)
+            ) as pool:
+                segments = pool.map(_getPoolRaySegments, blocks)
+        else:
+            segments = [
+                _getRaySegments(mesh, *block, planes=planes) for block in blocks
+            ]
+
+        # the segments are in the order of the rays, the rows of A
+        nSegment = np.hstack(
+            [
+                np.bincount(ray, minlength=len(block[0]))
+                for (ray, _, _), block in zip(segments, blocks)
+            ]
+        )
+        cols = np.hstack([cell for _, cell, _ in segments])
+        vals = np.hstack([length for _, _, length in segments])
+        self._A = sp.csr_matrix(
+            (vals, cols, np.r_[0, np.cumsum(nSegment)]), shape=(self.survey.nD, mesh.nC)
+        )
+        # a ray crosses the faces of smaller cells inside the larger cells of
+        # a TreeMesh, and rays through the edges of cells can give segments
+        # of round-off length
+        self._A.sum_duplicates()
         return self._A
 
     def fields(self, m):
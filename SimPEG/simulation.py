@@ -132,6 +132,25 @@ class BaseSimulation(props.HasModel):
         "path to store the sensitivty", default="./sensitivity/"
     )
 
+    field_storage = properties.StringChoice(
+        "storage of the fields: in memory 'float64' or 'float32' arrays, or on "
+        "disk as a numpy 'memmap' or a 'zarr' array",
+        choices=["float64", "float32", "memmap", "zarr"],
+        default="float64",
+    )
+
+    field_storage_path = properties.String(
+        "directory of the disk-backed field storage, defaults to the temporary "
+        "directory of the system"
+    )
+
+    field_chunks = properties.List(
+        "number of sources (and of time steps) per chunk of the zarr field storage",
+        properties.Integer("chunk size", min=1),
+        min_length=1,
+        max_length=2,
+    )
+
     # TODO: need to implement a serializer for this & setter
     solver = Class(
         "Linear algebra solver (e.g. from pymatsolver)",
@@ -195,7 +214,14 @@ class BaseSimulation(props.HasModel):
                 delattr(self, prop)
 
         # matrix factors to clear
-        for mat in self.clean_on_model_update:
+        self._clean_factors(self.clean_on_model_update)
+
+    def _clean_factors(self, names):
+        """
+        Clean the matrix factors stored in the attributes names, then set
+        them to None
+        """
+        for mat in names:
             if getattr(self, mat, None) is not None:
                 getattr(self, mat).clean()  # clean factors
                 setattr(self, mat, None)  # set to none
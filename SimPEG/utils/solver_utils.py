@@ -4,6 +4,7 @@ from scipy.sparse import linalg
 from .mat_utils import mkvc
 import warnings
 import inspect
+from collections import OrderedDict
 
 
 def _checkAccuracy(A, b, X, accuracyTol):
@@ -241,3 +242,65 @@ class SolverDiag(object):
 
     def clean(self):
         pass
+
+
+class SolverCache(object):
+    """
+    A bounded collection of solvers (matrix factorizations) indexed by a key,
+    e.g. the length of a time step. When more than max_size solvers are
+    stored, the least recently used one is cleaned and dropped: a solver
+    returned by get may be invalid after the next call to get.
+
+    .. code:: python
+
+        cache = SolverCache(max_size=4)
+        Ainv = cache.get(dt, lambda: Solver(getA(dt)))
+        cache.clean()
+
+    :param int max_size: maximum number of solvers kept, None for no limit
+    """
+
+    def __init__(self, max_size=None):
+        self.max_size = max_size
+        self._solvers = OrderedDict()
+
+    def __len__(self):
+        return len(self._solvers)
+
+    def __contains__(self, key):
+        return key in self._solvers
+
+    def keys(self):
+        return list(self._solvers.keys())
+
+    def get(self, key, factor):
+        """
+        Get the solver for key, calling factor() to create it if it is not
+        stored
+
+        :param key: hashable key of the solver
+        :param callable factor: function returning a new solver
+        """
+        if key in self._solvers:
+            self._solvers.move_to_end(key)
+            return self._solvers[key]
+
+        Ainv = factor()
+        self._solvers[key] = Ainv
+        self._trim()
+        return Ainv
+
+    def _trim(self):
+        if self.max_size is None:
+            return
+        while len(self._solvers) > self.max_size:
+            _, Ainv = self._solvers.popitem(last=False)
+            Ainv.clean()
+
+    def clean(self):
+        """
+        Clean and drop all stored solvers
+        """
+        for Ainv in self._solvers.values():
+            Ainv.clean()
+        self._solvers.clear()
@@ -7,6 +7,11 @@ from SimPEG import survey, simulation, utils, fields, data
 import numpy as np
 import sys
 
+try:
+    import zarr
+except ImportError:
+    zarr = None
+
 np.random.seed(32)
 
 if sys.version_info < (3,):
@@ -345,6 +350,52 @@ class FieldsTest_Time(unittest.TestCase):
         self.assertRaises(KeyError, fun)
 
 
+class FieldsTest_Time_Memmap(FieldsTest_Time):
+    def setUp(self):
+        super(FieldsTest_Time_Memmap, self).setUp()
+        self.F.simulation.field_storage = "memmap"
+
+    def test_storage(self):
+        F = self.F
+        F[:, "e", 0] = 1.0
+        self.assertIsInstance(F._fields["e"], np.memmap)
+        self.assertTrue(F._fields["e"].flags.f_contiguous)
+
+
+@unittest.skipIf(zarr is None, "zarr is not installed")
+class FieldsTest_Time_Zarr(FieldsTest_Time):
+    def setUp(self):
+        super(FieldsTest_Time_Zarr, self).setUp()
+        self.F.simulation.field_storage = "zarr"
+        self.F.simulation.field_chunks = [2, 1]
+
+    def test_storage(self):
+        F = self.F
+        F[:, "e", 0] = 1.0
+        store = F._fields["e"]
+        self.assertIsInstance(store, fields.ZarrFieldStorage)
+        self.assertEqual(store.array.chunks, (F.mesh.nE, 2, 1))
+
+
+class FieldsTest_Time_Float32(FieldsTest_Time):
+    def setUp(self):
+        super(FieldsTest_Time_Float32, self).setUp()
+        self.F.simulation.field_storage = "float32"
+
+    def test_SetGet(self):
+        F = self.F
+        nSrc = F.survey.nSrc
+        nT = F.simulation.nT + 1
+
+        e = np.random.rand(F.mesh.nE, nSrc, nT)
+        F[:, "e"] = e
+        self.assertEqual(F._fields["e"].dtype, np.float32)
+        np.testing.assert_allclose(F[:, "e"], e, rtol=1e-6)
+        np.testing.assert_allclose(
+            F[self.Src1, "e", 2], utils.mkvc(e[:, 1, 2], 2), rtol=1e-6
+        )
+
+
 class FieldsTest_Time_Aliased(unittest.TestCase):
     def setUp(self):
         mesh = discretize.TensorMesh(
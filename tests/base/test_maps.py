@@ -462,6 +462,36 @@ class MapTests(unittest.TestCase):
         self.assertTrue(np.all(m1[unit2] == 1))
         self.assertTrue(surject_units.test(m0))
 
+    def test_TileMap(self):
+        global_mesh = discretize.TreeMesh([np.ones(16), np.ones(16), np.ones(16)])
+        global_mesh.refine(3)
+        local_mesh = discretize.TreeMesh(
+            [np.ones(8), np.ones(8), np.ones(8)], x0=np.r_[4.0, 4.0, 4.0]
+        )
+        local_mesh.refine(2)
+        active = np.ones(global_mesh.nC, dtype=bool)
+        m = np.random.rand(global_mesh.nC)
+
+        # the cells outside the local mesh are lumped into its boundary cells
+        tile_map = maps.TileMap(global_mesh, active, local_mesh)
+        in_local = local_mesh._get_containing_cell_indexes(global_mesh.gridCC)
+        vol = np.bincount(in_local, weights=global_mesh.vol, minlength=local_mesh.nC)
+        mass = np.bincount(
+            in_local, weights=global_mesh.vol * m, minlength=local_mesh.nC
+        )
+        np.testing.assert_allclose(
+            tile_map * m, mass / local_mesh.vol, rtol=1e-12, atol=0.0
+        )
+        self.assertGreater(vol.max(), local_mesh.vol.max())
+
+        # or dropped
+        tile_map = maps.TileMap(global_mesh, active, local_mesh, exclude_outside=True)
+        outside = np.any(
+            (global_mesh.gridCC < 4.0) | (global_mesh.gridCC > 12.0), axis=1
+        )
+        self.assertEqual(tile_map.P.tocsc()[:, outside].nnz, 0)
+        np.testing.assert_allclose(tile_map * np.ones(global_mesh.nC), 1.0)
+
     def test_Projection(self):
         nP = 10
         m = np.arange(nP)
@@ -65,6 +65,33 @@ class TestOptimizers(unittest.TestCase):
         print("x_true: ", x_true)
         self.assertTrue(np.linalg.norm(xopt - x_true, 2) < TOL, True)
 
+    def test_NewtonRoot_lagged(self):
+        fun = (
+            lambda x, return_g=True: np.sin(x)
+            if not return_g
+            else (np.sin(x), sdiag(np.cos(x)))
+        )
+        x = np.array([np.pi - 0.3, np.pi + 0.1, 0])
+        x_true = np.array([np.pi, np.pi, 0])
+        for doKrylov in [False, True]:
+            root_finder = optimization.NewtonRoot(
+                tol=1e-10, lagJacobian=True, doKrylov=doKrylov
+            )
+            xopt = root_finder.root(fun, x)
+            self.assertTrue(np.linalg.norm(xopt - x_true, 2) < 1e-8)
+            self.assertLess(root_finder.nFactorizations, root_finder.iter)
+            self.assertGreater(root_finder.nResiduals, root_finder.iter)
+            if doKrylov:
+                self.assertEqual(root_finder.nJacobians, root_finder.iter)
+            else:
+                self.assertEqual(root_finder.nJacobians, root_finder.nFactorizations)
+
+            # the factorization is reused by the next root
+            nFactorizations = root_finder.nFactorizations
+            xopt = root_finder.root(fun, x_true + 1e-3)
+            self.assertTrue(np.linalg.norm(xopt - x_true, 2) < 1e-8)
+            self.assertEqual(root_finder.nFactorizations, nFactorizations)
+
 
 if __name__ == "__main__":
     unittest.main()
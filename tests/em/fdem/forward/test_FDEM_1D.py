@@ -0,0 +1,101 @@
+import unittest
+import numpy as np
+from scipy.constants import mu_0
+
+from SimPEG import maps, tests
+from SimPEG.electromagnetics import frequency_domain as fdem
+from SimPEG.electromagnetics.analytics import FDEM as analytics
+
+np.random.seed(35)
+
+
+class FDEM1DAnalyticTest(unittest.TestCase):
+    def test_half_space(self):
+        sigma = 1e-2
+        frequencies = np.r_[10.0, 1e2, 1e3, 1e4]
+        offset = 100.0
+        source_list = [
+            fdem.Src.MagDipole(
+                [
+                    fdem.Rx.PointMagneticFluxDensitySecondary(
+                        np.r_[offset, 0.0, 0.0], "z", component
+                    )
+                    for component in ["real", "imag"]
+                ],
+                frequency=frequency,
+                location=np.r_[0.0, 0.0, 0.0],
+            )
+            for frequency in frequencies
+        ]
+        # layers of the same conductivity make a half-space
+        sim = fdem.Simulation1DLayered(
+            survey=fdem.Survey(source_list),
+            thicknesses=np.r_[10.0, 20.0],
+            sigmaMap=maps.ExpMap(),
+        )
+        d = sim.dpred(np.log(sigma) * np.ones(3)).reshape((-1, 2))
+
+        hz = np.hstack(
+            [
+                analytics.hzAnalyticDipoleF(offset, frequency, sigma, secondary=True)
+                for frequency in frequencies
+            ]
+        )
+        np.testing.assert_allclose(d[:, 0], mu_0 * hz.real, rtol=1e-3)
+        np.testing.assert_allclose(d[:, 1], mu_0 * hz.imag, rtol=1e-3)
+
+    def test_primary_field(self):
+        # a resistive earth only leaves the free space field of the loop
+        radius, height = 10.0, 30.0
+        rx = fdem.Rx.PointMagneticField(np.r_[0.0, 0.0, height], "z", "real")
+        src = fdem.Src.CircularLoop(
+            [rx], frequency=10.0, location=np.r_[0.0, 0.0, height], radius=radius
+        )
+        sim = fdem.Simulation1DLayered(
+            survey=fdem.Survey([src]), sigmaMap=maps.IdentityMap()
+        )
+        np.testing.assert_allclose(
+            sim.dpred(np.r_[1e-8]), 1.0 / (2.0 * radius), rtol=1e-4
+        )
+
+
+class FDEM1DDerivTest(unittest.TestCase):
+    def setUp(self):
+        source_list = []
+        for x in [0.0, 50.0, 100.0]:
+            for frequency in [1e2, 1e3, 1e4]:
+                receivers = [
+                    fdem.Rx.PointMagneticFluxDensitySecondary(
+                        np.r_[x + 8.0, 0.0, 30.0], "z", component
+                    )
+                    for component in ["real", "imag"]
+                ]
+                source_list.append(
+                    fdem.Src.MagDipole(
+                        receivers, frequency=frequency, location=np.r_[x, 0.0, 30.0]
+                    )
+                )
+        self.sim = fdem.Simulation1DLayered(
+            survey=fdem.Survey(source_list),
+            thicknesses=np.r_[5.0, 10.0, 20.0],
+            sigmaMap=maps.ExpMap(),
+        )
+        # one set of layers per sounding
+        self.m0 = np.log(1e-2) + np.random.randn(3 * 4)
+
+    def test_deriv(self):
+        def fun(m):
+            return self.sim.dpred(m), lambda v: self.sim.Jvec(m, v)
+
+        self.assertTrue(tests.checkDerivative(fun, self.m0, num=4, plotIt=False))
+
+    def test_adjoint(self):
+        v = np.random.randn(len(self.m0))
+        w = np.random.randn(self.sim.survey.nD)
+        wJv = w.dot(self.sim.Jvec(self.m0, v))
+        vJtw = v.dot(self.sim.Jtvec(self.m0, w))
+        self.assertLess(np.abs(wJv - vJtw), 1e-10 * np.abs(wJv))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,118 @@
+import unittest
+import numpy as np
+
+import discretize
+from SimPEG import maps
+from SimPEG.electromagnetics import frequency_domain as fdem
+
+TOL = 1e-3
+
+
+def get_simulation(formulation):
+    cs = 25.0
+    hx = [(cs, 3, -1.5), (cs, 6), (cs, 3, 1.5)]
+    mesh = discretize.TensorMesh([hx, hx, hx], "CCC")
+
+    sigma = 1e-2 * np.ones(mesh.nC)
+    sigma[mesh.gridCC[:, 2] > 0.0] = 1e-8
+    sigma[
+        (np.abs(mesh.gridCC[:, 0]) < 50.0)
+        & (np.abs(mesh.gridCC[:, 1]) < 50.0)
+        & (mesh.gridCC[:, 2] < -25.0)
+        & (mesh.gridCC[:, 2] > -100.0)
+    ] = 1.0
+
+    rx_locs = np.array([[10.0, 0.0, 20.0], [40.0, 20.0, 20.0]])
+    frequencies = np.logspace(1, 4, 9)
+    source_list = []
+    for freq in frequencies:
+        rx_list = [
+            fdem.Rx.PointMagneticFluxDensitySecondary(
+                rx_locs, orientation="z", component=comp
+            )
+            for comp in ["real", "imag"]
+        ]
+        source_list.append(
+            fdem.Src.MagDipole(rx_list, frequency=freq, location=np.r_[0.0, 0.0, 30.0])
+        )
+    survey = fdem.Survey(source_list)
+
+    Simulation = {
+        "e": fdem.Simulation3DElectricField,
+        "b": fdem.Simulation3DMagneticFluxDensity,
+    }[formulation]
+    sim = Simulation(mesh, survey=survey, sigmaMap=maps.ExpMap(mesh))
+    return sim, np.log(sigma)
+
+
+class RationalKrylovTest(unittest.TestCase):
+    def _test_dpred(self, formulation):
+        sim, m = get_simulation(formulation)
+        d_full = sim.dpred(m)
+
+        rom = fdem.RationalKrylovReduction(sim, n_shifts=8)
+        d_rom = rom.dpred(m)
+
+        err = np.linalg.norm(d_rom - d_full) / np.linalg.norm(d_full)
+        self.assertLess(err, TOL)
+        self.assertLess(rom.basis.shape[1], sim.mesh.nE)
+
+        # at a shift the reduced solution is exact up to round-off
+        np.testing.assert_array_less(rom.residual_norms(rom._shifts[0]), 1e-6)
+
+    def test_dpred_e(self):
+        self._test_dpred("e")
+
+    def test_dpred_b(self):
+        self._test_dpred("b")
+
+    def test_sweep(self):
+        sim, m = get_simulation("e")
+        rom = fdem.RationalKrylovReduction(sim, n_shifts=8)
+        rom.build(m)
+
+        # in between the survey frequencies, with the right hand side of the
+        # sources scaled to the new frequency
+        freq = np.sqrt(sim.survey.frequencies[3] * sim.survey.frequencies[4])
+        rhs = sim.getRHS(sim.survey.frequencies[3])
+        rhs = rhs * freq / sim.survey.frequencies[3]
+        Ainv = sim.Solver(sim.getA(freq), **sim.solver_opts)
+        u_full = (Ainv * rhs).reshape(rhs.shape)
+        Ainv.clean()
+
+        u = rom.solve(freq, rhs)
+        err = np.linalg.norm(u - u_full) / np.linalg.norm(u_full)
+        self.assertLess(err, TOL)
+        np.testing.assert_allclose(
+            rom.residual_norms(freq, rhs=rhs), rom.residual_norms(freq, u, rhs)
+        )
+
+        with self.assertRaises(ValueError):
+            rom.solve(freq)
+        with self.assertRaises(ValueError):
+            rom.residual_norms(freq)
+
+    def test_rebuild_on_model_update(self):
+        sim, m = get_simulation("e")
+        rom = fdem.RationalKrylovReduction(sim, n_shifts=8)
+        rom.dpred(m)
+        V = rom.basis
+
+        m2 = m + np.log(2.0)
+        d_rom = rom.dpred(m2)
+        self.assertIsNot(rom.basis, V)
+
+        d_full = sim.dpred(m2)
+        err = np.linalg.norm(d_rom - d_full) / np.linalg.norm(d_full)
+        self.assertLess(err, TOL)
+
+        # the same model keeps the basis, any change rebuilds it
+        V = rom.basis
+        rom.dpred(m2.copy())
+        self.assertIs(rom.basis, V)
+        rom.dpred(m2 + 1e-9)
+        self.assertIsNot(rom.basis, V)
+
+
+if __name__ == "__main__":
+    unittest.main()
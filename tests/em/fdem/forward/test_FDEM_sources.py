@@ -375,5 +375,78 @@ class TestSimpleSourcePropertiesTensor(unittest.TestCase):
         assert self.bPrimaryTest(src, "j")
 
 
+class TestCachedPrimaryFields(unittest.TestCase):
+    def setUp(self):
+        hx = [(10.0, 3, -1.5), (10.0, 6), (10.0, 3, 1.5)]
+        self.mesh = discretize.TensorMesh([hx, hx, hx], "CCC")
+
+        source_list = []
+        for freq in [1.0, 10.0]:
+            for x in [-15.0, 0.0, 15.0]:
+                for orientation in ["X", "Z"]:
+                    source_list.append(
+                        fdem.sources.MagDipole(
+                            [],
+                            frequency=freq,
+                            location=np.r_[x, 2.0, 5.0],
+                            orientation=orientation,
+                            moment=2.0,
+                        )
+                    )
+            source_list += [
+                fdem.sources.CircularLoop(
+                    [], frequency=freq, location=np.r_[3.0, 0.0, 5.0], radius=5.0
+                ),
+                fdem.sources.MagDipole_Bfield(
+                    [], frequency=freq, location=np.r_[3.0, 0.0, 5.0]
+                ),
+            ]
+        self.survey = fdem.Survey(source_list)
+
+    def _test_cache(self, Simulation):
+        sim = Simulation(self.mesh, survey=self.survey, sigma=np.ones(self.mesh.nC))
+
+        # each geometry is evaluated once
+        self.assertEqual(len(sim._bPrimary_cache), 8)
+        for src in self.survey.source_list:
+            np.testing.assert_allclose(
+                src.bPrimary(sim), src._compute_bPrimary(sim), rtol=1e-10, atol=0.0
+            )
+
+        s_m, s_e = sim.getSourceTerm(1.0)
+        self.assertIs(sim.getSourceTerm(1.0)[0], s_m)
+
+        # the source terms depend on mu, the primary fields do not
+        sim.mu = 2 * mu_0
+        s_m2, s_e2 = sim.getSourceTerm(1.0)
+        self.assertIsNot(s_m2, s_m)
+        self.assertGreater(np.linalg.norm(s_e2), 0.0)
+        self.assertEqual(len(sim._bPrimary_cache), 8)
+
+        # sources changed in place are evaluated again
+        for src in self.survey.get_sources_by_frequency(1.0):
+            src.location = src.location + np.r_[5.0, 0.0, 0.0]
+        s_m3, s_e3 = sim.getSourceTerm(1.0)
+        sim_new = Simulation(
+            self.mesh, survey=self.survey, sigma=np.ones(self.mesh.nC), mu=2 * mu_0
+        )
+        s_m_new, s_e_new = sim_new.getSourceTerm(1.0)
+        self.assertFalse(np.allclose(s_m3, s_m2) and np.allclose(s_e3, s_e2))
+        np.testing.assert_allclose(s_m3, s_m_new, rtol=1e-10, atol=0.0)
+        np.testing.assert_allclose(s_e3, s_e_new, rtol=1e-10, atol=0.0)
+
+    def test_cache_e(self):
+        self._test_cache(fdem.Simulation3DElectricField)
+
+    def test_cache_b(self):
+        self._test_cache(fdem.Simulation3DMagneticFluxDensity)
+
+    def test_cache_h(self):
+        self._test_cache(fdem.Simulation3DMagneticField)
+
+    def test_cache_j(self):
+        self._test_cache(fdem.Simulation3DCurrentDensity)
+
+
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,90 @@
+import unittest
+import numpy as np
+from scipy.constants import mu_0
+
+import discretize
+
+from SimPEG import maps, tests
+from SimPEG.electromagnetics import natural_source as nsem
+
+np.random.seed(40)
+
+
+def get_survey(locations, frequencies):
+    receivers = [
+        nsem.Rx.Point3DImpedance(locations, orientation, component)
+        for orientation in ["xy", "yx", "xx"]
+        for component in ["real", "imag"]
+    ]
+    return nsem.Survey(
+        [nsem.Src.Planewave_xy_1Dprimary(receivers, freq) for freq in frequencies]
+    )
+
+
+class Layered1DTest(unittest.TestCase):
+    def setUp(self):
+        self.frequencies = np.logspace(-2, 3, 6)
+        self.locations = np.array([[0.0, 0.0, 0.0], [100.0, 0.0, 0.0]])
+        self.thicknesses = np.r_[50.0, 100.0, 200.0, 400.0]
+
+    def test_half_space(self):
+        sigma = 1e-2
+        sim = nsem.Simulation1DLayered(
+            survey=get_survey(self.locations, self.frequencies),
+            thicknesses=self.thicknesses,
+            sigmaMap=maps.IdentityMap(),
+        )
+        d = sim.dpred(sigma * np.ones(sim.n_layer)).reshape((-1, 6, 2))
+
+        # quasi-static impedance, the recursion includes displacement currents
+        omega = 2 * np.pi * self.frequencies
+        Z = np.sqrt(1j * omega * mu_0 / sigma)
+        np.testing.assert_allclose(d[:, 2], np.c_[Z.real, Z.real], rtol=1e-5)
+        np.testing.assert_allclose(d[:, 3], np.c_[Z.imag, Z.imag], rtol=1e-5)
+        np.testing.assert_allclose(d[:, 0], -d[:, 2])
+        np.testing.assert_allclose(d[:, 4:], 0.0)
+
+    def test_get_impedance(self):
+        # the impedances of a mesh from the half-space up
+        sigma = np.exp(np.random.randn(len(self.thicknesses)))
+        hx = self.thicknesses[::-1]
+        mesh = discretize.TensorMesh([hx])
+        Z = nsem.utils.getImpedances(
+            np.r_[sigma[::-1], sigma[0]], self.thicknesses, self.frequencies
+        )
+        np.testing.assert_allclose(
+            nsem.utils.getImpedance(mesh, sigma, self.frequencies), Z[0]
+        )
+
+    def test_stitched(self):
+        sim = nsem.Simulation1DLayered(
+            survey=get_survey(self.locations, self.frequencies),
+            thicknesses=self.thicknesses,
+            sigmaMap=maps.ExpMap(),
+        )
+        m = np.log(1e-2) + np.random.randn(2 * sim.n_layer)
+        d = sim.dpred(m).reshape((-1, 6, 2))
+
+        # each station sees its own layers
+        for i in range(2):
+            sim_station = nsem.Simulation1DLayered(
+                survey=get_survey(self.locations[i], self.frequencies),
+                thicknesses=self.thicknesses,
+                sigmaMap=maps.ExpMap(),
+            )
+            d_station = sim_station.dpred(m[i * sim.n_layer : (i + 1) * sim.n_layer])
+            np.testing.assert_allclose(d[:, :, i].ravel(), d_station, rtol=1e-12)
+
+        def fun(x):
+            return sim.dpred(x), lambda v: sim.Jvec(x, v)
+
+        self.assertTrue(tests.checkDerivative(fun, m, num=4, plotIt=False))
+
+        v = np.random.randn(len(m))
+        w = np.random.randn(sim.survey.nD)
+        wJv = w.dot(sim.Jvec(m, v))
+        self.assertAlmostEqual(wJv, v.dot(sim.Jtvec(m, w)), delta=1e-10 * abs(wJv))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,102 @@
+import unittest
+from contextlib import ExitStack
+from unittest import mock
+import numpy as np
+
+import discretize
+from SimPEG.electromagnetics import natural_source as nsem
+
+TOL = 1e-10
+
+np.random.seed(38)
+
+
+def get_simulation():
+    hx = [(200.0, 3, -1.5), (200.0, 4), (200.0, 3, 1.5)]
+    hz = [(200.0, 4, -1.5), (200.0, 6), (200.0, 4, 1.5)]
+    mesh = discretize.TensorMesh([hx, hx, hz], x0="CCC")
+    frequencies = np.logspace(1, -2, 5)
+    rx_loc = np.array([[-100.0, 0.0, 0.0], [100.0, 100.0, 0.0]])
+
+    sigBG = np.where(mesh.gridCC[:, 2] < 0.0, 1e-2, 1e-8)
+    sig = sigBG * np.exp(0.1 * np.random.randn(mesh.nC))
+    survey, simulation = nsem.utils.test_utils.setupSimpegNSEM_ePrimSec(
+        (mesh, frequencies, sig, sigBG, rx_loc), comp="All"
+    )
+    return simulation, simulation.model
+
+
+class FactorizationTest(unittest.TestCase):
+    def test_shared_factorizations(self):
+        sim, m = get_simulation()
+        v = np.random.randn(sim.mesh.nC)
+        w = np.random.randn(sim.survey.nD)
+
+        # one factorization per frequency, shared by fields, Jvec and Jtvec
+        f = sim.fields(m)
+        frequencies = sim.survey.frequencies
+        self.assertEqual(len(sim._A_solvers), len(frequencies))
+        solvers = [sim._getSolver(freq) for freq in frequencies]
+        sim.Jvec(m, v, f=f)
+        sim.Jtvec(m, w, f=f)
+        self.assertEqual(len(sim._A_solvers), len(frequencies))
+        for freq, Ainv in zip(frequencies, solvers):
+            self.assertIs(sim._getSolver(freq, adjoint=True), Ainv)
+
+        # a new model clears them, the factorizations are cleaned
+        with ExitStack() as stack:
+            cleans = [
+                stack.enter_context(mock.patch.object(Ainv, "clean", wraps=Ainv.clean))
+                for Ainv in solvers
+            ]
+            sim.model = m + 0.1
+        for clean in cleans:
+            clean.assert_called_once()
+        self.assertIsNone(getattr(sim, "_A_solvers", None))
+
+        # with a single factorization kept, the results are the same
+        sim.model = m
+        d = sim.dpred(m, f=f)
+        sim.max_factorizations = 1
+        np.testing.assert_allclose(sim.dpred(m), d, rtol=TOL)
+        self.assertEqual(len(sim._A_solvers), 1)
+
+
+class FrequencyParallelTest(unittest.TestCase):
+    def setUp(self):
+        self.sim, self.m = get_simulation()
+        self.f = self.sim.fields(self.m)
+        self.v = np.random.randn(self.sim.mesh.nC)
+        self.w = np.random.randn(self.sim.survey.nD)
+
+    def _test_parallel(self, backend):
+        sim, m, v, w = self.sim, self.m, self.v, self.w
+        sim_parallel = nsem.FrequencyParallelSimulation(sim, n_cpu=2, backend=backend)
+        self.assertEqual([len(inds) for inds in sim_parallel.source_partition], [3, 2])
+
+        f = sim_parallel.fields(m)
+        src = sim.survey.source_list[3]
+        np.testing.assert_allclose(
+            f[src, "e_pxSolution"], self.f[src, "e_pxSolution"], rtol=TOL
+        )
+
+        np.testing.assert_allclose(
+            sim_parallel.dpred(m, f=f), sim.dpred(m, f=self.f), rtol=TOL
+        )
+        np.testing.assert_allclose(
+            sim_parallel.Jvec(m, v, f=f), sim.Jvec(m, v, f=self.f), rtol=TOL
+        )
+        np.testing.assert_allclose(
+            sim_parallel.Jtvec(m, w, f=f), sim.Jtvec(m, w, f=self.f), rtol=TOL
+        )
+        sim_parallel.close()
+
+    def test_serial(self):
+        self._test_parallel("serial")
+
+    def test_process(self):
+        self._test_parallel("process")
+
+
+if __name__ == "__main__":
+    unittest.main()
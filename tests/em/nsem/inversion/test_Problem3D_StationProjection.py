@@ -0,0 +1,93 @@
+import unittest
+import numpy as np
+
+import discretize
+from SimPEG.utils import mkvc
+from SimPEG.electromagnetics import natural_source as nsem
+
+TOL = 1e-10
+
+np.random.seed(39)
+
+
+def get_simulation():
+    hx = [(200.0, 3, -1.5), (200.0, 4), (200.0, 3, 1.5)]
+    hz = [(200.0, 4, -1.5), (200.0, 6), (200.0, 4, 1.5)]
+    mesh = discretize.TensorMesh([hx, hx, hz], x0="CCC")
+    frequencies = np.r_[10.0, 1.0]
+    rx_loc = np.array([[-100.0, 0.0, 0.0], [100.0, 100.0, 0.0], [0.0, -50.0, 0.0]])
+
+    sigBG = np.where(mesh.gridCC[:, 2] < 0.0, 1e-2, 1e-8)
+    sig = sigBG * np.exp(0.1 * np.random.randn(mesh.nC))
+    survey, simulation = nsem.utils.test_utils.setupSimpegNSEM_ePrimSec(
+        (mesh, frequencies, sig, sigBG, rx_loc), comp="All"
+    )
+    # receivers at a subset of the stations, in a different order
+    for src in survey.source_list:
+        src.receiver_list.append(nsem.Rx.Point3DTipper(rx_loc[[2, 0]], "zy", "imag"))
+    simulation.survey = nsem.Survey(survey.source_list)
+    return simulation, simulation.model
+
+
+class StationProjectionTest(unittest.TestCase):
+    def setUp(self):
+        self.sim, self.m = get_simulation()
+        self.f = self.sim.fields(self.m)
+
+    def test_eval(self):
+        sim, f = self.sim, self.f
+        d = np.hstack(
+            [
+                mkvc(rx.eval(src, sim.mesh, f))
+                for src in sim.survey.source_list
+                for rx in src.receiver_list
+            ]
+        )
+        np.testing.assert_allclose(sim.dpred(self.m, f=f), d, rtol=TOL)
+
+    def test_evalDeriv(self):
+        sim, f = self.sim, self.f
+        src = sim.survey.source_list[0]
+        projection = sim._getStationProjection(src)
+        self.assertEqual(projection.n_stations, 3)
+
+        du = np.random.randn(sim.mesh.nE, 2) + 1j * np.random.randn(sim.mesh.nE, 2)
+        w = [np.random.randn(rx.nD) for rx in src.receiver_list]
+
+        Jv = projection.evalDeriv(src, f, du)
+        JTw = projection.evalDeriv(src, f, w, adjoint=True)
+        JTw_rx = 0.0
+        for rx, Jv_rx, w_rx in zip(src.receiver_list, Jv, w):
+            np.testing.assert_allclose(
+                Jv_rx, rx.evalDeriv(src, sim.mesh, f, du.flatten(order="F")), rtol=TOL
+            )
+            sign = -1.0 if rx.component == "imag" else 1.0
+            JTw_rx = JTw_rx + sign * rx.evalDeriv(src, sim.mesh, f, w_rx, adjoint=True)
+        np.testing.assert_allclose(JTw, JTw_rx, rtol=TOL)
+
+        # the real part of the adjoint is the transpose of the real derivative
+        wJv = np.sum([w_rx.dot(Jv_rx) for w_rx, Jv_rx in zip(w, Jv)])
+        self.assertAlmostEqual(wJv, np.sum(JTw * du).real, delta=TOL * abs(wJv))
+
+    def test_survey_update(self):
+        sim = self.sim
+        src = sim.survey.source_list[0]
+        projection = sim._getStationProjection(src)
+        self.assertIs(sim._getStationProjection(src), projection)
+
+        # a new survey (or mesh) clears the projections
+        sim.survey = nsem.Survey(sim.survey.source_list)
+        self.assertIsNone(getattr(sim, "_station_projections", None))
+        self.assertIsNot(sim._getStationProjection(src), projection)
+
+    def test_adjoint(self):
+        sim, m, f = self.sim, self.m, self.f
+        v = np.random.randn(sim.mesh.nC)
+        w = np.random.randn(sim.survey.nD)
+        vJtw = v.dot(sim.Jtvec(m, w, f=f))
+        wJv = w.dot(sim.Jvec(m, v, f=f))
+        self.assertLess(np.abs(vJtw - wJv), 1e-6 * np.abs(vJtw))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,144 @@
+import unittest
+import numpy as np
+from scipy.constants import mu_0
+from scipy.integrate import quad
+
+from SimPEG import maps, tests
+from SimPEG.electromagnetics import time_domain as tdem
+from SimPEG.electromagnetics.analytics import TDEM as analytics
+
+np.random.seed(35)
+
+sigma = 1e-2
+radius = 20.0
+
+
+def get_simulation(times, waveform=None):
+    location = np.r_[0.0, 0.0, 0.0]
+    receivers = [
+        tdem.Rx.PointMagneticFluxDensity(location, times, "z"),
+        tdem.Rx.PointMagneticFluxTimeDerivative(location, times, "z"),
+    ]
+    kwargs = {} if waveform is None else {"waveform": waveform}
+    src = tdem.Src.CircularLoop(receivers, location=location, radius=radius, **kwargs)
+    return tdem.Simulation1DLayered(
+        survey=tdem.Survey([src]),
+        thicknesses=np.r_[10.0, 20.0],
+        sigmaMap=maps.ExpMap(),
+    )
+
+
+def step_off(t):
+    return analytics.hzAnalyticCentLoopT(radius, t, sigma) if t > 0.0 else 0.0
+
+
+class TDEM1DAnalyticTest(unittest.TestCase):
+    def test_step_off(self):
+        times = np.logspace(-5, -2, 13)
+        sim = get_simulation(times)
+        d = sim.dpred(np.log(sigma) * np.ones(3)).reshape((2, -1))
+
+        hz = analytics.hzAnalyticCentLoopT(radius, times, sigma)
+        dt = 1e-4 * times
+        dhz_dt = (
+            analytics.hzAnalyticCentLoopT(radius, times + dt, sigma)
+            - analytics.hzAnalyticCentLoopT(radius, times - dt, sigma)
+        ) / (2 * dt)
+        np.testing.assert_allclose(d[0], mu_0 * hz, rtol=5e-3)
+        np.testing.assert_allclose(d[1], mu_0 * dhz_dt, rtol=5e-3)
+
+    def test_waveform(self):
+        waveform = tdem.Src.TrapezoidWaveform(
+            ramp_on=np.r_[0.0, 2e-4], ramp_off=np.r_[1e-3, 1.2e-3]
+        )
+        times = np.r_[5e-4, 1.1e-3, 1.2e-3 + np.logspace(-5, -3, 5)]
+        sim = get_simulation(times, waveform=waveform)
+        d = sim.dpred(np.log(sigma) * np.ones(3)).reshape((2, -1))
+
+        # convolution of the analytic step-off response with the waveform
+        def h(t):
+            out = waveform.eval(t) / (2 * radius)
+            for t_start, t_end, slope in [(0.0, 2e-4, 5e3), (1e-3, 1.2e-3, -5e3)]:
+                if t > t_start:
+                    out -= (
+                        slope
+                        * quad(lambda tau: step_off(t - tau), t_start, min(t_end, t))[0]
+                    )
+            return out
+
+        dt = 1e-7
+        hz = np.array([h(t) for t in times])
+        dhz_dt = np.array([(h(t + dt) - h(t - dt)) / (2 * dt) for t in times])
+        np.testing.assert_allclose(d[0], mu_0 * hz, rtol=1e-2)
+        np.testing.assert_allclose(d[1], mu_0 * dhz_dt, rtol=1e-2)
+
+    def test_waveform_changed(self):
+        times = 1.2e-3 + np.logspace(-5, -3, 5)
+        m = np.log(sigma) * np.ones(3)
+        waveform = tdem.Src.TrapezoidWaveform(
+            ramp_on=np.r_[0.0, 2e-4], ramp_off=np.r_[1e-3, 1.2e-3]
+        )
+        sim = get_simulation(times, waveform=waveform)
+        d = sim.dpred(m)
+
+        # the kernels follow the waveforms changed in place
+        waveform.ramp_off = np.r_[1.1e-3, 1.2e-3]
+        d_changed = sim.dpred(m)
+        d_new = get_simulation(times, waveform=waveform).dpred(m)
+        self.assertGreater(np.linalg.norm(d_changed - d), 1e-3 * np.linalg.norm(d))
+        np.testing.assert_allclose(d_changed, d_new)
+
+
+def get_stitched_simulation():
+    times = np.logspace(-5, -3, 8)
+    source_list = []
+    for x in [0.0, 50.0, 100.0]:
+        location = np.r_[x, 0.0, 30.0]
+        receivers = [
+            tdem.Rx.PointMagneticFluxDensity(location, times, "z"),
+            tdem.Rx.PointMagneticFluxTimeDerivative(location, times, "z"),
+        ]
+        source_list.append(
+            tdem.Src.CircularLoop(receivers, location=location, radius=10.0)
+        )
+    return tdem.Simulation1DLayered(
+        survey=tdem.Survey(source_list),
+        thicknesses=np.r_[5.0, 10.0, 20.0],
+        sigmaMap=maps.ExpMap(),
+    )
+
+
+class TDEM1DDerivTest(unittest.TestCase):
+    def setUp(self):
+        self.sim = get_stitched_simulation()
+        # one set of layers per sounding
+        self.m0 = np.log(1e-2) + np.random.randn(3 * 4)
+
+    def test_deriv(self):
+        def fun(m):
+            return self.sim.dpred(m), lambda v: self.sim.Jvec(m, v)
+
+        self.assertTrue(tests.checkDerivative(fun, self.m0, num=4, plotIt=False))
+
+    def test_adjoint(self):
+        v = np.random.randn(len(self.m0))
+        w = np.random.randn(self.sim.survey.nD)
+        wJv = w.dot(self.sim.Jvec(self.m0, v))
+        vJtw = v.dot(self.sim.Jtvec(self.m0, w))
+        self.assertLess(np.abs(wJv - vJtw), 1e-10 * np.abs(wJv))
+
+    def test_shared_model(self):
+        # the same layers for every sounding
+        m = np.log(1e-2) + np.random.randn(4)
+        d = self.sim.dpred(m)
+        d_stitched = get_stitched_simulation().dpred(np.tile(m, 3))
+        np.testing.assert_allclose(d, d_stitched)
+
+        def fun(m):
+            return self.sim.dpred(m), lambda v: self.sim.Jvec(m, v)
+
+        self.assertTrue(tests.checkDerivative(fun, m, num=4, plotIt=False))
+
+
+if __name__ == "__main__":
+    unittest.main()
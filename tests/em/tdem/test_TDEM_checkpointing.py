@@ -0,0 +1,153 @@
+import unittest
+import numpy as np
+
+from SimPEG import tests
+from SimPEG.electromagnetics import time_domain as tdem
+from SimPEG.electromagnetics.time_domain.fields import CheckpointStorage
+
+from . import utils
+
+TOL = 1e-10
+
+np.random.seed(20)
+
+
+class ScaledRx(tdem.Rx.PointMagneticFluxTimeDerivative):
+    """dbdt receiver that overrides eval and evalDeriv"""
+
+    def eval(self, src, mesh, time_mesh, f):
+        return 2.0 * super(ScaledRx, self).eval(src, mesh, time_mesh, f)
+
+    def evalDeriv(self, src, mesh, time_mesh, f, v, adjoint=False):
+        return 2.0 * super(ScaledRx, self).evalDeriv(
+            src, mesh, time_mesh, f, v, adjoint=adjoint
+        )
+
+
+def get_simulation(formulation, checkpoint_interval=None):
+    times = np.r_[2e-5, 6e-5, 1.2e-4]
+    source_list = []
+    for z in [0.0, 8.0]:
+        rx_list = [
+            tdem.Rx.PointMagneticFluxTimeDerivative(
+                np.array([[10.0, 0.0, z]]), times, "z"
+            ),
+            tdem.Rx.PointElectricField(np.array([[5.0, 5.0, -5.0]]), times, "x"),
+        ]
+        source_list.append(tdem.Src.MagDipole(rx_list, location=np.r_[0.0, 0.0, z]))
+
+    sim, m = utils.get_simulation(
+        source_list,
+        getattr(tdem, "Simulation3D{}".format(formulation)),
+        time_steps=[(1e-5, 4), (2e-5, 5)],
+    )
+    if checkpoint_interval is not None:
+        sim.checkpoint_interval = checkpoint_interval
+    return sim, m
+
+
+class CheckpointTest(unittest.TestCase):
+    def _test_checkpointing(self, formulation):
+        sim, m = get_simulation(formulation)
+        f = sim.fields(m)
+        v = np.random.randn(sim.mesh.nC)
+        w = np.random.randn(sim.survey.nD)
+
+        sim_c, _ = get_simulation(formulation, checkpoint_interval=4)
+        f_c = sim_c.fields(m)
+
+        store = f_c._fields["{}Solution".format(sim._fieldType)]
+        self.assertIsInstance(store, CheckpointStorage)
+        self.assertEqual(store._checkpoints.shape[2], 3)
+
+        # every time step, read backward through time
+        ftype = "{}Solution".format(sim._fieldType)
+        for tInd in reversed(range(sim.nT + 1)):
+            np.testing.assert_allclose(
+                f_c[:, ftype, tInd], f[:, ftype, tInd], rtol=TOL, atol=0.0
+            )
+
+        d = sim.dpred(m, f=f)
+        np.testing.assert_allclose(sim_c.dpred(m, f=f_c), d, rtol=TOL)
+        np.testing.assert_allclose(
+            sim_c.Jvec(m, v, f=f_c), sim.Jvec(m, v, f=f), rtol=TOL
+        )
+        np.testing.assert_allclose(
+            sim_c.Jtvec(m, w, f=f_c), sim.Jtvec(m, w, f=f), rtol=TOL
+        )
+
+        # the projections one time step at a time give the same data as the
+        # receivers
+        d_rx = np.hstack(
+            [
+                rx.eval(src, sim.mesh, sim.time_mesh, f)
+                for src in sim.survey.source_list
+                for rx in src.receiver_list
+            ]
+        )
+        np.testing.assert_allclose(d, d_rx, rtol=TOL)
+
+    def test_checkpointing_b(self):
+        self._test_checkpointing("MagneticFluxDensity")
+
+    def test_checkpointing_e(self):
+        self._test_checkpointing("ElectricField")
+
+    def test_checkpointing_h(self):
+        self._test_checkpointing("MagneticField")
+
+    def test_model_changed(self):
+        sim, m = get_simulation("MagneticFluxDensity", checkpoint_interval=3)
+        f = sim.fields(m)
+        sim.model = m + 1.0
+        with self.assertRaises(ValueError):
+            f[:, "bSolution", 1]
+
+    def _get_scaled_simulation(self):
+        sim, m = get_simulation("MagneticFluxDensity")
+        src = sim.survey.source_list[1]
+        rx = src.receiver_list[0]
+        src.receiver_list[0] = ScaledRx(rx.locations, rx.times, rx.orientation)
+        n0 = sim.survey.source_list[0].nD
+        return sim, m, slice(n0, n0 + rx.nD)
+
+    def test_custom_eval(self):
+        sim, m = get_simulation("MagneticFluxDensity")
+        f = sim.fields(m)
+        d = sim.dpred(m, f=f)
+        v = np.random.randn(sim.mesh.nC)
+        Jv = sim.Jvec(m, v, f=f)
+
+        sim_s, _, scaled = self._get_scaled_simulation()
+        f_s = sim_s.fields(m)
+        d_scaled = sim_s.dpred(m, f=f_s)
+        Jv_scaled = sim_s.Jvec(m, v, f=f_s)
+        np.testing.assert_allclose(d_scaled[scaled], 2.0 * d[scaled])
+        np.testing.assert_allclose(Jv_scaled[scaled], 2.0 * Jv[scaled])
+        d_scaled[scaled] = d[scaled]
+        Jv_scaled[scaled] = Jv[scaled]
+        np.testing.assert_allclose(d_scaled, d)
+        np.testing.assert_allclose(Jv_scaled, Jv)
+
+    def test_custom_eval_deriv(self):
+        sim, m, _ = self._get_scaled_simulation()
+
+        def derChk(m):
+            return [sim.dpred(m), lambda mx: sim.Jvec(m, mx)]
+
+        self.assertTrue(
+            tests.checkDerivative(derChk, m, plotIt=False, num=3, eps=1e-20)
+        )
+
+    def test_custom_eval_adjoint(self):
+        sim, m, _ = self._get_scaled_simulation()
+        f = sim.fields(m)
+        v = np.random.randn(sim.mesh.nC)
+        w = np.random.randn(sim.survey.nD)
+        vJw = v.dot(sim.Jtvec(m, w, f=f))
+        wJv = w.dot(sim.Jvec(m, v, f=f))
+        self.assertTrue(np.abs(vJw - wJv) < 1e-10 * np.abs(vJw))
+
+
+if __name__ == "__main__":
+    unittest.main()
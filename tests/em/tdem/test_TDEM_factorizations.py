@@ -0,0 +1,157 @@
+import unittest
+from unittest import mock
+import numpy as np
+
+import discretize
+from SimPEG import maps
+from SimPEG.electromagnetics import time_domain as tdem
+
+TOL = 1e-8
+
+np.random.seed(30)
+
+
+class NonSymmetricSimulation(tdem.Simulation3DMagneticFluxDensity):
+    _Adiag_symmetric = False
+
+
+def get_simulation(Simulation):
+    cs = 10.0
+    hx = [(cs, 2, -1.5), (cs, 4), (cs, 2, 1.5)]
+    mesh = discretize.TensorMesh([hx, hx, hx], "CCC")
+
+    rx = tdem.Rx.PointMagneticFluxTimeDerivative(
+        np.array([[10.0, 0.0, 0.0]]), np.r_[2e-5, 5e-5, 1e-4], "z"
+    )
+    src = tdem.Src.MagDipole([rx], location=np.r_[0.0, 0.0, 0.0])
+
+    # the first time step length is revisited at the end
+    sim = Simulation(
+        mesh,
+        survey=tdem.Survey([src]),
+        sigmaMap=maps.ExpMap(mesh),
+        time_steps=[(1e-5, 3), (2e-5, 3), (1e-5, 2)],
+    )
+
+    m = np.log(1e-2) * np.ones(mesh.nC)
+    m[mesh.gridCC[:, 2] > 0.0] = np.log(1e-8)
+    return sim, m + 0.1 * np.random.randn(mesh.nC)
+
+
+def get_grounded_simulation(n_sources, **kwargs):
+    cs = 10.0
+    hx = [(cs, 2, -1.5), (cs, 4), (cs, 2, 1.5)]
+    mesh = discretize.TensorMesh([hx, hx, hx], "CCC")
+
+    rx = tdem.Rx.PointElectricField(
+        np.array([[10.0, 0.0, 0.0]]), np.r_[2e-5, 5e-5, 8e-5], "x"
+    )
+    source_list = [
+        tdem.Src.LineCurrent(
+            [rx],
+            location=np.array([[-20.0, y, 0.0], [20.0, y, 0.0]]),
+            waveform=tdem.Src.StepOffWaveform(),
+        )
+        for y in [0.0, 10.0][:n_sources]
+    ]
+    sim = tdem.Simulation3DElectricField(
+        mesh,
+        survey=tdem.Survey(source_list),
+        time_steps=[(1e-5, 3), (2e-5, 3)],
+        **kwargs
+    )
+    return sim, np.log(1e-2) + 0.1 * np.random.randn(mesh.nC)
+
+
+class FactorizationPoolTest(unittest.TestCase):
+    def test_shared_factorizations(self):
+        sim, m = get_simulation(tdem.Simulation3DElectricField)
+        v = np.random.randn(sim.mesh.nC)
+        w = np.random.randn(sim.survey.nD)
+
+        f = sim.fields(m)
+        self.assertEqual(len(sim._Adiag_solvers), 2)
+        solvers = [sim._getAdiagSolver(tInd) for tInd in range(sim.nT)]
+        self.assertIs(solvers[0], solvers[-1])
+
+        # the system is symmetric, the adjoint uses the same factors
+        Jv = sim.Jvec(m, v, f=f)
+        JTw = sim.Jtvec(m, w, f=f)
+        self.assertEqual(len(sim._Adiag_solvers), 2)
+        self.assertIs(sim._getAdiagSolver(0, adjoint=True), solvers[0])
+
+        # a new model clears the pool, the factorizations are cleaned
+        pool = sim._Adiag_solvers
+        with mock.patch.object(pool, "clean", wraps=pool.clean) as clean:
+            sim.model = m + 0.1
+        clean.assert_called_once()
+        self.assertIsNone(getattr(sim, "_Adiag_solvers", None))
+
+        # with a single factorization kept, the results are the same
+        sim_1, _ = get_simulation(tdem.Simulation3DElectricField)
+        sim_1.max_factorizations = 1
+        f_1 = sim_1.fields(m)
+        self.assertEqual(len(sim_1._Adiag_solvers), 1)
+        np.testing.assert_allclose(sim_1.Jvec(m, v, f=f_1), Jv, rtol=TOL)
+        np.testing.assert_allclose(sim_1.Jtvec(m, w, f=f_1), JTw, rtol=TOL)
+
+    def test_non_symmetric_adjoint(self):
+        sim, m = get_simulation(NonSymmetricSimulation)
+        f = sim.fields(m)
+        sim.Jtvec(m, np.random.randn(sim.survey.nD), f=f)
+        # forward and transposed factors for each time step length
+        self.assertEqual(len(sim._Adiag_solvers), 4)
+
+    def test_initial_fields(self):
+        sim, m = get_grounded_simulation(2, sigmaMap=maps.ExpMap())
+        v = np.random.randn(sim.mesh.nC)
+        w = np.random.randn(sim.survey.nD)
+
+        # the DC problems of both sources are solved together and kept with
+        # their factorization for Jvec and Jtvec
+        f = sim.fields(m)
+        Adcinv = sim.Adcinv
+        self.assertEqual(len(sim._initialPotentials), 2)
+        Jv = sim.Jvec(m, v, f=f)
+        JTw = sim.Jtvec(m, w, f=f)
+        self.assertIs(sim.Adcinv, Adcinv)
+        wJv = w.dot(Jv)
+        self.assertLess(np.abs(wJv - v.dot(JTw)), 1e-6 * np.abs(wJv))
+
+        # the same as the sources on their own
+        sim_1, _ = get_grounded_simulation(1, sigmaMap=maps.ExpMap())
+        f_1 = sim_1.fields(m)
+        nD = sim_1.survey.nD
+        np.testing.assert_allclose(
+            sim_1.dpred(m, f=f_1), sim.dpred(m, f=f)[:nD], rtol=TOL
+        )
+        np.testing.assert_allclose(sim_1.Jvec(m, v, f=f_1), Jv[:nD], rtol=TOL)
+
+        # a new model clears them, the factorization is cleaned
+        with mock.patch.object(Adcinv, "clean", wraps=Adcinv.clean) as clean:
+            sim.model = m + 0.1
+        clean.assert_called_once()
+        self.assertIsNone(getattr(sim, "_Adcinv", None))
+        self.assertIsNone(getattr(sim, "_initialPotentials", None))
+
+    def test_initial_fields_fixed_sigma(self):
+        sigma = 1e-2 * np.ones(8 ** 3)
+        sim, _ = get_grounded_simulation(1, sigma=sigma)
+
+        # the model does not change sigma, the potentials are kept
+        d = sim.dpred(np.zeros(3))
+        potentials = sim._initialPotentials
+        np.testing.assert_allclose(sim.dpred(np.ones(3)), d, rtol=TOL)
+        self.assertIs(sim._initialPotentials, potentials)
+
+        # but not when sigma is set, the factorization is then cleaned
+        Adcinv = sim.Adcinv
+        with mock.patch.object(Adcinv, "clean", wraps=Adcinv.clean) as clean:
+            sim.sigma = 2 * sigma
+        clean.assert_called_once()
+        self.assertIsNone(getattr(sim, "_initialPotentials", None))
+        self.assertIsNone(getattr(sim, "_Adcinv", None))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,47 @@
+import unittest
+import numpy as np
+
+from SimPEG.electromagnetics import time_domain as tdem
+
+from . import utils
+
+np.random.seed(32)
+
+
+def get_simulation(field_storage):
+    rx = tdem.Rx.PointMagneticFluxTimeDerivative(
+        np.array([[10.0, 0.0, 0.0]]), np.r_[2e-5, 5e-5, 1e-4], "z"
+    )
+    source_list = [
+        tdem.Src.MagDipole([rx], location=np.r_[0.0, 0.0, z]) for z in [0.0, 10.0]
+    ]
+    return utils.get_simulation(source_list, field_storage=field_storage)
+
+
+class FieldStorageTest(unittest.TestCase):
+    def test_field_storage(self):
+        sim, m = get_simulation("float64")
+        f = sim.fields(m)
+        v = np.random.randn(sim.mesh.nC)
+        d = sim.dpred(m, f=f)
+        Jv = sim.Jvec(m, v, f=f)
+
+        for field_storage, rtol in [("memmap", 1e-12), ("float32", 1e-4)]:
+            sim_s, _ = get_simulation(field_storage)
+            f_s = sim_s.fields(m)
+            self.assertEqual(
+                f_s._fields["bSolution"].dtype,
+                np.float32 if field_storage == "float32" else np.float64,
+            )
+            np.testing.assert_allclose(
+                f_s[sim_s.survey.source_list[1], "b", 3],
+                f[sim.survey.source_list[1], "b", 3],
+                rtol=rtol,
+                atol=rtol * np.abs(f[:, "b", 3]).max(),
+            )
+            np.testing.assert_allclose(sim_s.dpred(m, f=f_s), d, rtol=rtol)
+            np.testing.assert_allclose(sim_s.Jvec(m, v, f=f_s), Jv, rtol=rtol)
+
+
+if __name__ == "__main__":
+    unittest.main()
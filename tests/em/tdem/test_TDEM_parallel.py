@@ -0,0 +1,67 @@
+import unittest
+import numpy as np
+
+from SimPEG.electromagnetics import time_domain as tdem
+
+from . import utils
+
+TOL = 1e-10
+
+np.random.seed(33)
+
+
+def get_simulation():
+    times = np.r_[2e-5, 5e-5, 1e-4]
+    source_list = []
+    for x in [-10.0, 0.0, 10.0]:
+        rx_list = [
+            tdem.Rx.PointMagneticFluxTimeDerivative(
+                np.array([[x + 5.0, 0.0, 5.0]]), times, "z"
+            ),
+            tdem.Rx.PointMagneticFluxDensity(np.array([[x, 5.0, 5.0]]), times, "x"),
+        ]
+        source_list.append(tdem.Src.MagDipole(rx_list, location=np.r_[x, 0.0, 5.0]))
+    return utils.get_simulation(source_list)
+
+
+class SourceParallelTest(unittest.TestCase):
+    def setUp(self):
+        self.sim, self.m = get_simulation()
+        self.f = self.sim.fields(self.m)
+        self.v = np.random.randn(self.sim.mesh.nC)
+        self.w = np.random.randn(self.sim.survey.nD)
+
+    def _test_parallel(self, backend):
+        sim, m, v, w = self.sim, self.m, self.v, self.w
+        sim_parallel = tdem.SourceParallelSimulation(sim, n_cpu=2, backend=backend)
+        self.assertEqual([len(inds) for inds in sim_parallel.source_partition], [2, 1])
+
+        f = sim_parallel.fields(m)
+        src = sim.survey.source_list[2]
+        np.testing.assert_allclose(f[src, "b", 3], self.f[src, "b", 3], rtol=TOL)
+
+        np.testing.assert_allclose(
+            sim_parallel.dpred(m, f=f), sim.dpred(m, f=self.f), rtol=TOL
+        )
+        np.testing.assert_allclose(
+            sim_parallel.Jvec(m, v, f=f), sim.Jvec(m, v, f=self.f), rtol=TOL
+        )
+        np.testing.assert_allclose(
+            sim_parallel.Jtvec(m, w, f=f), sim.Jtvec(m, w, f=self.f), rtol=TOL
+        )
+
+        # the workers recompute their fields for a new model
+        np.testing.assert_allclose(
+            sim_parallel.dpred(m + 0.1), sim.dpred(m + 0.1), rtol=TOL
+        )
+        sim_parallel.close()
+
+    def test_serial(self):
+        self._test_parallel("serial")
+
+    def test_process(self):
+        self._test_parallel("process")
+
+
+if __name__ == "__main__":
+    unittest.main()
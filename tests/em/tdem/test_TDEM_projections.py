@@ -0,0 +1,56 @@
+import unittest
+import numpy as np
+
+from SimPEG.electromagnetics import time_domain as tdem
+
+from . import utils
+
+np.random.seed(41)
+
+
+def get_simulation(simulation_class, flux_density=True):
+    locations = np.array([[10.0, 0.0, 0.0], [-5.0, 8.0, 5.0]])
+    times = np.r_[2e-5, 5e-5, 1e-4]
+    receiver_list = [
+        tdem.Rx.PointMagneticFluxTimeDerivative(locations, times, "z"),
+        tdem.Rx.PointElectricField(locations[:1], times[1:], "y"),
+    ]
+    if flux_density:
+        receiver_list.append(tdem.Rx.PointMagneticFluxDensity(locations, times, "z"))
+    source_list = [
+        tdem.Src.MagDipole(receiver_list, location=np.r_[0.0, 0.0, z])
+        for z in [0.0, 10.0]
+    ]
+    return utils.get_simulation(source_list, simulation_class)
+
+
+class FootprintProjectionTest(unittest.TestCase):
+    def projection_test(self, simulation_class, **kwargs):
+        sim, m = get_simulation(simulation_class, **kwargs)
+        f = sim.fields(m)
+
+        # the full space-time projection of each receiver
+        d = np.hstack(
+            [
+                rx.eval(src, sim.mesh, sim.time_mesh, f)
+                for src in sim.survey.source_list
+                for rx in src.receiver_list
+            ]
+        )
+        np.testing.assert_allclose(sim.dpred(m, f=f), d, rtol=1e-10)
+
+        v = np.random.randn(sim.mesh.nC)
+        w = np.random.randn(sim.survey.nD)
+        vJtw = v.dot(sim.Jtvec(m, w, f=f))
+        wJv = w.dot(sim.Jvec(m, v, f=f))
+        self.assertLess(np.abs(vJtw - wJv), 1e-6 * np.abs(vJtw))
+
+    def test_magnetic_flux_density(self):
+        self.projection_test(tdem.Simulation3DMagneticFluxDensity)
+
+    def test_electric_field(self):
+        self.projection_test(tdem.Simulation3DElectricField, flux_density=False)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,87 @@
+import unittest
+import numpy as np
+
+import discretize
+from discretize.utils import refine_tree_xyz
+from SimPEG import maps, data
+from SimPEG.objective_function import ComboObjectiveFunction
+from SimPEG.electromagnetics import time_domain as tdem
+from SimPEG.electromagnetics.utils import create_tiled_misfit
+
+np.random.seed(34)
+
+
+def get_simulation():
+    h = 10.0
+    mesh = discretize.TreeMesh(
+        [[(h, 256)], [(h, 64)], [(h, 32)]], x0=[-1280.0, -320.0, -200.0]
+    )
+    locations = np.c_[np.r_[-600.0, 0.0, 600.0], np.zeros(3), 30.0 * np.ones(3)]
+    mesh = refine_tree_xyz(
+        mesh, locations, method="radial", octree_levels=[2, 2, 2], finalize=False
+    )
+    mesh = refine_tree_xyz(
+        mesh,
+        np.c_[locations[:, :2], np.zeros(3)],
+        method="radial",
+        octree_levels=[0, 2, 2],
+        finalize=True,
+    )
+
+    times = np.logspace(-5, -4, 4)
+    source_list = [
+        tdem.Src.MagDipole(
+            [
+                tdem.Rx.PointMagneticFluxTimeDerivative(
+                    loc[None, :] + np.r_[5.0, 0.0, 0.0], times, "z"
+                )
+            ],
+            location=loc,
+        )
+        for loc in locations
+    ]
+
+    active = mesh.gridCC[:, 2] < 0.0
+    sim = tdem.Simulation3DMagneticFluxDensity(
+        mesh,
+        survey=tdem.Survey(source_list),
+        sigmaMap=maps.ExpMap(mesh) * maps.InjectActiveCells(mesh, active, np.log(1e-8)),
+        time_steps=[(1e-6, 10), (5e-6, 10), (1e-5, 10)],
+    )
+    m = np.log(1e-2) * np.ones(active.sum())
+    return sim, m
+
+
+class TiledMisfitTest(unittest.TestCase):
+    def test_tiled_misfit(self):
+        sim, m = get_simulation()
+        d = sim.dpred(m)
+        dobs = data.Data(sim.survey, dobs=d, standard_deviation=0.05 * np.abs(d))
+
+        misfit = create_tiled_misfit(sim, dobs, footprint=100.0, padding_distance=200.0)
+        self.assertIsInstance(misfit, ComboObjectiveFunction)
+        self.assertEqual(len(misfit.objfcts), 3)
+
+        d_local = []
+        for local_misfit in misfit.objfcts:
+            local_sim = local_misfit.simulation
+            # the local meshes are smaller than the global mesh
+            self.assertLess(local_sim.mesh.nC, 0.5 * sim.mesh.nC)
+            self.assertLess(local_sim.mesh.hx.sum(), sim.mesh.hx.sum())
+            d_local.append(local_sim.dpred(m))
+        d_local = np.hstack(d_local)
+
+        err = np.linalg.norm(d_local - d) / np.linalg.norm(d)
+        self.assertLess(err, 5e-2)
+
+        # the local simulations depend on the global model through the tile map
+        local_sim = misfit.objfcts[1].simulation
+        v = np.random.randn(len(m))
+        w = np.random.randn(local_sim.survey.nD)
+        wJv = w.dot(local_sim.Jvec(m, v))
+        vJtw = v.dot(local_sim.Jtvec(m, w))
+        self.assertLess(np.abs(wJv - vJtw), 1e-4 * np.abs(wJv))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,108 @@
+import unittest
+import numpy as np
+
+import discretize
+from SimPEG import maps
+from SimPEG.electromagnetics import time_domain as tdem
+from SimPEG.electromagnetics.time_domain.receivers import _hat_function_integrals
+
+np.random.seed(31)
+
+WAVEFORM = tdem.Src.TrapezoidWaveform(
+    ramp_on=np.r_[0.0, 1e-4], ramp_off=np.r_[2e-4, 3e-4]
+)
+TIMES = 3e-4 + np.r_[2e-5, 5e-5, 1e-4, 2e-4]
+
+
+def get_simulation(convolve=True, refine=1):
+    cs = 10.0
+    hx = [(cs, 3, -1.5), (cs, 4), (cs, 3, 1.5)]
+    mesh = discretize.TensorMesh([hx, hx, hx], "CCC")
+
+    kwargs = {"waveform": WAVEFORM} if convolve else {}
+    rx_list = [
+        tdem.Rx.PointMagneticFluxDensity(
+            np.array([[10.0, 0.0, 10.0]]), TIMES, "z", **kwargs
+        ),
+        tdem.Rx.PointMagneticFluxTimeDerivative(
+            np.array([[10.0, 0.0, 10.0]]), TIMES, "z", **kwargs
+        ),
+    ]
+
+    if convolve:
+        # the step-off response on a log-spaced time mesh
+        waveform = tdem.Src.StepOffWaveform()
+        time_steps = [(1e-6, 10), (2e-6, 10), (5e-6, 10), (1e-5, 20), (2e-5, 12)]
+    else:
+        waveform = WAVEFORM
+        time_steps = [(5e-6, 80), (1e-5, 10), (2e-5, 12)]
+    time_steps = [(dt / refine, n * refine) for dt, n in time_steps]
+
+    src = tdem.Src.MagDipole(rx_list, location=np.r_[0.0, 0.0, 10.0], waveform=waveform)
+    sim = tdem.Simulation3DMagneticFluxDensity(
+        mesh,
+        survey=tdem.Survey([src]),
+        sigmaMap=maps.ExpMap(mesh),
+        time_steps=time_steps,
+    )
+
+    m = np.log(1e-1) * np.ones(mesh.nC)
+    m[mesh.gridCC[:, 2] > 0.0] = np.log(1e-8)
+    return sim, m
+
+
+class WaveformConvolutionTest(unittest.TestCase):
+    def test_hat_function_integrals(self):
+        # linear functions are integrated exactly
+        nodes = np.cumsum(np.r_[0.0, np.logspace(-6, -4, 20)])
+        u = np.r_[0.0, 3e-7, nodes[5], 0.5 * (nodes[10] + nodes[11]), nodes[-1]]
+        s = 2.0 - 3e3 * nodes
+        np.testing.assert_allclose(
+            _hat_function_integrals(nodes, u).dot(s), 2.0 * u - 1.5e3 * u ** 2
+        )
+
+        # weighted sums of the integrals
+        weights = np.random.randn(len(u))
+        rows = np.r_[1, 0, 1, 1, 0]
+        np.testing.assert_allclose(
+            _hat_function_integrals(nodes, u, weights, rows, n_rows=3).dot(s),
+            np.bincount(rows, weights * (2.0 * u - 1.5e3 * u ** 2), minlength=3),
+        )
+
+    def test_dpred(self):
+        # backward Euler is first order in time: the difference with the
+        # simulation of the waveform, up to 9% for dbdt on the coarse time
+        # meshes, halves with the time steps. A wrong convolution weight
+        # would leave a difference that does not vanish.
+        error = []
+        for refine in [1, 2]:
+            sim, m = get_simulation(refine=refine)
+            sim_direct, _ = get_simulation(convolve=False, refine=refine)
+            d_direct = sim_direct.dpred(m)
+            error.append(np.abs(sim.dpred(m) - d_direct) / np.abs(d_direct))
+        self.assertLess(error[0].max(), 0.1)
+        self.assertTrue(np.all(error[1] < 0.6 * error[0]))
+
+    def test_adjoint(self):
+        sim, m = get_simulation()
+        f = sim.fields(m)
+        v = np.random.randn(sim.mesh.nC)
+        w = np.random.randn(sim.survey.nD)
+        vJtw = v.dot(sim.Jtvec(m, w, f=f))
+        wJv = w.dot(sim.Jvec(m, v, f=f))
+        self.assertLess(np.abs(vJtw - wJv), 1e-6 * np.abs(wJv))
+
+    def test_errors(self):
+        sim, m = get_simulation()
+        sim.survey.source_list[0].waveform = WAVEFORM
+        with self.assertRaises(ValueError):
+            sim.dpred(m)
+
+        sim, m = get_simulation()
+        sim.time_steps = [(1e-5, 20)]
+        with self.assertRaises(ValueError):
+            sim.dpred(m)
+
+
+if __name__ == "__main__":
+    unittest.main()
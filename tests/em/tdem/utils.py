@@ -0,0 +1,39 @@
+import numpy as np
+
+import discretize
+from SimPEG import maps
+from SimPEG.electromagnetics import time_domain as tdem
+
+
+def get_simulation(
+    source_list,
+    simulation_class=tdem.Simulation3DMagneticFluxDensity,
+    time_steps=None,
+    **kwargs
+):
+    """
+    Simulation of a survey on a small mesh, with a model of a conductive
+    half-space and random perturbations
+
+    :param list source_list: sources of the survey
+    :param simulation_class: TDEM simulation
+    :param list time_steps: time steps of the simulation, 4 of 1e-5 s and 4 of
+        2e-5 s by default
+    :rtype: tuple
+    :return: (simulation, model)
+    """
+    cs = 10.0
+    hx = [(cs, 2, -1.5), (cs, 4), (cs, 2, 1.5)]
+    mesh = discretize.TensorMesh([hx, hx, hx], "CCC")
+
+    sim = simulation_class(
+        mesh,
+        survey=tdem.Survey(source_list),
+        sigmaMap=maps.ExpMap(mesh),
+        time_steps=[(1e-5, 4), (2e-5, 4)] if time_steps is None else time_steps,
+        **kwargs
+    )
+
+    m = np.log(1e-2) * np.ones(mesh.nC)
+    m[mesh.gridCC[:, 2] > 0.0] = np.log(1e-8)
+    return sim, m + 0.1 * np.random.randn(mesh.nC)
@@ -528,6 +528,84 @@ class VRM_fwd_tests(unittest.TestCase):
 
         self.assertTrue(Test)
 
+    def test_A_matrix(self):
+        """
+        Test ensures the A matrices built by blocks of receivers, with a
+        pool of processes or in single precision are the same
+        """
+
+        np.random.seed(self.seed)
+
+        h = [0.25, 0.25, 0.25, 0.25]
+        meshObj = discretize.TensorMesh((h, h, h), x0="CCN")
+
+        times = np.array([1e-3])
+        waveObj = vrm.waveforms.SquarePulse(delt=0.02)
+
+        loc_rx = np.c_[np.random.uniform(-1, 1, (50, 2)), 0.1 * np.ones(50)]
+        rxList = []
+        for orientation in ["x", "y", "z"]:
+            rxList.append(
+                vrm.receivers.Point(
+                    loc_rx, times=times, fieldType="dhdt", orientation=orientation
+                )
+            )
+            rxList.append(
+                vrm.receivers.SquareLoop(
+                    loc_rx[::-1],
+                    times=times,
+                    width=0.1,
+                    nTurns=10,
+                    quadOrder=3,
+                    fieldType="dbdt",
+                    orientation=orientation,
+                )
+            )
+
+        txList = [
+            vrm.sources.MagDipole(rxList, [0.0, 0.0, 0.5], [1.0, 1.0, 1.0], waveObj),
+            vrm.sources.MagDipole(rxList, [0.5, 0.0, 0.2], [0.0, 0.0, 1.0], waveObj),
+        ]
+
+        Survey = vrm.Survey(txList)
+        Problem1 = vrm.Simulation3DLinear(meshObj, refinement_factor=0)
+        Problem2 = vrm.Simulation3DLinear(meshObj, refinement_factor=2)
+        Problem3 = vrm.Simulation3DLinear(meshObj, refinement_factor=2, n_cpu=2)
+        Problem4 = vrm.Simulation3DLinear(
+            meshObj, refinement_factor=2, sensitivity_dtype="float32"
+        )
+        for Problem in [Problem1, Problem2, Problem3, Problem4]:
+            Problem.pair(Survey)
+
+        A = []
+        for pp in range(0, 2):
+            G = Problem1._getGeometryMatrix(meshObj.gridCC, meshObj.h_gridded, pp)
+            H0 = Problem1._getH0matrix(meshObj.gridCC, pp)
+            A.append(H0.T.dot(G.T).T)
+        A = np.vstack(A)
+
+        np.testing.assert_allclose(Problem1.A, A, rtol=1e-10, atol=1e-14)
+        np.testing.assert_allclose(Problem3.A, Problem2.A, rtol=1e-10, atol=1e-14)
+        self.assertEqual(Problem4.A.dtype, np.float32)
+        np.testing.assert_allclose(
+            Problem4.A, Problem2.A, rtol=1e-5, atol=1e-6 * np.abs(Problem2.A).max()
+        )
+
+        # Refined columns summed by blocks vs the A matrix of the refined cells
+        xyzc, xyzh = meshObj.gridCC, meshObj.h_gridded
+        refFlag = 2 * np.ones(meshObj.nC, dtype=int)
+        Acols = Problem1._getSubsetAcolumns(xyzc, xyzh, 0, 2, refFlag)
+
+        hs = 16 * [0.0625]
+        meshSub = discretize.TensorMesh((hs, hs, hs), x0="CCN")
+        A = Problem1._getAMatrix(
+            meshSub.gridCC, meshSub.h_gridded, 0, hmin=0.0625 * np.ones(3)
+        )
+        ind = np.floor((meshSub.gridCC - meshObj.x0) / 0.25).astype(int)
+        mapping = ind[:, 0] + 4 * ind[:, 1] + 16 * ind[:, 2]
+        Asum = np.vstack([np.bincount(mapping, weights=row) for row in A])
+        np.testing.assert_allclose(Acols, Asum, rtol=1e-10, atol=1e-14)
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -1,5 +1,8 @@
+import os
+import tempfile
 import numpy as np
 import unittest
+from scipy.linalg import block_diag
 
 import discretize
 
@@ -14,6 +17,11 @@ from SimPEG.directives import BetaSchedule, TargetMisfit
 
 from SimPEG.electromagnetics import viscous_remanent_magnetization as vrm
 
+try:
+    import zarr
+except ImportError:
+    zarr = None
+
 
 class VRM_inversion_tests(unittest.TestCase):
     def test_basic_inversion(self):
@@ -86,6 +94,162 @@ class VRM_inversion_tests(unittest.TestCase):
             dmis_final < Survey.nD and mod_err_2 < 5e-6 and mod_err_inf < np.max(mod)
         )
 
+    def test_T_operator(self):
+
+        """
+        Test the characteristic decay operator and the adjoint of the
+        sensitivities with a subset of the time channels active
+        """
+
+        np.random.seed(0)
+
+        h = [(1, 6)]
+        meshObj = discretize.TensorMesh((h, h, [(1, 3)]), x0="CCN")
+
+        waveObj = vrm.waveforms.SquarePulse(delt=0.02)
+        loc_rx = np.c_[np.random.uniform(-2, 2, (4, 2)), 0.5 * np.ones(4)]
+        rxList = [
+            vrm.Rx.Point(
+                loc_rx, times=np.logspace(-4, -2, 3), fieldType="dbdt", orientation="z"
+            ),
+            vrm.Rx.Point(
+                loc_rx[:2],
+                times=np.logspace(-3, -2, 2),
+                fieldType="dhdt",
+                orientation="x",
+            ),
+        ]
+        txList = [
+            vrm.Src.MagDipole(rxList, [0.0, 0.0, 1.0], [0.0, 0.0, 1.0], waveObj),
+            vrm.Src.MagDipole(rxList[:1], [1.0, 0.0, 1.0], [1.0, 0.0, 0.0], waveObj),
+        ]
+
+        Survey = vrm.Survey(txList)
+        Survey.set_active_interval(2e-4, 1.0)
+        Problem = vrm.Simulation3DLinear(meshObj, refinement_factor=1)
+        Problem.pair(Survey)
+
+        # Explicit Kronecker products of the decays of the receivers
+        T = []
+        for src in txList:
+            for rx in src.receiver_list:
+                eta = waveObj.getCharDecay(rx.fieldType, rx.times)
+                T.append(np.kron(np.eye(np.shape(rx.locations)[0]), np.c_[eta]))
+        T = block_diag(*T)
+
+        m = np.random.rand(meshObj.nC)
+        v = np.random.rand(meshObj.nC)
+        w = np.random.rand(Survey.nD)
+        d = Problem.fields(m)
+
+        np.testing.assert_allclose(d, T.dot(Problem.A.dot(m)), rtol=1e-12)
+        np.testing.assert_allclose(Problem.T * Problem.A.dot(m), d, rtol=1e-12)
+        np.testing.assert_allclose(Problem.dpred(m), d[Survey.t_active], rtol=1e-12)
+        np.testing.assert_allclose(Problem.Jvec(m, m), d[Survey.t_active], rtol=1e-12)
+        np.testing.assert_allclose(
+            Problem.Jtvec(m, w),
+            Problem.A.T.dot(T[Survey.t_active, :].T.dot(w)),
+            rtol=1e-12,
+        )
+        self.assertAlmostEqual(
+            w.dot(Problem.Jvec(m, v)) / v.dot(Problem.Jtvec(m, w)), 1.0, places=12
+        )
+
+
+class VRM_storage_tests(unittest.TestCase):
+
+    """
+    Test the storage of the A matrix in memory, on disk and forward only
+    """
+
+    def setUp(self):
+
+        np.random.seed(1)
+
+        h = [(1, 6)]
+        self.mesh = discretize.TensorMesh((h, h, [(1, 3)]), x0="CCN")
+
+        waveObj = vrm.waveforms.SquarePulse(delt=0.02)
+        loc_rx = np.c_[np.random.uniform(-2, 2, (5, 2)), 0.5 * np.ones(5)]
+        rxList = [
+            vrm.Rx.Point(
+                loc_rx, times=np.logspace(-4, -2, 3), fieldType="dbdt", orientation=o
+            )
+            for o in ["x", "z"]
+        ]
+        txList = [
+            vrm.Src.MagDipole(rxList, [0.0, 0.0, 1.0], [0.0, 0.0, 1.0], waveObj),
+            vrm.Src.MagDipole(rxList, [1.0, 0.0, 1.0], [1.0, 0.0, 0.0], waveObj),
+        ]
+        self.survey = vrm.Survey(txList)
+
+        self.Problem = vrm.Simulation3DLinear(self.mesh, refinement_factor=1)
+        self.Problem.pair(self.survey)
+
+        self.m = np.random.rand(self.mesh.nC)
+        self.w = np.random.rand(self.survey.nD)
+        self.d = self.Problem.fields(self.m)
+        self.Jtw = self.Problem.Jtvec(self.m, self.w)
+
+        self.directory = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def get_problem(self, store_sensitivities, **kwargs):
+        Problem = vrm.Simulation3DLinear(
+            self.mesh,
+            refinement_factor=1,
+            store_sensitivities=store_sensitivities,
+            sensitivity_path=self.directory.name,
+            **kwargs
+        )
+        Problem.pair(self.survey)
+        return Problem
+
+    def check_problem(self, Problem, rtol=1e-12):
+        np.testing.assert_allclose(Problem.fields(self.m), self.d, rtol=rtol)
+        np.testing.assert_allclose(Problem.Jvec(self.m, self.m), self.d, rtol=rtol)
+        np.testing.assert_allclose(Problem.Jtvec(self.m, self.w), self.Jtw, rtol=rtol)
+
+    def test_forward_only(self):
+        Problem = self.get_problem("forward_only")
+        self.check_problem(Problem)
+        self.assertIsNone(Problem._A)
+        self.assertEqual(os.listdir(self.directory.name), [])
+
+    def test_disk(self):
+        Problem = self.get_problem("disk", sensitivity_dtype="float32")
+        self.check_problem(Problem, rtol=1e-5)
+        self.assertIsInstance(Problem.A, np.memmap)
+        self.assertEqual(Problem.A.dtype, np.float32)
+
+        # The stored A is found by a new simulation with the same geometry
+        files = os.listdir(self.directory.name)
+        self.assertEqual(len(files), 1)
+        name = os.path.join(self.directory.name, files[0])
+        mtime = os.path.getmtime(name)
+        Problem = self.get_problem("disk", sensitivity_dtype="float32")
+        self.check_problem(Problem, rtol=1e-5)
+        self.assertEqual(os.path.getmtime(name), mtime)
+
+        # and not by a simulation with another geometry
+        Problem = self.get_problem("disk", sensitivity_dtype="float32", n_cpu=2)
+        Problem.refinement_factor = 0
+        Problem.fields(self.m)
+        self.assertEqual(len(os.listdir(self.directory.name)), 2)
+
+    @unittest.skipIf(zarr is None, "zarr is not installed")
+    def test_zarr(self):
+        Problem = self.get_problem("zarr")
+        self.check_problem(Problem)
+        self.assertIsInstance(Problem.A, zarr.Array)
+
+        # only the complete array is left, under its final name
+        files = os.listdir(self.directory.name)
+        self.assertEqual(len(files), 1)
+        self.assertTrue(files[0].endswith(".zarr"))
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -1,4 +1,6 @@
 from __future__ import print_function
+import os
+import tempfile
 import unittest
 import numpy as np
 
@@ -113,7 +115,7 @@ class BaseRichardsTest(unittest.TestCase):
         self.assertTrue(passed, True)
 
 
-class RichardsTests1D(BaseRichardsTest):
+class BaseRichardsTest1D(BaseRichardsTest):
     def get_mesh(self):
         mesh = discretize.TensorMesh([np.ones(20)])
         mesh.setCellGradBC("dirichlet")
@@ -138,6 +140,8 @@ class RichardsTests1D(BaseRichardsTest):
     def setup_model(self):
         self.mtrue = np.log(self.Ks)
 
+
+class RichardsTests1D(BaseRichardsTest1D):
     def _test_Richards_getResidual_Newton(self):
         self._dotest_getResidual(True)
 
@@ -288,5 +292,159 @@ class RichardsTests3D(BaseRichardsTest):
         self._dotest_sensitivity_full()
 
 
+class RichardsJacobianStorageTests(BaseRichardsTest1D):
+    def _dotest_storage(self, storage, **kwargs):
+        prob, m = self.prob, self.mtrue
+        v = np.random.rand(len(m))
+        w = np.random.rand(self.survey.nD)
+        f = prob.fields(m)
+        Jv, Jtw = prob.Jvec(m, v, f=f), prob.Jtvec(m, w, f=f)
+
+        prob.jacobian_storage = storage
+        for key, value in kwargs.items():
+            setattr(prob, key, value)
+        for _ in range(2):
+            np.testing.assert_allclose(prob.Jvec(m, v, f=f), Jv, rtol=1e-10)
+            np.testing.assert_allclose(prob.Jtvec(m, w, f=f), Jtw, rtol=1e-10)
+        return f
+
+    def test_ram(self):
+        prob, m = self.prob, self.mtrue
+        f = self._dotest_storage("ram")
+
+        # the factorizations are kept for the model
+        self.assertEqual(len(prob._Adiag_solvers), 2 * prob.nT)
+        Adiag = prob._getJacobianBlocks(m, f, 2)[1]
+        self.assertIs(
+            prob._getAdiagSolver(Adiag, 2), prob._Adiag_solvers.get((2, False), None)
+        )
+
+        prob.model = m * 1.01
+        self.assertIsNone(prob._Adiag_solvers)
+        self.assertIsNone(getattr(prob, "_jacobian_blocks", None))
+
+    def test_disk(self):
+        with tempfile.TemporaryDirectory() as path:
+            self._dotest_storage(
+                "disk", jacobian_storage_path=path, max_factorizations=3
+            )
+            self.assertEqual(len(self.prob._Adiag_solvers), 3)
+            files = os.listdir(os.path.join(path, os.listdir(path)[0]))
+            self.assertEqual(len(files), 3 * self.prob.nT)
+
+            # a new path moves the blocks, another storage removes them
+            with tempfile.TemporaryDirectory() as new_path:
+                self._dotest_storage("disk", jacobian_storage_path=new_path)
+                self.assertEqual(os.listdir(path), [])
+                self.assertEqual(len(os.listdir(new_path)), 1)
+                self.prob.jacobian_storage = "ram"
+                self.assertEqual(os.listdir(new_path), [])
+
+
+class RichardsJfullTests(BaseRichardsTest1D):
+    setup_maps = RichardsTests1D_Saturation.setup_maps
+    setup_model = RichardsTests1D_Saturation.setup_model
+
+    def test_columns(self):
+        prob, m = self.prob, self.mtrue
+        f = prob.fields(m)
+        J = prob.Jfull(m, f=f)
+        columns = np.r_[0, 7, len(m) - 1]
+        Jv = np.column_stack(
+            [prob.Jvec(m, np.eye(len(m))[:, col], f=f) for col in columns]
+        )
+        np.testing.assert_allclose(J[:, columns], Jv, rtol=1e-10, atol=1e-14)
+        np.testing.assert_allclose(
+            prob.Jfull(m, f=f, columns=columns), Jv, rtol=1e-10, atol=1e-14
+        )
+
+        # receivers may return a dense direct model term
+        class DenseSaturation(richards.receivers.Saturation):
+            def deriv(self, U, simulation, du_dm_v=None, v=None, adjoint=False):
+                dd = super(DenseSaturation, self).deriv(
+                    U, simulation, du_dm_v=du_dm_v, v=v, adjoint=adjoint
+                )
+                return dd if adjoint else dd.toarray()
+
+        rx = prob.survey.receiver_list[0]
+        prob.survey.receiver_list[0] = DenseSaturation(
+            locations=rx.locations, times=rx.times
+        )
+        np.testing.assert_allclose(
+            prob.Jfull(m, f=f, columns=columns), Jv, rtol=1e-10, atol=1e-14
+        )
+        prob.survey.receiver_list[0] = rx
+
+        with tempfile.TemporaryDirectory() as path:
+            fname = os.path.join(path, "J.npy")
+            J_disk = prob.Jfull(m, f=f, columns=columns, path=fname)
+            self.assertIsInstance(J_disk, np.memmap)
+            np.testing.assert_allclose(np.load(fname), Jv, rtol=1e-10, atol=1e-14)
+            del J_disk
+
+
+class RichardsAdaptiveTests(BaseRichardsTest1D):
+    def get_rx_list(self, prob):
+        locs = np.array([[5.0], [10], [15]])
+        times = np.r_[100.0, 200.0, 280.0]
+        rxSat = richards.receivers.Saturation(locations=locs, times=times)
+        rxPre = richards.receivers.Pressure(locations=locs, times=times)
+        return [rxSat, rxPre]
+
+    def test_adaptive(self):
+        prob, m = self.prob, self.mtrue
+        prob.adaptive_time_steps = True
+        prob.dt_max = 100.0
+
+        f = prob.fields(m)
+        time_steps = prob.time_steps
+        self.assertEqual(len(f), prob.nT + 1)
+        self.assertAlmostEqual(np.sum(time_steps), 300.0)
+        self.assertEqual(time_steps[0], 40.0)
+        self.assertLessEqual(np.max(time_steps), 100.0)
+
+        # the sensitivities use the accepted time steps
+        self._dotest_adjoint()
+
+        # the requested time steps are kept for the next fields
+        prob.fields(m)
+        np.testing.assert_allclose(prob.time_steps, time_steps)
+
+        # smaller time steps control the truncation error
+        prob.truncation_tol = 0.5
+        prob.fields(m)
+        self.assertGreater(prob.nT, len(time_steps))
+        self.assertLess(np.min(prob.time_steps), 40.0)
+
+    def test_rejected(self):
+        prob, m = self.prob, self.mtrue
+        prob.time_steps = [(75.0, 4)]
+        prob.adaptive_time_steps = True
+        prob.root_finder_max_iter = 8
+        f = prob.fields(m)
+        self.assertLess(prob.time_steps[0], 75.0)
+        self.assertAlmostEqual(np.sum(prob.time_steps), 300.0)
+
+        # a new request
+        prob.time_steps = [(75.0, 4)]
+        prob.adaptive_time_steps = False
+        self.assertEqual(len(prob.fields(m)), 5)
+
+
+class RichardsLaggedJacobianTests(BaseRichardsTest1D):
+    def test_lagged(self):
+        prob, m = self.prob, self.mtrue
+        prob.time_steps = [(10, 20)]
+        d = prob.dpred(m)
+        nFactorizations = prob.root_finder.nFactorizations
+        self.assertEqual(nFactorizations, prob.root_finder.nJacobians)
+
+        for krylov in [False, True]:
+            prob.root_finder_lag_jacobian = True
+            prob.root_finder_krylov = krylov
+            np.testing.assert_allclose(prob.dpred(m), d, rtol=1e-4)
+            self.assertLess(prob.root_finder.nFactorizations, nFactorizations / 2)
+
+
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,85 @@
+import numpy as np
+import unittest
+
+import discretize
+from SimPEG.seismic import eikonal_tomography as eik
+from SimPEG import tests, maps
+
+np.random.seed(46)
+
+
+def get_simulation(mesh, src_locs, rx_locs, **kwargs):
+    rx = eik.Rx(locations=rx_locs)
+    survey = eik.Survey([eik.Src(location=loc, receiver_list=[rx]) for loc in src_locs])
+    return eik.Simulation(mesh, survey=survey, slownessMap=maps.ExpMap(mesh), **kwargs)
+
+
+class EikonalTest(unittest.TestCase):
+    def setUp(self):
+        mesh = discretize.TensorMesh(
+            [np.ones(20), np.r_[1.2 ** np.arange(6)[::-1], np.ones(10)]], x0="CN"
+        )
+        src_locs = np.c_[[-8.0, 0.3, 9.5], [-0.5, -0.5, -3.0]]
+        rx_locs = np.c_[np.linspace(-9.0, 9.0, 7), -6.0 * np.ones(7)]
+        self.sim = get_simulation(mesh, src_locs, rx_locs)
+        self.src_locs, self.rx_locs = src_locs, rx_locs
+        self.m = np.log(0.5) + 0.2 * np.random.randn(mesh.nC)
+
+    def test_homogeneous(self):
+        d = self.sim.dpred(np.log(0.5) * np.ones(self.sim.mesh.nC))
+        dist = np.linalg.norm(self.rx_locs[None] - self.src_locs[:, None], axis=2)
+        # first order accuracy, on a coarse mesh
+        np.testing.assert_allclose(d, 0.5 * dist.ravel(), rtol=0.1)
+        self.assertTrue(np.all(d >= 0.5 * dist.ravel()))
+
+    def test_deriv(self):
+        def fun(x):
+            return self.sim.dpred(x), lambda v: self.sim.Jvec(x, v)
+
+        self.assertTrue(
+            tests.checkDerivative(
+                fun, self.m, num=4, plotIt=False, dx=0.1 * np.random.randn(len(self.m))
+            )
+        )
+
+    def test_adjoint(self):
+        v = np.random.randn(len(self.m))
+        w = np.random.randn(self.sim.survey.nD)
+        wJv = w.dot(self.sim.Jvec(self.m, v))
+        vJtw = v.dot(self.sim.Jtvec(self.m, w))
+        self.assertAlmostEqual(wJv, vJtw, delta=1e-10 * abs(wJv))
+
+    def test_parallel(self):
+        sim = get_simulation(self.sim.mesh, self.src_locs, self.rx_locs, n_cpu=2)
+        np.testing.assert_allclose(sim.dpred(self.m), self.sim.dpred(self.m))
+
+    def test_survey_changed(self):
+        self.sim.dpred(self.m)
+        self.sim.Jvec(self.m, np.random.randn(len(self.m)))
+        sim = get_simulation(self.sim.mesh, self.src_locs[:2], self.rx_locs[:3])
+        self.sim.survey = sim.survey
+        np.testing.assert_allclose(self.sim.dpred(self.m), sim.dpred(self.m))
+        v = np.random.randn(len(self.m))
+        np.testing.assert_allclose(self.sim.Jvec(self.m, v), sim.Jvec(self.m, v))
+
+    def test_3D(self):
+        mesh = discretize.TensorMesh([np.ones(8), np.ones(6), np.ones(7)])
+        rx_locs = np.random.rand(5, 3) * [8.0, 6.0, 7.0]
+        sim = get_simulation(mesh, [[2.5, 3.5, 6.5], [7.5, 0.5, 3.0]], rx_locs)
+        m = 0.2 * np.random.randn(mesh.nC)
+
+        def fun(x):
+            return sim.dpred(x), lambda v: sim.Jvec(x, v)
+
+        self.assertTrue(
+            tests.checkDerivative(
+                fun, m, num=4, plotIt=False, dx=0.1 * np.random.randn(mesh.nC)
+            )
+        )
+        v, w = np.random.randn(mesh.nC), np.random.randn(sim.survey.nD)
+        wJv = w.dot(sim.Jvec(m, v))
+        self.assertAlmostEqual(wJv, v.dot(sim.Jtvec(m, w)), delta=1e-10 * abs(wJv))
+
+
+if __name__ == "__main__":
+    unittest.main()
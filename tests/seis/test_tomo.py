@@ -1,6 +1,7 @@
 import numpy as np
 import scipy.sparse as sp
 import unittest
+import unittest.mock
 
 import discretize
 from SimPEG.seismic import straight_ray_tomography as tomo
@@ -38,5 +39,80 @@ class TomoTest(unittest.TestCase):
         return tests.checkDerivative(fun, s, num=4, plotIt=False, eps=FLR)
 
 
+class RayTracingTest(unittest.TestCase):
+    def get_A(self, mesh, src_locs, rx_locs, **kwargs):
+        rx = tomo.Rx(locations=rx_locs)
+        survey = tomo.Survey([tomo.Src(loc=loc, rxList=[rx]) for loc in src_locs])
+        problem = tomo.Simulation(mesh, slownessMap=maps.IdentityMap(mesh), **kwargs)
+        problem.pair(survey)
+        return problem.A
+
+    def test_lengthInCell(self):
+        mesh = discretize.TensorMesh([8, 6], x0=[0.2, -0.4])
+        src_locs = np.c_[np.r_[0.2, 0.0, 1.2], np.r_[-0.4, 0.1, 0.0]]
+        rx_locs = np.c_[np.r_[1.2, 0.8, 0.5, 1.3], np.r_[0.6, -0.4, 0.3, 0.0]]
+        A = self.get_A(mesh, src_locs, rx_locs)
+
+        A_cells = np.zeros(A.shape)
+        for row, (src_loc, rx_loc) in enumerate(
+            [(src_loc, rx_loc) for src_loc in src_locs for rx_loc in rx_locs]
+        ):
+            for i in range(mesh.nCx):
+                for j in range(mesh.nCy):
+                    v = tomo.lengthInCell(
+                        src_loc,
+                        rx_loc - src_loc,
+                        mesh.vectorNx[[i, i + 1]],
+                        mesh.vectorNy[[j, j + 1]],
+                    )
+                    if v is not None:
+                        A_cells[row, i + j * mesh.nCx] = v
+        np.testing.assert_allclose(A.toarray(), A_cells, atol=1e-14)
+
+    def test_3D(self):
+        mesh = discretize.TensorMesh([5, 6, 7])
+        src_locs = np.random.rand(4, 3)
+        rx_locs = np.random.rand(5, 3)
+        A = self.get_A(mesh, src_locs, rx_locs)
+
+        # the rays are inside the mesh
+        lengths = np.linalg.norm(rx_locs[None, :, :] - src_locs[:, None, :], axis=2)
+        np.testing.assert_allclose(A.sum(axis=1).A1, lengths.ravel())
+
+        # a ray along the z-axis
+        A = self.get_A(mesh, [[0.5, 0.5, 0.0]], [[0.5, 0.5, 1.0]])
+        self.assertEqual(A.nnz, mesh.nCz)
+        np.testing.assert_allclose(A.data, mesh.hz)
+
+        # the same rays in blocks, distributed over processes
+        src_locs = np.random.rand(40, 3)
+        A = self.get_A(mesh, src_locs, rx_locs)
+        with unittest.mock.patch.object(tomo.simulation, "_BLOCK_SIZE", 500):
+            A_blocks = self.get_A(mesh, src_locs, rx_locs, n_cpu=2)
+        np.testing.assert_allclose(A_blocks.toarray(), A.toarray(), atol=1e-14)
+
+    def test_TreeMesh(self):
+        mesh = discretize.TreeMesh([16, 16, 16])
+        mesh.refine_ball([0.5, 0.5, 0.5], 0.2, 4)
+        tensor = discretize.TensorMesh([16, 16, 16])
+        src_locs = np.c_[np.zeros(3), np.random.rand(3, 2)]
+        rx_locs = np.c_[np.ones(4), np.random.rand(4, 2)]
+
+        # the lengths in the finest cells, summed over the tree cells
+        P = sp.csr_matrix(
+            (
+                np.ones(tensor.nC),
+                (
+                    np.arange(tensor.nC),
+                    mesh._get_containing_cell_indexes(tensor.gridCC),
+                ),
+            ),
+            shape=(tensor.nC, mesh.nC),
+        )
+        A = self.get_A(mesh, src_locs, rx_locs)
+        A_tensor = self.get_A(tensor, src_locs, rx_locs)
+        np.testing.assert_allclose(A.toarray(), (A_tensor * P).toarray(), atol=1e-14)
+
+
 if __name__ == "__main__":
     unittest.main()
@@ -1,5 +1,7 @@
 import unittest
+from unittest import mock
 from SimPEG.utils.solver_utils import Solver, SolverLU, SolverCG, SolverBiCG, SolverDiag
+from SimPEG.utils.solver_utils import SolverCache
 import scipy.sparse as sp
 import numpy as np
 
@@ -60,5 +62,23 @@ class TestSolve(unittest.TestCase):
         np.testing.assert_almost_equal(x, x2)
 
 
+class TestSolverCache(unittest.TestCase):
+    def test_eviction(self):
+        cache = SolverCache(max_size=2)
+        solvers = [mock.Mock() for _ in range(3)]
+        for key, Ainv in enumerate(solvers):
+            self.assertIs(cache.get(key, lambda: Ainv), Ainv)
+
+        # the least recently used solver is cleaned and dropped
+        self.assertEqual(cache.keys(), [1, 2])
+        solvers[0].clean.assert_called_once()
+        solvers[1].clean.assert_not_called()
+
+        cache.clean()
+        self.assertEqual(len(cache), 0)
+        for Ainv in solvers:
+            Ainv.clean.assert_called_once()
+
+
 if __name__ == "__main__":
     unittest.main()